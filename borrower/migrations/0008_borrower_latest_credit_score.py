@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_latest_credit_score(apps, schema_editor):
+    Borrower = apps.get_model('borrower', 'Borrower')
+    CreditScoreHistory = apps.get_model('borrower', 'CreditScoreHistory')
+    latest = CreditScoreHistory.objects.filter(borrower=OuterRef('pk')).order_by('-date_recorded', '-id')
+    Borrower.objects.update(latest_credit_score=Subquery(latest.values('pk')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrower', '0007_remove_creditscorehistory_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrower',
+            name='latest_credit_score',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='borrower.creditscorehistory'),
+        ),
+        migrations.AddIndex(
+            model_name='creditscorehistory',
+            index=models.Index(fields=['borrower', '-date_recorded'], name='credit_borrower_recorded_idx'),
+        ),
+        migrations.RunPython(backfill_latest_credit_score, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,9 @@ class Borrower(models.Model):
     employment_status = models.CharField(max_length=20, choices=EMPLOYMENT_CHOICES)
     annual_income = models.DecimalField(max_digits=10, decimal_places=2)
     account_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # Most recent CreditScoreHistory row, kept current by CreditScoreHistorySerializer.create()
+    latest_credit_score = models.ForeignKey('CreditScoreHistory', on_delete=models.SET_NULL, null=True, blank=True,
+                                            related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -38,6 +41,9 @@ class CreditScoreHistory(models.Model):
 
     class Meta:
         db_table = 'credit_score_history'
+        indexes = [
+            models.Index(fields=['borrower', '-date_recorded'], name='credit_borrower_recorded_idx'),
+        ]
 
     def __str__(self):
         return ("{"
@@ -1,3 +1,5 @@
+from django.db import transaction
+
 from borrower.models import CreditScoreHistory, Borrower
 from enhancefund.commonserializer import CommonSerializer
 
@@ -14,8 +16,12 @@ class CreditScoreHistorySerializer(CommonSerializer):
         if not borrower:
             raise CommonSerializer.ValidationError("borrower not found in context")
 
-        # Create the address and associate it with the user
-        return CreditScoreHistory.objects.create(borrower=borrower, **validated_data)
+        with transaction.atomic():
+            history = CreditScoreHistory.objects.create(borrower=borrower, **validated_data)
+            # Point the borrower at its newest snapshot so list views never scan the history
+            Borrower.objects.filter(pk=borrower.pk).update(latest_credit_score=history)
+        borrower.latest_credit_score = history
+        return history
     def update(self, instance, validated_data):
         # Update the address instance
         instance.risk_score = validated_data.get('risk_score', instance.risk_score)
@@ -10,8 +10,48 @@ REQUIRED_USER_FIELDS_LOGIN = ['email', 'password']
 REQUIRED_CREATE_BORROWER_FIELD= ['employment_status', 'annual_income']
 REQUIRED_CREATE_LOAN_FIELD= ['amount', 'term_months','loan_purpose']
 REQUIRED_CREATE_INVESTMENT_FIELD= ['amount','loan']
+REQUIRED_BATCH_INVESTMENT_FIELD= ['investments']
 REQUIRED_LOAN_REPAYMENT_FIELD= ['loan_id','repayment_id']
 
+LOAN_LIST_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+TRANSACTION_PAGE_SIZE = 50
+PORTFOLIO_HISTORY_PAGE_SIZE = 20
+# Upper bound on chart buckets, a year of daily points
+MAX_CHART_BUCKETS = 366
+TRANSACTION_EXPORT_CHUNK_SIZE = 2000
+LOAN_CACHE_TIMEOUT = 60 * 10
+PAYMENT_CONFIRMATION_CACHE_TIMEOUT = 60 * 60 * 24
+IDEMPOTENCY_KEY_TTL_SECONDS = 60 * 60 * 24
+# Longer than the slowest guarded request (a Stripe call with its retries)
+IDEMPOTENCY_LOCK_SECONDS = 60
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_POLL_SECONDS = 0.05
+MAX_BATCH_INVESTMENTS = 50
+MAX_QUOTE_AXIS_VALUES = 50
+MAX_QUOTE_MATRIX_CELLS = 1000
+LOAN_DEFAULT_AFTER_DAYS = 90
+REPAYMENT_REMINDER_DAYS = 3
+REMINDER_EMAIL_CHUNK_SIZE = 100
+STRIPE_CONNECT_TIMEOUT_SECONDS = 3
+STRIPE_READ_TIMEOUT_SECONDS = 15
+STRIPE_MAX_NETWORK_RETRIES = 2
+STRIPE_POOL_SIZE = 10
+STRIPE_BREAKER_FAILURE_THRESHOLD = 5
+STRIPE_BREAKER_RESET_SECONDS = 30
+WITHDRAWAL_BATCH_SIZE = 20
+WITHDRAWAL_MAX_ATTEMPTS = 5
+WITHDRAWAL_RETRY_BASE_SECONDS = 60
+# Longer than the worst case Stripe call chain (timeouts x retries) of one withdrawal
+WITHDRAWAL_LEASE_SECONDS = 300
+# 0 pays every withdrawal out on its own; above that withdrawals are netted per account over the window
+WITHDRAWAL_PAYOUT_WINDOW_SECONDS = 0
+AUTO_INVEST_BATCH_SIZE = 20
+AUTO_INVEST_MAX_ATTEMPTS = 5
+AUTO_INVEST_RETRY_BASE_SECONDS = 60
+# Longer than matching and funding one loan takes
+AUTO_INVEST_LEASE_SECONDS = 300
+
 
 
 
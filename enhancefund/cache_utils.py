@@ -0,0 +1,49 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+VERSION_PREFIX = 'version'
+
+
+def _version_key(name):
+    return f"{VERSION_PREFIX}:{name}"
+
+
+def get_versions(*names):
+    """Return {name: version} for the given namespaces.
+
+    A version is the time (ns) of the last bump. A namespace that was never bumped,
+    or whose version was evicted, starts at "now", so an eviction can never bring an
+    older cached entry back to life.
+    """
+    keys = {_version_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, name in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[name] = version
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    """Invalidate every entry cached under the given namespaces."""
+    now = time.time_ns()
+    cache.set_many({_version_key(name): now for name in names}, None)
+
+
+def make_key(prefix, version, params=None):
+    """Build a cache key from a namespace version and optional request parameters."""
+    key = f"{prefix}:{version}"
+    if params:
+        digest = hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()
+        key = f"{key}:{digest}"
+    return key
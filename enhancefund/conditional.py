@@ -0,0 +1,47 @@
+import hashlib
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class _NotModified(Exception):
+    pass
+
+
+def _etags(header):
+    # Weak comparison: W/"x" and "x" name the same representation
+    return {tag.strip().removeprefix('W/') for tag in (header or '').split(',') if tag.strip()}
+
+
+class ConditionalGetMixin:
+    """Answer a GET with 304 when its If-None-Match still matches, before the handler runs.
+
+    Views implement ``get_etag(request)`` from cheap version stamps (cache namespace
+    versions, the query string), never from the response body, so a match skips the
+    whole computation. List it before the base view so its hooks wrap the handler.
+    """
+
+    def get_etag(self, request):
+        raise NotImplementedError
+
+    def initial(self, request, *args, **kwargs):
+        self.etag = None
+        super().initial(request, *args, **kwargs)
+        if request.method != 'GET':
+            return
+        self.etag = f'W/"{hashlib.sha1(self.get_etag(request).encode()).hexdigest()}"'
+        presented = _etags(request.headers.get('If-None-Match'))
+        if '*' in presented or self.etag.removeprefix('W/') in presented:
+            raise _NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(self, 'etag', None) and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.etag
+            # The body depends on the caller; shared caches must not hand it to someone else
+            response['Cache-Control'] = 'private, no-cache'
+        return super().finalize_response(request, response, *args, **kwargs)
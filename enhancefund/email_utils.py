@@ -1,12 +1,36 @@
 # utils/email_utils.py
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
-from django.template.loader import render_to_string
-from typing import List, Optional, Dict
+from django.template.loader import get_template
+from typing import List, Optional, Dict, Tuple
 from datetime import datetime, timedelta
 
 
 class EmailService:
+    @staticmethod
+    def build_email(
+            subject: str,
+            to_email: List[str],
+            template_name: str,
+            context: Dict = None,
+            from_email: str = None,
+            templates: Optional[Tuple] = None
+    ) -> EmailMultiAlternatives:
+        """Render an email without sending it. Pass preloaded ``templates`` (html, txt) when building many."""
+        html_template, text_template = templates or EmailService.load_templates(template_name)
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=text_template.render(context or {}),
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=to_email
+        )
+        message.attach_alternative(html_template.render(context or {}), 'text/html')
+        return message
+
+    @staticmethod
+    def load_templates(template_name: str) -> Tuple:
+        return get_template(f'emails/{template_name}.html'), get_template(f'emails/{template_name}.txt')
+
     @staticmethod
     def send_email(
             subject: str,
@@ -16,32 +40,33 @@ class EmailService:
             from_email: str = None
     ) -> bool:
         try:
-            sender = from_email or settings.DEFAULT_FROM_EMAIL
-
-            html_message = render_to_string(
-                f'emails/{template_name}.html',
-                context or {}
-            )
-
-            text_message = render_to_string(
-                f'emails/{template_name}.txt',
-                context or {}
-            )
-
-            send_mail(
-                subject=subject,
-                message=text_message,
-                from_email=sender,
-                recipient_list=to_email,
-                html_message=html_message,
-                fail_silently=False
-            )
+            EmailService.build_email(subject, to_email, template_name, context, from_email).send(fail_silently=False)
             return True
 
         except Exception as e:
             print(f"Failed to send email: {str(e)}")
             return False
 
+    @staticmethod
+    def send_bulk(messages: List[EmailMultiAlternatives], chunk_size: int = 100):
+        """Send messages over one reused connection, ``chunk_size`` at a time.
+
+        Yields (chunk, sent_count, error) per chunk so callers can record progress;
+        a failed chunk closes the connection and the next chunk opens a fresh one.
+        """
+        connection = get_connection(fail_silently=False)
+        try:
+            for start in range(0, len(messages), chunk_size):
+                chunk = messages[start:start + chunk_size]
+                try:
+                    connection.open()
+                    yield chunk, connection.send_messages(chunk) or 0, None
+                except Exception as e:
+                    connection.close()
+                    yield chunk, 0, e
+        finally:
+            connection.close()
+
     @staticmethod
     def send_welcome_email(user) -> bool:
         context = {
@@ -134,20 +159,42 @@ class EmailService:
             days_left: int
     ) -> bool:
         """Send reminder for upcoming repayment"""
+        try:
+            EmailService.build_upcoming_repayment_reminder(
+                user.email, user.first_name, due_date, emi_amount, loan_id, days_left
+            ).send(fail_silently=False)
+            return True
+        except Exception as e:
+            print(f"Failed to send email: {str(e)}")
+            return False
+
+    @staticmethod
+    def build_upcoming_repayment_reminder(
+            email: str,
+            first_name: str,
+            due_date: datetime,
+            emi_amount: float,
+            loan_id: str,
+            days_left: int,
+            templates: Optional[Tuple] = None
+    ) -> EmailMultiAlternatives:
         context = {
-            'first_name': user.first_name,
+            'first_name': first_name,
             'due_date': due_date.strftime('%Y-%m-%d'),
             'emi_amount': emi_amount,
             'loan_id': loan_id,
             'days_left': days_left,
-            'payment_link': f"{settings.SITE_URL}/make-payment/{loan_id}"
+            'payment_link': f"{settings.SITE_URL}/make-payment/{loan_id}",
+            'site_name': settings.SITE_NAME,
+            'support_email': settings.SUPPORT_EMAIL
         }
 
-        return EmailService.send_email(
+        return EmailService.build_email(
             subject=f'Repayment Due in {days_left} Days',
-            to_email=[user.email],
+            to_email=[email],
             template_name='repayment_reminder',
-            context=context
+            context=context,
+            templates=templates
         )
 
     @staticmethod
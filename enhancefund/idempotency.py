@@ -0,0 +1,107 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from rest_framework import status
+
+from enhancefund.Constant import IDEMPOTENCY_KEY_TTL_SECONDS, IDEMPOTENCY_LOCK_SECONDS, \
+    IDEMPOTENCY_WAIT_SECONDS, IDEMPOTENCY_POLL_SECONDS
+from enhancefund.utils import enhance_response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+class _Replay(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class IdempotentMixin:
+    """Honour an ``Idempotency-Key`` header on POST.
+
+    The status and body of the first response for a (user, path, key) are cached
+    for IDEMPOTENCY_KEY_TTL_SECONDS and replayed for retries, so a retry does not
+    re-run Stripe calls or writes. Concurrent duplicates wait on a short cache lock
+    for the first one to finish. 5xx responses are not stored, so those can be
+    retried. List it before the base view so its hooks wrap the handler.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self.idempotency_key = None
+        self.idempotency_locked = False
+        super().initial(request, *args, **kwargs)
+
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method != 'POST' or not key:
+            return
+        if len(key) > 255:
+            raise _Replay(enhance_response(data={}, message="Idempotency-Key is too long",
+                                           status=status.HTTP_400_BAD_REQUEST))
+
+        self.idempotency_key = f'idempotency:{request.user.pk}:{request.path}:{key}'
+        self.idempotency_fingerprint = hashlib.sha1(repr(sorted(request.data.items())).encode()).hexdigest()
+        self._replay_stored()
+
+        lock_key = f'{self.idempotency_key}:lock'
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            try:
+                locked = cache.add(lock_key, 1, IDEMPOTENCY_LOCK_SECONDS)
+            except Exception:
+                locked = None
+            # None rather than False means the cache errored (django-redis swallows it
+            # with IGNORE_EXCEPTIONS): run without coalescing
+            if locked is None:
+                return
+            if locked:
+                break
+            # Held by a duplicate: replay its response once stored, or take the lock
+            # once it is freed without one
+            self._replay_stored()
+            if time.monotonic() > deadline:
+                raise _Replay(enhance_response(
+                    data={}, message="A request with this Idempotency-Key is still being processed",
+                    status=status.HTTP_409_CONFLICT
+                ))
+            time.sleep(IDEMPOTENCY_POLL_SECONDS)
+        self.idempotency_locked = True
+        # The first request may have finished between the lookup and taking the lock
+        self._replay_stored()
+
+    def _replay_stored(self):
+        stored = cache.get(self.idempotency_key)
+        if stored is None:
+            return
+        fingerprint, status_code, data = stored
+        if fingerprint != self.idempotency_fingerprint:
+            raise _Replay(enhance_response(
+                data={}, message="Idempotency-Key was already used with a different request",
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            ))
+        response = enhance_response(status=status_code)
+        response.data = data
+        response['Idempotent-Replayed'] = 'true'
+        raise _Replay(response)
+
+    def _unlock(self):
+        if getattr(self, 'idempotency_locked', False):
+            self.idempotency_locked = False
+            cache.delete(f'{self.idempotency_key}:lock')
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Replay):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            # Unhandled errors skip finalize_response; free the key so a retry can run
+            self._unlock()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Only the request holding the lock ran the handler, so only it stores and unlocks
+        if getattr(self, 'idempotency_locked', False) and response.status_code < 500:
+            cache.set(self.idempotency_key, (self.idempotency_fingerprint, response.status_code, response.data),
+                      IDEMPOTENCY_KEY_TTL_SECONDS)
+        self._unlock()
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -203,6 +203,12 @@ CORS_ALLOW_HEADERS = [
     "Accept",
     "Origin",
     "Authorization",
+    "Idempotency-Key",
+]
+
+# Lets the marketplace client read the next page cursor of an unpaginated loan list
+CORS_EXPOSE_HEADERS = [
+    "Next-Cursor",
 ]
 
 CORS_ALLOW_METHODS = [
@@ -231,6 +237,7 @@ INSTALLED_APPS = [
     'borrower',
     'investor',
     'staff',
+    'ledger',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders'
@@ -335,6 +342,27 @@ CORS_ORIGIN_ALLOW_ALL = True
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache configuration (Redis in production, local memory for development)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # Fall back to the database instead of failing requests when Redis is down
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Email Configuration
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -349,6 +377,9 @@ SITE_URL = os.getenv('SITE_URL', 'http://localhost:5173')
 SITE_NAME = os.getenv('SITE_NAME', 'EnhanceFund')
 SUPPORT_EMAIL = os.getenv('SUPPORT_EMAIL', 'support@enhancefund.com')
 
+# Signing secret of the Stripe webhook endpoint (whsec_...)
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
+
 # ASGI Configuration for WebSocket support
 ASGI_APPLICATION = 'enhancefund.asgi.application'
 
@@ -0,0 +1,137 @@
+import threading
+import time
+from bisect import bisect_left
+
+import requests
+import stripe
+from requests.adapters import HTTPAdapter
+
+from enhancefund.Constant import STRIPE_API, STRIPE_CONNECT_TIMEOUT_SECONDS, STRIPE_READ_TIMEOUT_SECONDS, \
+    STRIPE_MAX_NETWORK_RETRIES, STRIPE_POOL_SIZE, STRIPE_BREAKER_FAILURE_THRESHOLD, STRIPE_BREAKER_RESET_SECONDS
+
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Errors that mean Stripe, or the network path to it, is degraded. Declines and
+# invalid requests are Stripe answering normally and do not trip the breaker.
+DEGRADED_ERRORS = (stripe.error.APIConnectionError, stripe.error.APIError, stripe.error.RateLimitError)
+
+
+class StripeUnavailable(stripe.error.APIConnectionError):
+    """Raised without calling Stripe while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive degraded calls and fails fast for
+    ``reset_seconds``. After that a single probe call is let through: success closes
+    the breaker, failure opens it again."""
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return 'open'
+        return 'half_open'
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._probing or time.monotonic() - self._opened_at < self.reset_seconds:
+                raise StripeUnavailable("Payment provider is temporarily unavailable, please try again shortly")
+            self._probing = True
+
+    def record(self, healthy):
+        with self._lock:
+            self._probing = False
+            if healthy:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """Per-operation call counts in fixed latency buckets, kept in process memory."""
+
+    def __init__(self, buckets_ms):
+        self.buckets_ms = buckets_ms
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def observe(self, operation, elapsed_ms, healthy):
+        with self._lock:
+            stats = self._operations.setdefault(operation, {
+                'count': 0, 'errors': 0, 'total_ms': 0.0, 'buckets': [0] * (len(self.buckets_ms) + 1)
+            })
+            stats['count'] += 1
+            stats['errors'] += not healthy
+            stats['total_ms'] += elapsed_ms
+            stats['buckets'][bisect_left(self.buckets_ms, elapsed_ms)] += 1
+
+    def snapshot(self):
+        labels = [f"<={bucket}ms" for bucket in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        with self._lock:
+            return {
+                operation: {
+                    'count': stats['count'],
+                    'errors': stats['errors'],
+                    'mean_ms': round(stats['total_ms'] / stats['count'], 2),
+                    'buckets': dict(zip(labels, stats['buckets'])),
+                }
+                for operation, stats in self._operations.items()
+            }
+
+
+def _session():
+    # One keep-alive pool shared by every request in this process
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=STRIPE_POOL_SIZE))
+    return session
+
+
+stripe.api_key = STRIPE_API
+# The library retries connection errors, 409/429 and 5xx with jittered exponential
+# backoff, and sends every POST with an idempotency key that is reused across retries
+stripe.max_network_retries = STRIPE_MAX_NETWORK_RETRIES
+stripe.default_http_client = stripe.RequestsClient(
+    timeout=(STRIPE_CONNECT_TIMEOUT_SECONDS, STRIPE_READ_TIMEOUT_SECONDS),
+    session=_session()
+)
+
+breaker = CircuitBreaker(STRIPE_BREAKER_FAILURE_THRESHOLD, STRIPE_BREAKER_RESET_SECONDS)
+latency = LatencyHistogram(LATENCY_BUCKETS_MS)
+
+
+def call_stripe(operation, func, *args, **kwargs):
+    """Call a Stripe API function through the circuit breaker and record its latency.
+
+    ``operation`` names the call in the latency histogram, e.g. 'transfer.create'.
+    Raises StripeUnavailable without touching the network while the breaker is open.
+    """
+    breaker.before_call()
+    started = time.perf_counter()
+    healthy = True
+    try:
+        return func(*args, **kwargs)
+    except DEGRADED_ERRORS:
+        healthy = False
+        raise
+    finally:
+        latency.observe(operation, (time.perf_counter() - started) * 1000, healthy)
+        breaker.record(healthy)
+
+
+def stripe_health():
+    """Breaker state and latency histogram of this process, served by the staff stripe/health/ endpoint."""
+    return {'breaker': breaker.state, 'latency': latency.snapshot()}
@@ -6,6 +6,8 @@ from users.models import UserAddress,User
 from django.conf import settings
 import os
 
+from enhancefund.stripe_client import call_stripe
+
 def enhance_response(data=None, message=None, status=None):
     response_data = {
         "code": 1 if status in [200, 201, 204] else 0, 
@@ -13,19 +15,21 @@ def enhance_response(data=None, message=None, status=None):
         "data": data,
     }
     return Response(response_data, status=status)
-def create_stripe_customer_payment(serializer):
+def create_stripe_customer_payment(serializer, idempotency_key=None):
     user_email = serializer.data['email']
     last_name = serializer.data['last_name']
     first_name = serializer.data['first_name']
     name=first_name+" "+last_name
-    investor_customer = stripe.Customer.create(
+    investor_customer = call_stripe(
+        'customer.create', stripe.Customer.create,
         email=user_email,
-        name=name
+        name=name,
+        idempotency_key=idempotency_key
     )
     return  investor_customer
 
 
-def create_stripe_user(serializer):
+def create_stripe_user(serializer, idempotency_key=None):
     try:
         user_email = serializer.data['email']
         last_name = serializer.data['last_name']
@@ -48,7 +52,8 @@ def create_stripe_user(serializer):
         print(user_email)
         dob = datetime.strptime(str(date_of_birth), '%Y-%m-%d')
 
-        account = stripe.Account.create(
+        account = call_stripe(
+            'account.create', stripe.Account.create,
             country="CA",
             type="custom",
             default_currency="CAD",
@@ -96,6 +101,7 @@ def create_stripe_user(serializer):
                 "mcc": "1520",
                 "product_description": "Enhance fund user"
             },
+            idempotency_key=idempotency_key
         )
 
         return account
@@ -110,31 +116,46 @@ def create_stripe_user(serializer):
         print(f"Error during account creation: {str(e)}")
         raise e
 
-def stripe_document_verification_update(account_Number):
+def stripe_document_verification_update(account_Number, idempotency_key=None):
+    """Upload the verification documents to the account. Returns the identity document's file id.
+
+    With ``idempotency_key`` every call gets a key derived from it, so a repeated
+    upload returns the files Stripe already has instead of creating new ones.
+    """
+    def step_key(step):
+        return f'{idempotency_key}-{step}' if idempotency_key else None
+
     print(account_Number)
     dummy_image_path = os.path.join(settings.BASE_DIR, 'enhancefund', 'cas.png')
     dummy_image_path2 = os.path.join(settings.BASE_DIR, 'enhancefund', 'bmi2.png')
     with open(dummy_image_path, 'rb') as dummy_file:
-        address_verification = stripe.File.create(
+        address_verification = call_stripe(
+            'file.create', stripe.File.create,
             purpose='additional_verification',
             file=dummy_file,
             stripe_account=account_Number,
+            idempotency_key=step_key('address'),
         )
         #
         with open(dummy_image_path2, 'rb') as dummy_file:
-            identity_verificaton = stripe.File.create(
+            identity_verificaton = call_stripe(
+                'file.create', stripe.File.create,
                 purpose='identity_document',
                 file=dummy_file,
                 stripe_account=account_Number,
+                idempotency_key=step_key('front'),
             )
             with open(dummy_image_path2, 'rb') as dummy_file:
-                identity_verificaton2 = stripe.File.create(
+                identity_verificaton2 = call_stripe(
+                    'file.create', stripe.File.create,
                     purpose='identity_document',
                     file=dummy_file,
                     stripe_account=account_Number,
+                    idempotency_key=step_key('back'),
                 )
         print(identity_verificaton)
-        stripe.Account.modify(
+        call_stripe(
+            'account.modify', stripe.Account.modify,
             account_Number,
             individual={"verification":
                             {"document":
@@ -146,11 +167,15 @@ def stripe_document_verification_update(account_Number):
                              }
                             }
                         },
+            idempotency_key=step_key('account'),
         )
+    return identity_verificaton.id
 
 def stripe_external_bank_account(acc_number,data):
-   stripe.Account.create_external_account(acc_number,external_account=data)
-   stripe.Account.modify(
+   call_stripe('account.create_external_account', stripe.Account.create_external_account,
+               acc_number, external_account=data)
+   call_stripe(
+       'account.modify', stripe.Account.modify,
        acc_number,
        tos_acceptance={"date": 1609798905, "ip": "8.8.8.8"},
        settings={
@@ -166,6 +191,8 @@ def stripe_external_bank_account(acc_number,data):
 
 
 def create_payment_link_for_customer(customer_id, amount, installment_id):
+    from loans.payments import checkout_metadata
+
     try:
         success_url = ""
         cancel_url = ""
@@ -176,7 +203,8 @@ def create_payment_link_for_customer(customer_id, amount, installment_id):
         else:
             success_url =    f"http://localhost:5173/payment/success?ins_id={installment_id}&session_id={{CHECKOUT_SESSION_ID}}"
             cancel_url = f"http://localhost:5173/payment/failed?session_id={{CHECKOUT_SESSION_ID}}"
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = call_stripe(
+            'checkout.session.create', stripe.checkout.Session.create,
             customer=customer_id,
             payment_method_types=['card'],
             line_items=[{
@@ -190,6 +218,8 @@ def create_payment_link_for_customer(customer_id, amount, installment_id):
                 'quantity': 1,
             }],
             mode='payment',
+            # Tells the webhook whether this is a wallet top-up or an EMI payment
+            metadata=checkout_metadata(installment_id),
             # Use checkout_session.id for URLs
             success_url=success_url,
             cancel_url=cancel_url,
@@ -201,9 +231,7 @@ def create_payment_link_for_customer(customer_id, amount, installment_id):
 
 
 def check_Add_fund_status(payment_id):
-   payment_details= stripe.checkout.Session.retrieve(
-        payment_id,
-    )
+   payment_details= call_stripe('checkout.session.retrieve', stripe.checkout.Session.retrieve, payment_id)
    return payment_details
 
 
@@ -212,32 +240,23 @@ def format_details(data):
     return {key: {"0": value} for key, value in data.items()}
 
 
-def transfer_funds(amount, connected_account_id):
-    try:
-        transfer = stripe.Transfer.create(
-            amount=int(amount * 100),
-            currency="CAD",
-            destination=connected_account_id,
-            description="Transfer to connected account"
-        )
-        return transfer
-    except Exception as e:
-        print(f"Error during transfer: {e}")
-        return None
-
-
-def create_payout(amount, connected_account_id):
-    try:
-        payout = stripe.Payout.create(
-            amount=int(amount * 100),  # Amount in cents
-            currency='CAD',
-            stripe_account=connected_account_id  # The connected account's ID
-        )
-        return payout
-    except stripe.error.StripeError as e:
-        return str(e)
-
-
-
+def transfer_funds(amount, connected_account_id, idempotency_key=None):
+    # Stripe errors propagate so the withdrawal worker can tell transient failures from permanent ones
+    return call_stripe(
+        'transfer.create', stripe.Transfer.create,
+        amount=int(amount * 100),
+        currency="CAD",
+        destination=connected_account_id,
+        description="Transfer to connected account",
+        idempotency_key=idempotency_key
+    )
 
 
+def create_payout(amount, connected_account_id, idempotency_key=None):
+    return call_stripe(
+        'payout.create', stripe.Payout.create,
+        amount=int(amount * 100),  # Amount in cents
+        currency='CAD',
+        stripe_account=connected_account_id,  # The connected account's ID
+        idempotency_key=idempotency_key
+    )
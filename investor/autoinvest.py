@@ -0,0 +1,133 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery, F
+from django.utils import timezone
+
+from enhancefund.Constant import AUTO_INVEST_MAX_ATTEMPTS, AUTO_INVEST_RETRY_BASE_SECONDS, AUTO_INVEST_LEASE_SECONDS
+from investor.models import AutoInvestRule, AutoInvestRulePurpose, InvestorBalance, AutoInvestJob
+from loans.funding import fund_loan, FundingError, LoanAlreadyFulfilled, RemainingAmountExceeded
+from loans.models import Loan, Investment
+
+logger = logging.getLogger(__name__)
+
+# Borrowers without a credit snapshot are treated as the riskiest band
+UNSCORED_RISK = 100
+
+
+def loan_risk_score(loan):
+    snapshot = loan.borrower.latest_credit_score
+    if snapshot is None or snapshot.risk_score is None:
+        return UNSCORED_RISK
+    return snapshot.risk_score
+
+
+def matching_rules(loan):
+    """Active rules of other users that accept ``loan``, least recently matched first.
+
+    Only min_interest_rate bounds the scan of the partial index on active rules:
+    a btree can seek on its leading range column alone. The risk and term bounds
+    are checked against the index entries before any table row is read, and the
+    purpose check is a keyed EXISTS. The cost follows the active rules whose
+    minimum rate the loan meets, not the number of investors.
+    """
+    purpose_match = AutoInvestRulePurpose.objects.filter(rule=OuterRef('pk'), loan_purpose=loan.loan_purpose)
+    balance = InvestorBalance.objects.filter(user=OuterRef('user')).values('account_balance')[:1]
+    return AutoInvestRule.objects.filter(
+        is_active=True,
+        min_interest_rate__lte=loan.interest_rate,
+        max_risk_score__gte=loan_risk_score(loan),
+        min_term_months__lte=loan.term_months,
+        max_term_months__gte=loan.term_months,
+    ).filter(
+        Q(any_purpose=True) | Exists(purpose_match)
+    ).exclude(
+        user_id=loan.borrower.user_id
+    ).annotate(
+        balance=Subquery(balance)
+    ).filter(
+        balance__gt=0
+    ).select_related('user').order_by(F('last_matched_at').asc(nulls_first=True), 'id')
+
+
+def auto_invest_loan(loan_id):
+    """Fund a loan from the matching auto-invest rules through the normal funding path."""
+    try:
+        loan = Loan.objects.select_related('borrower__latest_credit_score').get(pk=loan_id)
+    except Loan.DoesNotExist:
+        return []
+    if loan.is_fulfill or loan.status != 'processing':
+        return []
+
+    remaining = loan.amount - loan.funded_amount
+    investments = []
+    # Investors already in the loan are skipped, so a job retried after a partial run invests nobody twice
+    seen_users = set(Investment.objects.filter(loan=loan).values_list('investor_id', flat=True))
+    for rule in matching_rules(loan).iterator():
+        if remaining <= 0:
+            break
+        # One investment per investor, even when several of their rules match
+        if rule.user_id in seen_users:
+            continue
+        seen_users.add(rule.user_id)
+
+        amount = min(rule.max_amount_per_loan, rule.balance, remaining)
+        try:
+            investments.append(fund_loan(rule.user, loan.id, amount))
+        except LoanAlreadyFulfilled:
+            break
+        except RemainingAmountExceeded as e:
+            # Manual investors got in first; the next rule gets what is left
+            remaining = e.remaining_amount
+            continue
+        except FundingError:
+            continue
+        remaining -= amount
+        AutoInvestRule.objects.filter(pk=rule.pk).update(last_matched_at=timezone.now())
+    return investments
+
+
+def claim_auto_invest_jobs(limit):
+    """Lease up to ``limit`` due jobs. SKIP LOCKED lets several workers claim side by side."""
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(
+            AutoInvestJob.objects.select_for_update(skip_locked=True).filter(
+                status__in=('pending', 'processing'),
+                available_at__lte=now
+            ).order_by('available_at', 'id')[:limit]
+        )
+        AutoInvestJob.objects.filter(id__in=[job.id for job in claimed]).update(
+            status='processing',
+            attempts=F('attempts') + 1,
+            available_at=now + timedelta(seconds=AUTO_INVEST_LEASE_SECONDS)
+        )
+    for job in claimed:
+        job.status = 'processing'
+        job.attempts += 1
+    return claimed
+
+
+def process_auto_invest_job(job):
+    """Run the matcher for a claimed job. A failure is logged and retried with backoff
+    until AUTO_INVEST_MAX_ATTEMPTS, then the job is left failed with its error."""
+    owned = AutoInvestJob.objects.filter(pk=job.pk, status='processing', attempts=job.attempts)
+    try:
+        investments = auto_invest_loan(job.loan_id)
+    except Exception as e:
+        logger.exception("Auto-invest failed for loan %s (attempt %s)", job.loan_id, job.attempts)
+        if job.attempts >= AUTO_INVEST_MAX_ATTEMPTS:
+            job.status = 'failed'
+            owned.update(status='failed', error=str(e))
+        else:
+            delay = AUTO_INVEST_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+            job.status = 'pending'
+            owned.update(status='pending', error=str(e),
+                         available_at=timezone.now() + timedelta(seconds=random.uniform(delay / 2, delay)))
+        return []
+    job.status = 'completed'
+    owned.update(status='completed', error=None)
+    return investments
+
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from enhancefund.Constant import AUTO_INVEST_BATCH_SIZE
+from investor.autoinvest import claim_auto_invest_jobs, process_auto_invest_job
+
+
+class Command(BaseCommand):
+    help = ("Offer newly created loans to the matching auto-invest rules. Jobs are claimed with SKIP LOCKED, "
+            "so several workers can run side by side")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=AUTO_INVEST_BATCH_SIZE,
+                            help="Jobs claimed per round")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of draining once")
+        parser.add_argument('--sleep', type=float, default=5.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            outcomes = {'completed': 0, 'pending': 0, 'failed': 0, 'processing': 0}
+            claimed = 0
+            invested = 0
+            while True:
+                jobs = claim_auto_invest_jobs(options['batch_size'])
+                if not jobs:
+                    break
+                claimed += len(jobs)
+                for job in jobs:
+                    invested += len(process_auto_invest_job(job))
+                    outcomes[job.status] += 1
+
+            if claimed:
+                self.stdout.write(
+                    f"claimed {claimed}: completed {outcomes['completed']} with {invested} investment(s), "
+                    f"retrying {outcomes['pending']}, failed {outcomes['failed']} "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
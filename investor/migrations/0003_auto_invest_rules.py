@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investor', '0002_rename_investor_investorbalance_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoInvestRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_amount_per_loan', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_interest_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('max_risk_score', models.IntegerField(default=100)),
+                ('min_term_months', models.IntegerField(default=1)),
+                ('max_term_months', models.IntegerField(default=360)),
+                ('any_purpose', models.BooleanField(default=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_matched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auto_invest_rules', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'auto_invest_rule',
+            },
+        ),
+        migrations.CreateModel(
+            name='AutoInvestRulePurpose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_purpose', models.CharField(max_length=255)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purposes', to='investor.autoinvestrule')),
+            ],
+            options={
+                'db_table': 'auto_invest_rule_purpose',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='autoinvestrule',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['min_interest_rate', 'max_risk_score', 'min_term_months', 'max_term_months'], name='auto_rule_match_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='autoinvestrulepurpose',
+            constraint=models.UniqueConstraint(fields=('loan_purpose', 'rule'), name='auto_rule_purpose_uniq'),
+        ),
+    ]
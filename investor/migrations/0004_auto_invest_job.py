@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investor', '0003_auto_invest_rules'),
+        ('loans', '0024_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoInvestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('loan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='auto_invest_job', to='loans.loan')),
+            ],
+            options={
+                'db_table': 'auto_invest_job',
+                'indexes': [models.Index(condition=models.Q(('status__in', ['pending', 'processing'])), fields=['available_at', 'id'], name='auto_invest_job_claim_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from users.models import User
 from django.db import models
+from django.utils import timezone
 class InvestorBalance(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     account_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -13,3 +14,100 @@ class InvestorBalance(models.Model):
             f"account_balance: '{self.account_balance or ''}', "
             "}"
         )
+
+
+class AutoInvestRule(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='auto_invest_rules')
+    max_amount_per_loan = models.DecimalField(max_digits=10, decimal_places=2)
+    min_interest_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    max_risk_score = models.IntegerField(default=100)
+    min_term_months = models.IntegerField(default=1)
+    max_term_months = models.IntegerField(default=360)
+    # False when the rule is limited to the purposes in AutoInvestRulePurpose
+    any_purpose = models.BooleanField(default=True)
+    is_active = models.BooleanField(default=True)
+    # Rules that invested least recently are offered the next loan first
+    last_matched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'auto_invest_rule'
+        indexes = [
+            # Partial index: the matcher only ever looks at active rules. It seeks on
+            # min_interest_rate; the other bounds are filtered from the index entries
+            models.Index(
+                fields=['min_interest_rate', 'max_risk_score', 'min_term_months', 'max_term_months'],
+                name='auto_rule_match_idx',
+                condition=models.Q(is_active=True)
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"user: '{self.user_id or ''}', "
+            f"max_amount_per_loan: '{self.max_amount_per_loan or ''}', "
+            f"min_interest_rate: '{self.min_interest_rate or ''}', "
+            f"max_risk_score: '{self.max_risk_score or ''}', "
+            f"is_active: '{self.is_active}', "
+            "}"
+        )
+
+
+class AutoInvestRulePurpose(models.Model):
+    rule = models.ForeignKey(AutoInvestRule, on_delete=models.CASCADE, related_name='purposes')
+    loan_purpose = models.CharField(max_length=255)
+
+    class Meta:
+        db_table = 'auto_invest_rule_purpose'
+        constraints = [
+            models.UniqueConstraint(fields=['loan_purpose', 'rule'], name='auto_rule_purpose_uniq'),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"rule: '{self.rule_id or ''}', "
+            f"loan_purpose: '{self.loan_purpose or ''}', "
+            "}"
+        )
+
+
+class AutoInvestJob(models.Model):
+    """Outbox row for a new loan still to be offered to the auto-invest rules. Written in the
+    loan's own transaction; a process_auto_invest worker runs the matcher off the request path."""
+    loan = models.OneToOneField('loans.Loan', on_delete=models.CASCADE, related_name='auto_invest_job')
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Claims so far; also the fencing token a worker must still hold to finalise the row
+    attempts = models.IntegerField(default=0)
+    # When a worker may next claim the row: retry backoff while pending, lease expiry while processing
+    available_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'auto_invest_job'
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                name='auto_invest_job_claim_idx',
+                condition=models.Q(status__in=['pending', 'processing'])
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"loan: '{self.loan_id or ''}', "
+            f"status: '{self.status or ''}', "
+            f"attempts: '{self.attempts}', "
+            "}"
+        )
@@ -1,5 +1,8 @@
 from enhancefund.commonserializer import CommonSerializer
-from investor.models import InvestorBalance
+from django.db import transaction
+from rest_framework import serializers
+
+from investor.models import InvestorBalance, AutoInvestRule, AutoInvestRulePurpose
 from loans.models import PaymentHistory, Transaction
 
 
@@ -34,6 +37,12 @@ class TransactionSerializer(CommonSerializer):
         # Create the address and associate it with the user
         return Transaction.objects.create(user=user, **validated_data)
 
+class TransactionHistorySerializer(CommonSerializer):
+    class Meta:
+        model = Transaction
+        fields = ['id', 'transaction_type', 'amount', 'transaction_date', 'description', 'payment_id']
+
+
 class InvestorBalanceSerializer(CommonSerializer):
     class Meta:
         model = InvestorBalance
@@ -52,4 +61,60 @@ class InvestorBalanceSerializer(CommonSerializer):
         # Update the address instance
         instance.account_balance = validated_data.get('account_balance', instance.account_balance)
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class AutoInvestRuleSerializer(CommonSerializer):
+    loan_purposes = serializers.ListField(child=serializers.CharField(max_length=255), required=False)
+
+    class Meta:
+        model = AutoInvestRule
+        fields = ['id', 'max_amount_per_loan', 'min_interest_rate', 'max_risk_score', 'min_term_months',
+                  'max_term_months', 'loan_purposes', 'is_active', 'last_matched_at', 'created_at']
+        read_only_fields = ['id', 'last_matched_at', 'created_at']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['loan_purposes'] = [purpose.loan_purpose for purpose in instance.purposes.all()]
+        return data
+
+    def validate(self, attrs):
+        if attrs.get('max_amount_per_loan', 1) <= 0:
+            raise serializers.ValidationError("max_amount_per_loan must be greater than zero")
+        if not 0 <= attrs.get('max_risk_score', 0) <= 100:
+            raise serializers.ValidationError("max_risk_score must be between 0 and 100")
+        min_term = attrs.get('min_term_months', getattr(self.instance, 'min_term_months', 1))
+        max_term = attrs.get('max_term_months', getattr(self.instance, 'max_term_months', 360))
+        if min_term > max_term:
+            raise serializers.ValidationError("min_term_months cannot be greater than max_term_months")
+        return attrs
+
+    def _set_purposes(self, rule, purposes):
+        purposes = sorted(set(purposes))
+        rule.purposes.all().delete()
+        AutoInvestRulePurpose.objects.bulk_create(
+            [AutoInvestRulePurpose(rule=rule, loan_purpose=purpose) for purpose in purposes]
+        )
+        # An empty purpose list means the rule accepts any purpose
+        rule.any_purpose = not purposes
+        rule.save(update_fields=['any_purpose', 'updated_at'])
+
+    def create(self, validated_data):
+        user = self.context.get('user')
+
+        if not user:
+            raise serializers.ValidationError("User not found in context")
+
+        purposes = validated_data.pop('loan_purposes', [])
+        with transaction.atomic():
+            rule = AutoInvestRule.objects.create(user=user, **validated_data)
+            self._set_purposes(rule, purposes)
+        return rule
+
+    def update(self, instance, validated_data):
+        purposes = validated_data.pop('loan_purposes', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if purposes is not None:
+                self._set_purposes(instance, purposes)
+        return instance
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from investor.models import AutoInvestJob
+from loans.models import Loan
+
+
+@receiver(post_save, sender=Loan)
+def auto_invest_new_loan(sender, instance, created, **kwargs):
+    # Queued in the loan's own transaction; the process_auto_invest worker funds it,
+    # so the loan request never waits on or fails with the matcher
+    if created and instance.status == 'processing':
+        AutoInvestJob.objects.create(loan=instance)
@@ -3,7 +3,7 @@
 from django.urls import path
 
 from investor.views import InvestorAddFunds, CheckFundStatus, WalletBalance, WithdrawBalance, InvestmentClosureProcess, \
-    RecentTancation, InvestmentPerformanceChart, PortfolioDistributionChart
+    RecentTancation, TransactionHistory, TransactionExport, InvestmentPerformanceChart, PortfolioDistributionChart, AutoInvestRuleList, AutoInvestRuleDetail
 from loans.views import PortfolioValue
 
 urlpatterns = [
@@ -14,7 +14,11 @@ urlpatterns = [
     path('investor/portfolio-value/', PortfolioValue.as_view(), name='WalletBalance'),
     path('investor/get-return/', InvestmentClosureProcess.as_view(), name='WalletBalance'),
     path('investor/recent-transaction/', RecentTancation.as_view(), name='WalletBalance'),
+    path('common/transactions/', TransactionHistory.as_view(), name='transaction-history'),
+    path('common/transactions/export/', TransactionExport.as_view(), name='transaction-export'),
     path('investor/charts/performance/', InvestmentPerformanceChart.as_view(), name='investment-performance-chart'),
     path('investor/charts/distribution/', PortfolioDistributionChart.as_view(), name='portfolio-distribution-chart'),
+    path('investor/auto-invest-rules/', AutoInvestRuleList.as_view(), name='auto-invest-rules'),
+    path('investor/auto-invest-rules/<int:pk>/', AutoInvestRuleDetail.as_view(), name='auto-invest-rule-detail'),
 
 ]
@@ -1,25 +1,38 @@
 from datetime import timezone, timedelta
 from dbm import error
+from django.db import transaction as db_transaction
 from django.db.models import Sum, Count, Q, F, DecimalField
 from django.db.models.functions import TruncMonth, TruncDate
 from django.utils import timezone as django_timezone
 
 from django.forms import model_to_dict
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework.exceptions import ValidationError
 
 from borrower.models import Borrower
-from enhancefund.Constant import REQUIRED_ADD_FUND_FIELDS
+from enhancefund.Constant import REQUIRED_ADD_FUND_FIELDS, TRANSACTION_PAGE_SIZE, MAX_PAGE_SIZE, MAX_CHART_BUCKETS
+from enhancefund.cache_utils import get_version, get_versions, make_key
+from enhancefund.conditional import ConditionalGetMixin
+from enhancefund.idempotency import IdempotentMixin
+from enhancefund.pagination import keyset_paginate, get_page_size, InvalidCursor
 from enhancefund.postvalidators import BaseValidator
 from enhancefund.rolebasedauth import BaseInvestorView, BaseAuthenticatedView
 from rest_framework import generics
 
-from enhancefund.utils import enhance_response, create_payment_link_for_customer, check_Add_fund_status, transfer_funds, \
-    create_payout
-from investor.models import InvestorBalance
-from investor.serializers import PaymentHistorySerializer, TransactionSerializer, InvestorBalanceSerializer
+from enhancefund.utils import enhance_response, create_payment_link_for_customer
+from investor.models import InvestorBalance, AutoInvestRule
+from investor.serializers import PaymentHistorySerializer, TransactionSerializer, InvestorBalanceSerializer, \
+    AutoInvestRuleSerializer, TransactionHistorySerializer
 from loans.models import PaymentHistory, Transaction, Investment, LoanRepaymentSchedule, Loan
+from ledger.postings import platform, investor_wallet
+from ledger.wallets import credit
+from loans.history import filter_transactions, transactions_csv
+from loans.cache import loan_namespace, portfolio_namespace, invalidate_loans
+from loans.payments import confirmed_payment, WALLET_TOP_UP_ID
+from loans.rollups import GRANULARITIES, chart_range, chart_series, chart_label
 from loans.serializers import InvestmentSerializer
+from loans.withdrawals import request_withdrawal, WithdrawalError
 from users.models import User
 from rest_framework import status
 from decimal import Decimal
@@ -27,7 +40,7 @@ from decimal import Decimal
 
 # Create your views here.
 
-class InvestorAddFunds(BaseInvestorView,BaseValidator,generics.GenericAPIView):
+class InvestorAddFunds(IdempotentMixin, BaseInvestorView,BaseValidator,generics.GenericAPIView):
     def post(self, request, *args, **kwargs):
         validation_errors = self.validate_data(request.data, REQUIRED_ADD_FUND_FIELDS)
         if validation_errors:
@@ -38,7 +51,7 @@ class InvestorAddFunds(BaseInvestorView,BaseValidator,generics.GenericAPIView):
         user_id = User.objects.get(email=user.email)  # Corrected line
         stripe_customer_id=user_id.stripe_customer_id
         amount=request.data.get('amount')
-        payment_link=create_payment_link_for_customer(stripe_customer_id,amount,"xvKjmlKNp11")
+        payment_link=create_payment_link_for_customer(stripe_customer_id,amount,WALLET_TOP_UP_ID)
         #  add to table
         if not payment_link:
             return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
@@ -63,66 +76,24 @@ class CheckFundStatus(BaseInvestorView,BaseValidator,generics.RetrieveAPIView):
     def get(self, request, *args, **kwargs):
         payment_id = request.query_params.get('payment_id')
         user = request.user
-        user_id = User.objects.get(email=user.email)
-        stripe_history = {}
         if not payment_id:
-            # check_Add_fund_status
-
             paymentHistory = PaymentHistory.objects.filter(user=user).order_by(
                 '-payment_date').first()
-            payment_id=paymentHistory.stripe_payment_id
-            stripe_history=check_Add_fund_status(paymentHistory.stripe_payment_id)
-        else:
-            stripe_history=check_Add_fund_status(payment_id)
-
-        if  stripe_history.status != "complete":
+            if paymentHistory is None:
+                return enhance_response(data={}, status=status.HTTP_404_NOT_FOUND,
+                                        message="No payment found")
+            payment_id = paymentHistory.stripe_payment_id
+
+        # Deposits are credited by the Stripe webhook; this only reads what it recorded
+        confirmation = confirmed_payment(
+            user, payment_id, 'deposit',
+            lambda: InvestorBalanceSerializer(InvestorBalance.objects.filter(user=user).first()).data
+        )
+        if confirmation is None:
             return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
-                                    message="Invalid data")
-
-#       # add  in transaction table add
-#  add in investorbalance table
-
-#         check whether that payment id value is inserted
-#  to avoid double add for same add fund
-#         serializer=PaymentHistorySerializer(data=to_serialize_data, context={"user": user_id})
-        to_serialize_data = {
-            "transaction_type": "deposit",
-            "amount": stripe_history.amount_total/100,
-            "payment_id": payment_id
-        }
-
-        try:
-            transaction_entry = Transaction.objects.get(payment_id=payment_id)
-            print(transaction_entry, "transaction_entry", payment_id)
-            if(transaction_entry):
-                return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
-                                        message="Fund is already added to your wallet")
-        except:
-
-            serializer = TransactionSerializer(data=to_serialize_data, context={"user": user_id})
-            if not serializer.is_valid():
-                return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
-                                        message="unable to add fund")
-            serializer.save()
-            investor_balance = InvestorBalance.objects.filter(user=user_id).first()
-            balance = {
-            }
-            if investor_balance is None:
-                balance["account_balance"]=stripe_history.amount_total / 100
-                serializerInvestor = InvestorBalanceSerializer(data=balance, context={"user": user_id})
-                if serializerInvestor.is_valid():
-                     serializerInvestor.save()
-                     return enhance_response(data=serializerInvestor.data, status=status.HTTP_200_OK,
-                                        message="Your fund is added Successfully")
-            else:
-               new_added_amount=stripe_history.amount_total / 100
-               balance["account_balance"] =Decimal(investor_balance.account_balance)+ Decimal(new_added_amount)
-               serializerInvestor = InvestorBalanceSerializer(investor_balance,data=balance, partial=True,
-                                                   context={"user": user_id})
-               if serializerInvestor.is_valid():
-                   serializerInvestor.save()
-                   return enhance_response(data=serializerInvestor.data, status=status.HTTP_200_OK,
-                                    message="Your fund is added Successfully")
+                                    message="Payment is not completed yet")
+        return enhance_response(data=confirmation, status=status.HTTP_200_OK,
+                                message="Your fund is added Successfully")
 
 
 class WalletBalance(BaseAuthenticatedView,BaseValidator,generics.RetrieveAPIView):
@@ -154,76 +125,22 @@ class WalletBalance(BaseAuthenticatedView,BaseValidator,generics.RetrieveAPIView
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class WithdrawBalance(BaseAuthenticatedView,BaseValidator,generics.CreateAPIView):
+class WithdrawBalance(IdempotentMixin, BaseAuthenticatedView,BaseValidator,generics.CreateAPIView):
     def post(self, request, *args, **kwargs):
-        user = request.user
-        user_id = User.objects.get(email=user.email)
-
+        validation_errors = self.validate_data(request.data, REQUIRED_ADD_FUND_FIELDS)
+        if validation_errors:
+            return enhance_response(data=validation_errors, status=status.HTTP_400_BAD_REQUEST,
+                                    message="Please enter required fields")
         try:
-            validation_errors = self.validate_data(request.data, REQUIRED_ADD_FUND_FIELDS)
-            if validation_errors:
-                return enhance_response(data=validation_errors, status=status.HTTP_400_BAD_REQUEST,
-                                        message="Please enter required fields")
-            user_balance=0
-            print(user.role)
-            if user.role=="borrower":
-                user_balance = Borrower.objects.filter(user=user.id).first()
-            else:
-                user_balance = InvestorBalance.objects.filter(user=user.id).first()
-
-
-            requested_amount = Decimal(str(request.data.get("amount")))
-            print(user_balance.account_balance,"aaaaa")
-            print(requested_amount,"aaa111aa")
-            print(f"Balance type: {type(user_balance.account_balance)}, Requested type: {type(requested_amount)}")
-            if user_balance.account_balance < requested_amount:
-                return enhance_response(
-                    data={},
-                    message="In sufficient balance",
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            stripe_response=create_payout(requested_amount,user.stripe_account_id)
-            stripe_response_transfer=transfer_funds(requested_amount,user.stripe_account_id)
-            print(stripe_response)
-            print(stripe_response_transfer)
-            if user.role == "borrower":
-                borrower_details = Borrower.objects.filter(user=user.id).first()
-                borrower_details.account_balance=float(borrower_details.account_balance-requested_amount)
-                borrower_details.save()
-            else:
-                investor_details = InvestorBalance.objects.filter(user=user.id).first()
-                investor_details.account_balance = float(investor_details.account_balance - requested_amount)
-                investor_details.save()
-                user_id = User.objects.get(email=user.email)
-            print("11111111")
-
-            to_serialize_data = {
-                "transaction_type": "withdrawal",
-                "amount": requested_amount,
-                "payment_id": "internal"
-            }
-
-            serializerTransactionBorrower = TransactionSerializer(data=to_serialize_data, context={"user": user_id})
-            is_valid=serializerTransactionBorrower.is_valid()
-
-            if not is_valid:
-                print("Validation failed. Errors:", serializerTransactionBorrower.errors)
-            else:
-                print("Validation successful. Saving data...")
-                serializerTransactionBorrower.save()
-
-            print("aaaaa")
-            return enhance_response(
-                message="Your request is in processing",
-                status=status.HTTP_200_OK
-                )
-        except Exception as e:
-            print("Unhandled exception:", str(e))
-            return enhance_response(
-                data={},
-                message="An unexpected error occurred.",
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            # Holds the amount and queues the payout; process_withdrawals talks to Stripe
+            withdrawal = request_withdrawal(request.user, request.data.get("amount"))
+        except WithdrawalError as e:
+            return enhance_response(data={}, message=str(e), status=status.HTTP_400_BAD_REQUEST)
+        return enhance_response(
+            data={"withdrawal_id": withdrawal.id, "status": withdrawal.status},
+            message="Your request is in processing",
+            status=status.HTTP_200_OK
+        )
 
 
 class InvestmentClosureProcess(BaseInvestorView, BaseValidator, generics.GenericAPIView):
@@ -250,9 +167,6 @@ class InvestmentClosureProcess(BaseInvestorView, BaseValidator, generics.Generic
                 )
             current_date = timezone.now()
             response_data = []
-            balance={}
-            sum=0
-            user_id = User.objects.get(email=user.email)
 
             for investment in pending_closures:
                 loan = investment.loan
@@ -260,42 +174,46 @@ class InvestmentClosureProcess(BaseInvestorView, BaseValidator, generics.Generic
                     loan=loan,
                     payment_status='paid'
                 ).exists()
-                print(has_repayments,"has_repayments")
                 if has_repayments and investment.net_return > 0:
                     try:
-                        transaction_data = {
-                            "transaction_type": "deposit",
-                            "amount": float(investment.net_return),
-                            "status": "completed",
-                            "description": f"Net return for investment {investment.id}"
-                        }
+                        with db_transaction.atomic():
+                            # Conditional close: a concurrent request that closed it first gets 0 rows and skips it
+                            updated = Investment.objects.filter(pk=investment.pk, status='Open').update(
+                                status='closed', closed_at=current_date
+                            )
+                            if not updated:
+                                continue
+
+                            transaction_data = {
+                                "transaction_type": "deposit",
+                                "amount": float(investment.net_return),
+                                "status": "completed",
+                                "description": f"Net return for investment {investment.id}"
+                            }
 
-                        transaction_serializer = TransactionSerializer(
-                            data=transaction_data,
-                            context={"user": user}
-                        )
+                            transaction_serializer = TransactionSerializer(
+                                data=transaction_data,
+                                context={"user": user}
+                            )
 
-                        if transaction_serializer.is_valid():
+                            if not transaction_serializer.is_valid():
+                                raise ValidationError(transaction_serializer.errors)
                             transaction = transaction_serializer.save()
-                            sum=sum+investment.net_return
-
-                            # Update investment status
-                            investment.status = 'closed'
-                            investment.closed_at = current_date
-                            investment.save()
-
-                            response_data.append({
-                                'investment_id': investment.id,
-                                'loan_id': loan.id,
-                                'amount_invested': float(investment.amount),
-                                'net_return': float(investment.net_return),
-                                'transaction_id': transaction.id,
-                                'original_closure_date': investment.closed_at,
-                                'actual_closure_date': current_date.date(),
-                                'status': 'closed'
-                            })
-                        else:
-                            raise ValidationError(transaction_serializer.errors)
+                            credit(investor_wallet(user.pk), investment.net_return, 'investment_return',
+                                   f'investment:{investment.id}', platform('repayments'))
+                            # update() sends no post_save, so drop the cached loan payloads here
+                            invalidate_loans(loan.id)
+
+                        response_data.append({
+                            'investment_id': investment.id,
+                            'loan_id': loan.id,
+                            'amount_invested': float(investment.amount),
+                            'net_return': float(investment.net_return),
+                            'transaction_id': transaction.id,
+                            'original_closure_date': investment.closed_at,
+                            'actual_closure_date': current_date.date(),
+                            'status': 'closed'
+                        })
 
                     except Exception as e:
                         response_data.append({
@@ -306,14 +224,6 @@ class InvestmentClosureProcess(BaseInvestorView, BaseValidator, generics.Generic
                             'original_closure_date': investment.closed_at
                         })
                         continue
-            investor_balance = InvestorBalance.objects.filter(user=user_id).first()
-            new_added_amount = sum
-            print(new_added_amount, sum,"aaaaaa")
-            balance["account_balance"] = Decimal(investor_balance.account_balance) + Decimal(new_added_amount)
-            serializerInvestor = InvestorBalanceSerializer(investor_balance, data=balance, partial=True,
-                                                           context={"user": user_id})
-            serializerInvestor.is_valid()
-            serializerInvestor.save()
             if response_data:
                 return enhance_response(
                     data=response_data,
@@ -352,77 +262,79 @@ class RecentTancation(BaseInvestorView, BaseValidator, generics.GenericAPIView):
         )
 
 
-class InvestmentPerformanceChart(BaseInvestorView, BaseValidator, generics.GenericAPIView):
+class TransactionHistory(BaseAuthenticatedView, generics.GenericAPIView):
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        page_size = get_page_size(params, TRANSACTION_PAGE_SIZE, MAX_PAGE_SIZE)
+        try:
+            transactions = filter_transactions(request.user, params)
+            # Keyset on (transaction_date, id) newest first: every page is a range scan on the user's index
+            rows, next_cursor = keyset_paginate(
+                transactions, params.get('cursor'), page_size, field='transaction_date', descending=True
+            )
+        except (InvalidCursor, ValueError) as e:
+            return enhance_response(data={}, message=str(e), status=status.HTTP_400_BAD_REQUEST)
+
+        return enhance_response(
+            data={
+                'transactions': TransactionHistorySerializer(rows, many=True).data,
+                'next_cursor': next_cursor,
+                'page_size': page_size
+            },
+            message="Transactions retrieved successfully",
+            status=status.HTTP_200_OK
+        )
+
+
+class TransactionExport(BaseAuthenticatedView, generics.GenericAPIView):
+    def get(self, request, *args, **kwargs):
+        try:
+            transactions = filter_transactions(request.user, request.query_params)
+        except ValueError as e:
+            return enhance_response(data={}, message=str(e), status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(transactions_csv(transactions), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return response
+
+
+class InvestmentPerformanceChart(ConditionalGetMixin, BaseInvestorView, BaseValidator, generics.GenericAPIView):
     """
     API endpoint for Investment Performance Chart Data
     Returns data for line charts, bar charts, and area charts showing:
-    - Investment performance over time (monthly)
+    - Investment performance over time (day, week, month, quarter or year buckets)
     - Returns over time
     - Cumulative investment value
     - Transaction trends
+
+    Series are read from the daily rollup table, one row per bucket with empty
+    buckets filled in by the database.
     """
+
+    def get_etag(self, request):
+        # Buckets are relative to today, so the date is part of the stamp
+        params = dict(request.query_params.lists(), today=[django_timezone.localdate().isoformat()])
+        return make_key('performance-chart', get_version(portfolio_namespace(request.user.id)), params)
     
     def get(self, request, *args, **kwargs):
         user = request.user
         
         try:
             # Get query parameters for filtering
-            period = request.query_params.get('period', '12')  # Default 12 months
-            period_type = request.query_params.get('period_type', 'month')  # month, quarter, year
+            period = request.query_params.get('period', '12')  # Default 12 buckets
+            period_type = request.query_params.get('period_type', 'month')  # day, week, month, quarter, year
             
             try:
-                period = int(period)
+                period = max(1, min(int(period), MAX_CHART_BUCKETS))
             except ValueError:
                 period = 12
+            if period_type not in GRANULARITIES:
+                period_type = 'month'
             
-            # Calculate date range
-            end_date = django_timezone.now()
-            if period_type == 'month':
-                start_date = end_date - timedelta(days=period * 30)
-            elif period_type == 'quarter':
-                start_date = end_date - timedelta(days=period * 90)
-            elif period_type == 'year':
-                start_date = end_date - timedelta(days=period * 365)
-            else:
-                start_date = end_date - timedelta(days=period * 30)
-            
-            # Get all investments for the user
-            investments = Investment.objects.filter(
-                investor=user,
-                created_at__gte=start_date
-            ).select_related('loan').order_by('created_at')
-            
-            # Get all transactions for the user
-            transactions = Transaction.objects.filter(
-                user=user,
-                transaction_date__gte=start_date
-            ).order_by('transaction_date')
-            
-            # Monthly investment aggregation
-            monthly_investments = investments.annotate(
-                month=TruncMonth('created_at')
-            ).values('month').annotate(
-                total_amount=Sum('amount'),
-                count=Count('id')
-            ).order_by('month')
-            
-            # Monthly returns aggregation
-            monthly_returns = investments.filter(
-                net_return__isnull=False,
-                net_return__gt=0
-            ).annotate(
-                month=TruncMonth('created_at')
-            ).values('month').annotate(
-                total_returns=Sum('net_return')
-            ).order_by('month')
-            
-            # Monthly transaction aggregation
-            monthly_transactions = transactions.annotate(
-                month=TruncMonth('transaction_date')
-            ).values('month', 'transaction_type').annotate(
-                total_amount=Sum('amount'),
-                count=Count('id')
-            ).order_by('month')
+            # Calendar buckets: the current one plus the period - 1 before it
+            start_date, end_date = chart_range(period_type, period)
+            series = chart_series(user.id, period_type, start_date, end_date)
+            labels = [chart_label(row['bucket'], period_type) for row in series]
             
             # Prepare chart data
             chart_data = {
@@ -485,54 +397,21 @@ class InvestmentPerformanceChart(BaseInvestorView, BaseValidator, generics.Gener
                 }
             }
             
-            # Create a dictionary to store monthly data
-            monthly_data = {}
-            
-            # Process monthly investments
-            for item in monthly_investments:
-                month_key = item['month'].strftime('%Y-%m')
-                if month_key not in monthly_data:
-                    monthly_data[month_key] = {
-                        'invested': Decimal('0.00'),
-                        'returns': Decimal('0.00'),
-                        'count': 0
-                    }
-                monthly_data[month_key]['invested'] += item['total_amount']
-                monthly_data[month_key]['count'] += item['count']
-            
-            # Process monthly returns
-            for item in monthly_returns:
-                month_key = item['month'].strftime('%Y-%m')
-                if month_key not in monthly_data:
-                    monthly_data[month_key] = {
-                        'invested': Decimal('0.00'),
-                        'returns': Decimal('0.00'),
-                        'count': 0
-                    }
-                monthly_data[month_key]['returns'] += item['total_returns']
-            
-            # Sort months and build chart data
-            sorted_months = sorted(monthly_data.keys())
-            cumulative_value = Decimal('0.00')
-            
-            for month in sorted_months:
-                data = monthly_data[month]
-                cumulative_value += data['invested'] + data['returns']
-                
+            for label, row in zip(labels, series):
                 # Line chart data
-                chart_data['line_chart']['labels'].append(month)
-                chart_data['line_chart']['datasets'][0]['data'].append(float(data['invested']))
-                chart_data['line_chart']['datasets'][1]['data'].append(float(data['returns']))
-                chart_data['line_chart']['datasets'][2]['data'].append(float(cumulative_value))
+                chart_data['line_chart']['labels'].append(label)
+                chart_data['line_chart']['datasets'][0]['data'].append(float(row['invested']))
+                chart_data['line_chart']['datasets'][1]['data'].append(float(row['returns']))
+                chart_data['line_chart']['datasets'][2]['data'].append(float(row['cumulative']))
                 
                 # Bar chart data
-                chart_data['bar_chart']['labels'].append(month)
-                chart_data['bar_chart']['datasets'][0]['data'].append(float(data['invested']))
-                chart_data['bar_chart']['datasets'][1]['data'].append(float(data['returns']))
+                chart_data['bar_chart']['labels'].append(label)
+                chart_data['bar_chart']['datasets'][0]['data'].append(float(row['invested']))
+                chart_data['bar_chart']['datasets'][1]['data'].append(float(row['returns']))
                 
                 # Area chart data
-                chart_data['area_chart']['labels'].append(month)
-                chart_data['area_chart']['datasets'][0]['data'].append(float(cumulative_value))
+                chart_data['area_chart']['labels'].append(label)
+                chart_data['area_chart']['datasets'][0]['data'].append(float(row['cumulative']))
             
             # Process transaction trends
             transaction_types = ['deposit', 'withdrawal', 'investment', 'payment']
@@ -543,38 +422,19 @@ class InvestmentPerformanceChart(BaseInvestorView, BaseValidator, generics.Gener
                 'payment': 'rgba(255, 206, 86, 0.6)'
             }
             
-            transaction_monthly = {}
-            for item in monthly_transactions:
-                month_key = item['month'].strftime('%Y-%m')
-                trans_type = item['transaction_type']
-                
-                if month_key not in transaction_monthly:
-                    transaction_monthly[month_key] = {}
-                if trans_type not in transaction_monthly[month_key]:
-                    transaction_monthly[month_key][trans_type] = Decimal('0.00')
-                
-                transaction_monthly[month_key][trans_type] += item['total_amount']
-            
-            # Build transaction trends datasets
             for trans_type in transaction_types:
-                dataset = {
+                chart_data['transaction_trends']['datasets'].append({
                     'label': trans_type.capitalize(),
-                    'data': [],
+                    'data': [float(row[trans_type]) for row in series],
                     'backgroundColor': transaction_colors.get(trans_type, 'rgba(153, 102, 255, 0.6)')
-                }
-                
-                for month in sorted_months:
-                    amount = float(transaction_monthly.get(month, {}).get(trans_type, Decimal('0.00')))
-                    dataset['data'].append(amount)
-                
-                chart_data['transaction_trends']['datasets'].append(dataset)
+                })
             
-            chart_data['transaction_trends']['labels'] = sorted_months
+            chart_data['transaction_trends']['labels'] = labels
             
             # Calculate summary statistics
-            total_invested = sum([float(monthly_data[m]['invested']) for m in sorted_months])
-            total_returns = sum([float(monthly_data[m]['returns']) for m in sorted_months])
-            total_investments = sum([monthly_data[m]['count'] for m in sorted_months])
+            total_invested = sum(float(row['invested']) for row in series)
+            total_returns = sum(float(row['returns']) for row in series)
+            total_investments = sum(row['invested_count'] for row in series)
             roi_percentage = ((total_returns-total_invested) / total_invested * 100) if total_invested > 0 else 0
             
             summary = {
@@ -583,7 +443,7 @@ class InvestmentPerformanceChart(BaseInvestorView, BaseValidator, generics.Gener
                 'total_investments': total_investments,
                 'roi_percentage': round(roi_percentage, 2),
                 'period': f"{period} {period_type}(s)",
-                'current_portfolio_value': round(float(cumulative_value), 2)
+                'current_portfolio_value': round(float(series[-1]['cumulative']), 2) if series else 0
             }
             
             response_data = {
@@ -603,9 +463,6 @@ class InvestmentPerformanceChart(BaseInvestorView, BaseValidator, generics.Gener
             )
             
         except Exception as e:
-            import traceback
-            print(f"Error in InvestmentPerformanceChart: {str(e)}")
-            print(traceback.format_exc())
             return enhance_response(
                 data={},
                 message=f"Error retrieving chart data: {str(e)}",
@@ -613,7 +470,7 @@ class InvestmentPerformanceChart(BaseInvestorView, BaseValidator, generics.Gener
             )
 
 
-class PortfolioDistributionChart(BaseInvestorView, BaseValidator, generics.GenericAPIView):
+class PortfolioDistributionChart(ConditionalGetMixin, BaseInvestorView, BaseValidator, generics.GenericAPIView):
     """
     API endpoint for Portfolio Distribution Chart Data
     Returns data for pie charts and donut charts showing:
@@ -621,6 +478,13 @@ class PortfolioDistributionChart(BaseInvestorView, BaseValidator, generics.Gener
     - Distribution by loan purpose
     - Distribution by investment status
     """
+
+    def get_etag(self, request):
+        # Loan status and repayment progress feed the breakdown, so the invested loans' versions count too
+        loan_ids = Investment.objects.filter(investor=request.user).values_list('loan_id', flat=True).distinct()
+        namespace = portfolio_namespace(request.user.id)
+        versions = get_versions(namespace, *[loan_namespace(loan_id) for loan_id in loan_ids])
+        return make_key('portfolio-distribution', versions.pop(namespace), versions)
     
     def get(self, request, *args, **kwargs):
         user = request.user
@@ -896,3 +760,72 @@ class PortfolioDistributionChart(BaseInvestorView, BaseValidator, generics.Gener
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+class AutoInvestRuleList(BaseInvestorView, BaseValidator, generics.ListCreateAPIView):
+    serializer_class = AutoInvestRuleSerializer
+
+    def get_queryset(self):
+        return AutoInvestRule.objects.filter(user=self.request.user).prefetch_related('purposes').order_by('id')
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return enhance_response(
+            data=serializer.data,
+            message="Auto-invest rules retrieved successfully",
+            status=status.HTTP_200_OK
+        )
+
+    def post(self, request, *args, **kwargs):
+        serializer = AutoInvestRuleSerializer(data=request.data, context={"user": request.user})
+        if not serializer.is_valid():
+            return enhance_response(
+                data=serializer.errors,
+                message=serializer.get_error_message(),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rule = serializer.save()
+        return enhance_response(
+            data=AutoInvestRuleSerializer(rule).data,
+            message="Auto-invest rule created successfully",
+            status=status.HTTP_201_CREATED
+        )
+
+
+class AutoInvestRuleDetail(BaseInvestorView, BaseValidator, generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = AutoInvestRuleSerializer
+
+    def get_queryset(self):
+        return AutoInvestRule.objects.filter(user=self.request.user).prefetch_related('purposes')
+
+    def get(self, request, *args, **kwargs):
+        return enhance_response(
+            data=self.get_serializer(self.get_object()).data,
+            message="Auto-invest rule retrieved successfully",
+            status=status.HTTP_200_OK
+        )
+
+    def patch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object(), data=request.data, partial=True)
+        if not serializer.is_valid():
+            return enhance_response(
+                data=serializer.errors,
+                message=serializer.get_error_message(),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rule = serializer.save()
+        return enhance_response(
+            data=AutoInvestRuleSerializer(rule).data,
+            message="Auto-invest rule updated successfully",
+            status=status.HTTP_200_OK
+        )
+
+    def put(self, request, *args, **kwargs):
+        return self.patch(request, *args, **kwargs)
+
+    def delete(self, request, *args, **kwargs):
+        self.get_object().delete()
+        return enhance_response(
+            data={},
+            message="Auto-invest rule deleted successfully",
+            status=status.HTTP_200_OK
+        )
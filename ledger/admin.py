@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import LedgerAccount, LedgerEntry, LedgerPosting, LedgerSnapshot, WalletHold
+
+admin.site.register(LedgerAccount)
+admin.site.register(LedgerEntry)
+admin.site.register(LedgerPosting)
+admin.site.register(LedgerSnapshot)
+admin.site.register(WalletHold)
@@ -0,0 +1,97 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+
+from borrower.models import Borrower
+from investor.models import InvestorBalance
+from ledger.models import LedgerAccount, LedgerPosting, LedgerSnapshot
+from ledger.postings import post_entries, platform, investor_wallet, borrower_wallet
+
+
+class Command(BaseCommand):
+    help = ("Snapshot every ledger account that changed since the last run, so balance reads only "
+            "sum the postings after the latest snapshot. Optionally reconcile wallets against account_balance")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Report wallets whose ledger balance differs from account_balance")
+        parser.add_argument('--open-balances', action='store_true',
+                            help="Book an opening entry for wallets whose account_balance predates the ledger")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            # SHARE mode waits for in-flight posting inserts to commit and holds new ones off until
+            # we commit, so no posting below the watermark can appear after the snapshot
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {LedgerPosting._meta.db_table} IN SHARE MODE')
+
+            latest = {
+                account_id: (snapshot_balance, last_posting_id)
+                for account_id, snapshot_balance, last_posting_id in LedgerSnapshot.objects.order_by(
+                    'account_id', '-last_posting_id'
+                ).distinct('account_id').values_list('account_id', 'balance', 'last_posting_id')
+            }
+            # Every account changed since the previous run was snapshotted at its watermark,
+            # so only postings above it need summing
+            watermark = max((last for _, last in latest.values()), default=0)
+            changed = LedgerPosting.objects.filter(id__gt=watermark).values('account_id').annotate(
+                delta=Sum('amount'), last=Max('id')
+            )
+            new_watermark = max((row['last'] for row in changed), default=watermark)
+            snapshots = LedgerSnapshot.objects.bulk_create([
+                LedgerSnapshot(
+                    account_id=row['account_id'],
+                    balance=latest.get(row['account_id'], (Decimal('0'), 0))[0] + row['delta'],
+                    last_posting_id=new_watermark
+                )
+                for row in changed
+            ])
+            for snapshot in snapshots:
+                latest[snapshot.account_id] = (snapshot.balance, snapshot.last_posting_id)
+
+            self.stdout.write(f"snapshotted {len(snapshots)} account(s) up to posting {new_watermark}")
+            if options['verify'] or options['open_balances']:
+                self.reconcile(latest, options['open_balances'])
+        self.stdout.write(self.style.SUCCESS(f"Ledger snapshot done in {time.perf_counter() - started:.2f}s"))
+
+    def reconcile(self, latest, open_balances):
+        accounts = {
+            (user_id, kind): account_id for account_id, user_id, kind in LedgerAccount.objects.filter(
+                kind__in=('investor_wallet', 'borrower_wallet')
+            ).values_list('id', 'user_id', 'kind')
+        }
+        projected = {}
+        for user_id, total in InvestorBalance.objects.values('user_id').annotate(
+                total=Sum('account_balance')).values_list('user_id', 'total'):
+            projected[investor_wallet(user_id)] = total
+        for user_id, total in Borrower.objects.values('user_id').annotate(
+                total=Sum('account_balance')).values_list('user_id', 'total'):
+            projected[borrower_wallet(user_id)] = total
+
+        drift = {}
+        for key in projected.keys() | accounts.keys():
+            ledger_balance = latest.get(accounts.get(key), (Decimal('0'), 0))[0]
+            difference = (projected.get(key) or Decimal('0')) - ledger_balance
+            if difference:
+                drift[key] = difference
+
+        if open_balances and drift:
+            opened = set(LedgerPosting.objects.filter(entry__entry_type='opening_balance').values_list(
+                'account__user_id', 'account__kind'
+            ))
+            to_open = {key: amount for key, amount in drift.items() if key not in opened}
+            post_entries([
+                ('opening_balance', f'user:{key[0]}', [(platform('opening_balance'), -amount), (key, amount)])
+                for key, amount in to_open.items()
+            ])
+            self.stdout.write(f"booked {len(to_open)} opening balance(s)")
+            drift = {key: amount for key, amount in drift.items() if key not in to_open}
+
+        for (user_id, kind), difference in sorted(drift.items(), key=lambda item: item[0][0])[:20]:
+            self.stderr.write(f"user {user_id} {kind}: account_balance differs from ledger by {difference}")
+        style = self.style.SUCCESS if not drift else self.style.WARNING
+        self.stdout.write(style(f"{len(drift)} wallet(s) out of balance"))
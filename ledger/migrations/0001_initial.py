@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(max_length=30)),
+                ('reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ledger_entry',
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('investor_wallet', 'Investor wallet'), ('borrower_wallet', 'Borrower wallet'), ('loan_escrow', 'Loan escrow'), ('platform_fees', 'Platform fees'), ('repayments', 'Repayments'), ('withdrawals_pending', 'Withdrawals pending'), ('stripe', 'Stripe'), ('opening_balance', 'Opening balance')], max_length=30)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_accounts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'ledger_account',
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='postings', to='ledger.ledgeraccount')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='postings', to='ledger.ledgerentry')),
+            ],
+            options={
+                'db_table': 'ledger_posting',
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('last_posting_id', models.BigIntegerField()),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='ledger.ledgeraccount')),
+            ],
+            options={
+                'db_table': 'ledger_snapshot',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ledgeraccount',
+            constraint=models.UniqueConstraint(fields=('user', 'kind'), name='ledger_account_user_kind_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgeraccount',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('kind',), name='ledger_account_platform_kind_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerposting',
+            index=models.Index(fields=['account', 'id'], name='ledger_posting_account_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgersnapshot',
+            index=models.Index(fields=['account', '-last_posting_id'], name='ledger_snapshot_latest_idx'),
+        ),
+    ]
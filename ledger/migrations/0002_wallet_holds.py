@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wallet_kind', models.CharField(max_length=30)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('purpose', models.CharField(max_length=30)),
+                ('status', models.CharField(choices=[('held', 'Held'), ('captured', 'Captured'), ('released', 'Released')], default='held', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='wallet_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'wallet_hold',
+                'indexes': [models.Index(condition=models.Q(('status', 'held')), fields=['user'], name='wallet_hold_open_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0002_wallet_holds'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('entry_type__in', ['deposit', 'emi_payment', 'loan_payout', 'loan_fee', 'investment_return'])), fields=('entry_type', 'reference'), name='ledger_entry_once_uniq'),
+        ),
+    ]
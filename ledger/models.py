@@ -0,0 +1,147 @@
+from django.db import models
+
+from users.models import User
+
+
+class LedgerAccount(models.Model):
+    """A wallet (user set) or a platform account (user null) that postings are booked against."""
+    user = models.ForeignKey(User, on_delete=models.PROTECT, null=True, blank=True, related_name='ledger_accounts')
+    KIND_CHOICES = [
+        ('investor_wallet', 'Investor wallet'),
+        ('borrower_wallet', 'Borrower wallet'),
+        ('loan_escrow', 'Loan escrow'),
+        ('platform_fees', 'Platform fees'),
+        ('repayments', 'Repayments'),
+        ('withdrawals_pending', 'Withdrawals pending'),
+        ('stripe', 'Stripe'),
+        ('opening_balance', 'Opening balance'),
+    ]
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_account'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind'], name='ledger_account_user_kind_uniq'),
+            models.UniqueConstraint(fields=['kind'], condition=models.Q(user__isnull=True),
+                                    name='ledger_account_platform_kind_uniq'),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"user: '{self.user_id or ''}', "
+            f"kind: '{self.kind or ''}', "
+            "}"
+        )
+
+
+class LedgerEntry(models.Model):
+    """One business event; its postings always sum to zero."""
+    entry_type = models.CharField(max_length=30)
+    # Payment id, loan, withdrawal or investment the entry belongs to
+    reference = models.CharField(max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_entry'
+        constraints = [
+            # Entries booked once per payment, loan or investment: a second credit fails instead of paying twice.
+            # Investments, refunds and withdrawal entries legitimately repeat a reference
+            models.UniqueConstraint(
+                fields=['entry_type', 'reference'], name='ledger_entry_once_uniq',
+                condition=models.Q(entry_type__in=['deposit', 'emi_payment', 'loan_payout', 'loan_fee',
+                                                   'investment_return'])
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"entry_type: '{self.entry_type or ''}', "
+            f"reference: '{self.reference or ''}', "
+            "}"
+        )
+
+
+class LedgerPosting(models.Model):
+    entry = models.ForeignKey(LedgerEntry, on_delete=models.PROTECT, related_name='postings')
+    account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name='postings')
+    # Positive credits the account, negative debits it
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        db_table = 'ledger_posting'
+        indexes = [
+            # Balance reads sum an account's postings after its latest snapshot
+            models.Index(fields=['account', 'id'], name='ledger_posting_account_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Ledger postings are append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return (
+            "{"
+            f"account: '{self.account_id or ''}', "
+            f"amount: '{self.amount or ''}', "
+            "}"
+        )
+
+
+class LedgerSnapshot(models.Model):
+    """An account's balance including every posting up to last_posting_id."""
+    account = models.ForeignKey(LedgerAccount, on_delete=models.CASCADE, related_name='snapshots')
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    last_posting_id = models.BigIntegerField()
+    taken_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ledger_snapshot'
+        indexes = [
+            models.Index(fields=['account', '-last_posting_id'], name='ledger_snapshot_latest_idx'),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"account: '{self.account_id or ''}', "
+            f"balance: '{self.balance or ''}', "
+            f"last_posting_id: '{self.last_posting_id or ''}', "
+            "}"
+        )
+
+
+class WalletHold(models.Model):
+    """Funds reserved off a wallet. The balance was already reduced when the hold was placed;
+    capturing sends the money on, releasing returns it to the wallet."""
+    user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='wallet_holds')
+    wallet_kind = models.CharField(max_length=30)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    purpose = models.CharField(max_length=30)
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('captured', 'Captured'),
+        ('released', 'Released'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'wallet_hold'
+        indexes = [
+            models.Index(fields=['user'], name='wallet_hold_open_idx', condition=models.Q(status='held')),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"user: '{self.user_id or ''}', "
+            f"amount: '{self.amount or ''}', "
+            f"purpose: '{self.purpose or ''}', "
+            f"status: '{self.status or ''}', "
+            "}"
+        )
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from ledger.models import LedgerAccount, LedgerEntry, LedgerPosting, LedgerSnapshot
+
+
+class UnbalancedEntry(ValueError):
+    """Raised when an entry's postings do not sum to zero."""
+
+
+# Accounts are addressed as (user_id, kind) keys; platform accounts have no user
+def platform(kind):
+    return None, kind
+
+
+def investor_wallet(user_id):
+    return user_id, 'investor_wallet'
+
+
+def borrower_wallet(user_id):
+    return user_id, 'borrower_wallet'
+
+
+def wallet(user):
+    return borrower_wallet(user.pk) if user.role == 'borrower' else investor_wallet(user.pk)
+
+
+def _lookup(key):
+    user_id, kind = key
+    return Q(user_id=user_id, kind=kind) if user_id is not None else Q(user__isnull=True, kind=kind)
+
+
+def _account_ids(keys):
+    """Resolve (user_id, kind) keys to account ids with one query, creating missing accounts."""
+    keys = set(keys)
+    lookup = Q()
+    for key in keys:
+        lookup |= _lookup(key)
+
+    ids = {(user_id, kind): pk for pk, user_id, kind in
+           LedgerAccount.objects.filter(lookup).values_list('id', 'user_id', 'kind')}
+    missing = keys - ids.keys()
+    if missing:
+        # ignore_conflicts: a concurrent first posting may create the same account
+        LedgerAccount.objects.bulk_create(
+            [LedgerAccount(user_id=user_id, kind=kind) for user_id, kind in missing], ignore_conflicts=True
+        )
+        return _account_ids(keys)
+    return ids
+
+
+@transaction.atomic(savepoint=False)
+def post_entries(entries):
+    """Book several entries at once. ``entries`` holds (entry_type, reference, legs) tuples,
+    legs being (account key, amount) pairs that must sum to zero.
+
+    Inserts only: two bulk INSERTs plus the account lookup, whatever the number of entries.
+    """
+    entries = [
+        (entry_type, reference, [(key, Decimal(amount)) for key, amount in legs if amount])
+        for entry_type, reference, legs in entries
+    ]
+    for entry_type, reference, legs in entries:
+        if sum(amount for _, amount in legs) != 0:
+            raise UnbalancedEntry(f"{entry_type} entry {reference} does not balance")
+    entries = [entry for entry in entries if entry[2]]
+    if not entries:
+        return []
+
+    account_ids = _account_ids(key for _, _, legs in entries for key, _ in legs)
+    created = LedgerEntry.objects.bulk_create([
+        LedgerEntry(entry_type=entry_type, reference=reference) for entry_type, reference, _ in entries
+    ])
+    LedgerPosting.objects.bulk_create([
+        LedgerPosting(entry=entry, account_id=account_ids[key], amount=amount)
+        for entry, (_, _, legs) in zip(created, entries)
+        for key, amount in legs
+    ])
+    return created
+
+
+def post(entry_type, reference, legs):
+    created = post_entries([(entry_type, reference, legs)])
+    return created[0] if created else None
+
+
+def transfer(entry_type, reference, source, destination, amount):
+    """Move ``amount`` from the ``source`` account to ``destination``."""
+    return post(entry_type, reference, [(source, -Decimal(amount)), (destination, Decimal(amount))])
+
+
+def balance(key):
+    """Latest snapshot plus the postings booked after it: index lookups only, however long the history."""
+    account_id = LedgerAccount.objects.filter(_lookup(key)).values_list('id', flat=True).first()
+    if account_id is None:
+        return Decimal('0')
+    snapshot = LedgerSnapshot.objects.filter(account_id=account_id).order_by('-last_posting_id').values_list(
+        'balance', 'last_posting_id'
+    ).first()
+    snapshot_balance, last_posting_id = snapshot or (Decimal('0'), 0)
+    since = LedgerPosting.objects.filter(account_id=account_id, id__gt=last_posting_id).aggregate(
+        total=Sum('amount')
+    )['total']
+    return snapshot_balance + (since or 0)
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.test import TestCase
+
+from investor.models import InvestorBalance
+from ledger.models import LedgerEntry, LedgerPosting, WalletHold
+from ledger.postings import balance, platform, investor_wallet, post
+from ledger.wallets import debit, debit_split, credit, place_hold, capture_holds, release_holds, \
+    InsufficientFunds, HoldStateError
+from users.models import User
+
+
+def make_investor(amount):
+    user = User.objects.create_user(email=f'investor{User.objects.count()}@example.com',
+                                    phone_number=str(User.objects.count()), password='x', role='investor')
+    InvestorBalance.objects.create(user=user, account_balance=amount)
+    post('opening_balance', f'user:{user.pk}',
+         [(platform('opening_balance'), -Decimal(amount)), (investor_wallet(user.pk), Decimal(amount))])
+    return user
+
+
+class WalletTests(TestCase):
+    def setUp(self):
+        self.user = make_investor(100)
+        self.wallet = investor_wallet(self.user.pk)
+
+    def account_balance(self):
+        return InvestorBalance.objects.get(user=self.user).account_balance
+
+    def assertLedgerMatches(self):
+        self.assertEqual(balance(self.wallet), self.account_balance())
+        for entry_id, total in LedgerPosting.objects.values_list('entry').annotate(total=Sum('amount')):
+            self.assertEqual(total, 0, f"entry {entry_id} does not balance")
+
+    def test_debit_takes_the_amount_and_books_it(self):
+        debit(self.wallet, Decimal('40'), 'investment', 'loan:1', platform('loan_escrow'))
+        self.assertEqual(self.account_balance(), Decimal('60'))
+        self.assertEqual(balance(platform('loan_escrow')), Decimal('40'))
+        self.assertLedgerMatches()
+
+    def test_debit_beyond_the_balance_changes_nothing(self):
+        with self.assertRaises(InsufficientFunds):
+            debit(self.wallet, Decimal('100.01'), 'investment', 'loan:1', platform('loan_escrow'))
+        self.assertEqual(self.account_balance(), Decimal('100'))
+        self.assertFalse(LedgerEntry.objects.filter(entry_type='investment').exists())
+
+    def test_debit_split_books_one_entry_per_leg(self):
+        debit_split(self.wallet, [('loan:1', Decimal('30')), ('loan:2', Decimal('20'))], 'investment',
+                    platform('loan_escrow'))
+        self.assertEqual(self.account_balance(), Decimal('50'))
+        self.assertEqual(
+            sorted(LedgerEntry.objects.filter(entry_type='investment').values_list('reference', flat=True)),
+            ['loan:1', 'loan:2']
+        )
+        self.assertLedgerMatches()
+
+    def test_debit_split_is_all_or_nothing(self):
+        with self.assertRaises(InsufficientFunds):
+            debit_split(self.wallet, [('loan:1', Decimal('60')), ('loan:2', Decimal('60'))], 'investment',
+                        platform('loan_escrow'))
+        self.assertEqual(self.account_balance(), Decimal('100'))
+
+    def test_credit_pays_into_the_wallet(self):
+        credit(self.wallet, Decimal('25'), 'investment_return', 'investment:1', platform('repayments'))
+        self.assertEqual(self.account_balance(), Decimal('125'))
+        self.assertLedgerMatches()
+
+    def test_captured_hold_leaves_the_wallet(self):
+        hold = place_hold(self.wallet, Decimal('70'), 'withdrawal')
+        self.assertEqual(self.account_balance(), Decimal('30'))
+        capture_holds([hold], 'withdrawal', 'po_1', platform('stripe'))
+        self.assertEqual(self.account_balance(), Decimal('30'))
+        self.assertEqual(WalletHold.objects.get(pk=hold.pk).status, 'captured')
+        self.assertEqual(balance(platform('withdrawals_pending')), 0)
+        self.assertLedgerMatches()
+
+    def test_released_hold_returns_to_the_wallet(self):
+        hold = place_hold(self.wallet, Decimal('70'), 'withdrawal')
+        release_holds([hold], 'withdrawal_release', 'withdrawal:1')
+        self.assertEqual(self.account_balance(), Decimal('100'))
+        self.assertEqual(balance(platform('withdrawals_pending')), 0)
+        self.assertLedgerMatches()
+
+    def test_hold_resolves_only_once(self):
+        hold = place_hold(self.wallet, Decimal('70'), 'withdrawal')
+        release_holds([hold], 'withdrawal_release', 'withdrawal:1')
+        stale = WalletHold.objects.get(pk=hold.pk)
+        stale.status = 'held'
+        # A resolve that finds the hold already resolved rolls its caller back
+        with self.assertRaises(HoldStateError), transaction.atomic():
+            capture_holds([stale], 'withdrawal', 'po_1', platform('stripe'))
+        with self.assertRaises(HoldStateError), transaction.atomic():
+            release_holds([stale], 'withdrawal_release', 'withdrawal:1')
+        self.assertEqual(self.account_balance(), Decimal('100'))
+
+    def test_hold_beyond_the_balance_is_refused(self):
+        with self.assertRaises(InsufficientFunds):
+            place_hold(self.wallet, Decimal('101'), 'withdrawal')
+        self.assertFalse(WalletHold.objects.exists())
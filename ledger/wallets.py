@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from borrower.models import Borrower
+from investor.models import InvestorBalance
+from ledger.models import WalletHold
+from ledger.postings import post_entries, transfer, platform
+
+# Platform account that holds reserved funds, per hold purpose
+HOLD_ACCOUNTS = {
+    'withdrawal': platform('withdrawals_pending'),
+}
+
+
+class InsufficientFunds(Exception):
+    """The wallet's balance does not cover the amount."""
+
+
+class HoldStateError(Exception):
+    """A hold was captured or released twice."""
+
+
+def _balances(key):
+    user_id, kind = key
+    if kind == 'borrower_wallet':
+        return Borrower.objects.filter(user_id=user_id)
+    return InvestorBalance.objects.filter(user_id=user_id)
+
+
+def _take(key, amount):
+    # One round trip: the WHERE clause is the balance check, so concurrent debits cannot overdraw
+    return bool(_balances(key).filter(account_balance__gte=amount).update(
+        account_balance=F('account_balance') - amount))
+
+
+def _give(key, amount):
+    if not _balances(key).update(account_balance=F('account_balance') + amount) and key[1] == 'investor_wallet':
+        InvestorBalance.objects.create(user_id=key[0], account_balance=amount)
+
+
+# The refusals below are raised after the atomic block has exited cleanly: raised inside
+# a savepoint-less block they would mark the caller's whole transaction for rollback
+
+def debit(key, amount, entry_type, reference, destination):
+    """Take ``amount`` out of a wallet and book it to the ``destination`` ledger account.
+
+    Raises InsufficientFunds, leaving the balance untouched, when the wallet cannot cover it.
+    """
+    with transaction.atomic(savepoint=False):
+        taken = _take(key, amount)
+        if taken:
+            transfer(entry_type, reference, key, destination, amount)
+    if not taken:
+        raise InsufficientFunds()
+
+
+def debit_split(key, legs, entry_type, destination):
+    """Take the total of ``legs``, (reference, amount) pairs, out of a wallet in one conditional
+    UPDATE and book one entry per leg. Raises InsufficientFunds when the wallet cannot cover the total.
+    """
+    with transaction.atomic(savepoint=False):
+        taken = _take(key, sum(amount for _, amount in legs))
+        if taken:
+            post_entries([(entry_type, reference, [(key, -amount), (destination, amount)])
+                          for reference, amount in legs])
+    if not taken:
+        raise InsufficientFunds()
+
+
+@transaction.atomic(savepoint=False)
+def credit(key, amount, entry_type, reference, source):
+    """Pay ``amount`` into a wallet from the ``source`` ledger account."""
+    _give(key, amount)
+    transfer(entry_type, reference, source, key, amount)
+
+
+def place_hold(key, amount, purpose):
+    """Reserve ``amount`` off a wallet for later capture or release. Raises InsufficientFunds."""
+    with transaction.atomic(savepoint=False):
+        if _take(key, amount):
+            hold = WalletHold.objects.create(user_id=key[0], wallet_kind=key[1], amount=amount, purpose=purpose)
+            transfer(f'{purpose}_hold', f'hold:{hold.id}', key, HOLD_ACCOUNTS[purpose], amount)
+            return hold
+    raise InsufficientFunds()
+
+
+def _resolve(holds, status):
+    # Conditional on 'held' so a hold can only ever be captured or released once
+    updated = WalletHold.objects.filter(id__in=[hold.id for hold in holds], status='held').update(
+        status=status, resolved_at=timezone.now()
+    )
+    if updated != len(holds):
+        raise HoldStateError("Hold was already captured or released")
+    for hold in holds:
+        hold.status = status
+
+
+@transaction.atomic(savepoint=False)
+def capture_holds(holds, entry_type, reference, destination):
+    """Send held funds on to ``destination``. The wallet balance does not change again."""
+    if not holds:
+        return
+    _resolve(holds, 'captured')
+    post_entries([
+        (entry_type, reference, [(HOLD_ACCOUNTS[purpose], -total), (destination, total)])
+        for purpose, total in _totals(holds, lambda hold: hold.purpose).items()
+    ])
+
+
+@transaction.atomic(savepoint=False)
+def release_holds(holds, entry_type, reference):
+    """Return held funds to the wallets they were taken from."""
+    if not holds:
+        return
+    _resolve(holds, 'released')
+    totals = _totals(holds, lambda hold: ((hold.user_id, hold.wallet_kind), hold.purpose))
+    for (key, _), total in totals.items():
+        _give(key, total)
+    post_entries([
+        (entry_type, reference, [(HOLD_ACCOUNTS[purpose], -total), (key, total)])
+        for (key, purpose), total in totals.items()
+    ])
+
+
+def _totals(holds, group):
+    totals = {}
+    for hold in holds:
+        totals[group(hold)] = totals.get(group(hold), Decimal('0')) + hold.amount
+    return totals
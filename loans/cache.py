@@ -0,0 +1,30 @@
+from django.db import transaction
+
+from enhancefund.cache_utils import bump_version
+
+MARKETPLACE_NAMESPACE = 'marketplace'
+
+
+def loan_namespace(loan_id):
+    return f"loan:{loan_id}"
+
+
+def invalidate_loans(*loan_ids):
+    """Drop the marketplace pages and the detail payloads of the given loans.
+
+    The bump runs after commit so a concurrent reader cannot cache pre-commit
+    data under the new version.
+    """
+    namespaces = [MARKETPLACE_NAMESPACE] + [loan_namespace(loan_id) for loan_id in loan_ids]
+    transaction.on_commit(lambda: bump_version(*namespaces))
+
+
+def portfolio_namespace(user_id):
+    return f"portfolio:{user_id}"
+
+
+def invalidate_portfolios(*user_ids):
+    """Change the version stamp of the users' portfolio and chart responses, after commit."""
+    namespaces = [portfolio_namespace(user_id) for user_id in set(user_ids)]
+    if namespaces:
+        transaction.on_commit(lambda: bump_version(*namespaces))
@@ -0,0 +1,349 @@
+import random
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction, OperationalError
+from django.db.models import F
+from django.utils import timezone
+
+from investor.models import InvestorBalance
+from ledger.postings import transfer, platform, investor_wallet, borrower_wallet
+from ledger.wallets import debit, debit_split, credit, InsufficientFunds
+from loans.cache import invalidate_loans
+from loans.models import Loan, LoanCapacityExceeded, Investment, Transaction
+from loans.portfolio import record_investments, INVESTOR_RETURN_RATIO
+from loans.rollups import rollup_investments, rollup_transactions
+from loans.schedules import assign_due_dates
+
+# Postgres serialization failure / deadlock detected: safe to replay the whole transaction
+RETRYABLE_PGCODES = {'40001', '40P01'}
+MAX_FUNDING_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 0.05
+
+
+class FundingError(Exception):
+    """Base class for investments the funding engine refuses."""
+
+
+class LoanNotFound(FundingError):
+    def __init__(self):
+        super().__init__("Loan not found")
+
+
+class LoanAlreadyFulfilled(FundingError):
+    def __init__(self):
+        super().__init__("Loan is already fulfilled")
+
+
+class RemainingAmountExceeded(FundingError):
+    def __init__(self, remaining_amount):
+        self.remaining_amount = remaining_amount
+        super().__init__(
+            f"Investment amount exceeds the remaining loan amount. Only {remaining_amount} is available."
+        )
+
+
+class InsufficientBalance(FundingError):
+    def __init__(self):
+        super().__init__("Insufficient wallet balance")
+
+
+class InvalidAmount(FundingError):
+    def __init__(self):
+        super().__init__("Investment amount must be a positive number")
+
+
+class InvalidNetReturn(FundingError):
+    def __init__(self):
+        super().__init__("Net return must be a non-negative amount no greater than the loan can pay")
+
+
+def to_amount(value):
+    try:
+        amount = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError, TypeError):
+        raise InvalidAmount()
+    if not amount.is_finite() or amount <= 0:
+        raise InvalidAmount()
+    return amount
+
+
+def to_net_return(value):
+    """The client's expected net return as cents, or None when it was not sent."""
+    if value is None or value == '':
+        return None
+    try:
+        net_return = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError, TypeError):
+        raise InvalidNetReturn()
+    if not net_return.is_finite() or net_return < 0:
+        raise InvalidNetReturn()
+    return net_return
+
+
+def max_net_return(loan, amount):
+    """Principal plus the investor's share of the interest over the whole term."""
+    return amount * (1 + loan.interest_rate * INVESTOR_RETURN_RATIO * loan.term_months / Decimal('1200'))
+
+
+def _is_retryable(error):
+    return getattr(error.__cause__, 'pgcode', None) in RETRYABLE_PGCODES
+
+
+def run_with_retries(func, *args, **kwargs):
+    """Run ``func`` in its own transaction, replaying it on deadlocks and serialization failures."""
+    for attempt in range(1, MAX_FUNDING_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as e:
+            if attempt == MAX_FUNDING_ATTEMPTS or not _is_retryable(e):
+                raise
+            # Exponential backoff with full jitter so retried transactions do not collide again
+            time.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def complete_funding(loan):
+    """Approve a fully funded loan and pay the borrower. Runs inside the funding transaction."""
+    loan.is_fulfill = True
+    loan.status = 'approved'
+    loan.save(update_fields=['is_fulfill', 'status', 'updated_at'])
+    assign_due_dates(loan)
+
+    # The escrowed principal goes to the borrower, less the platform fee
+    credit(borrower_wallet(loan.borrower.user_id), loan.loan_amount, 'loan_payout', f'loan:{loan.id}',
+           platform('loan_escrow'))
+    transfer('loan_fee', f'loan:{loan.id}', platform('loan_escrow'), platform('platform_fees'),
+             loan.amount - loan.loan_amount)
+    Transaction.objects.create(
+        user_id=loan.borrower.user_id,
+        transaction_type='deposit',
+        amount=loan.loan_amount,
+        payment_id='internal'
+    )
+
+
+def _closing_datetime(term_months):
+    closed_date = date.today() + relativedelta(months=term_months)
+    return timezone.make_aware(datetime.combine(closed_date, datetime.min.time()))
+
+
+def _fund_loan(investor, loan_id, amount, net_return):
+    try:
+        loan = Loan.objects.select_related('borrower').get(id=loan_id)
+    except (Loan.DoesNotExist, ValueError, TypeError):
+        raise LoanNotFound()
+    if loan.is_fulfill:
+        raise LoanAlreadyFulfilled()
+    # Paid out at closure, so a client-sent figure can never exceed what the loan earns
+    if net_return is not None and net_return > max_net_return(loan, amount):
+        raise InvalidNetReturn()
+
+    # Conditional debit: the WHERE clause is the balance check, so two requests cannot both spend it
+    try:
+        debit(investor_wallet(investor.pk), amount, 'investment', f'loan:{loan.id}', platform('loan_escrow'))
+    except InsufficientFunds:
+        raise InsufficientBalance()
+
+    investment = Investment(
+        loan=loan,
+        investor=investor,
+        amount=amount,
+        net_return=net_return,
+        closed_at=_closing_datetime(loan.term_months)
+    )
+    try:
+        # Takes the loan row lock and applies the capacity check in one UPDATE
+        investment.save()
+    except LoanCapacityExceeded:
+        loan.refresh_from_db(fields=['funded_amount', 'is_fulfill'])
+        if loan.is_fulfill:
+            raise LoanAlreadyFulfilled()
+        raise RemainingAmountExceeded(loan.amount - loan.funded_amount)
+
+    Transaction.objects.create(
+        user=investor,
+        transaction_type='investment',
+        amount=amount,
+        payment_id='internal'
+    )
+
+    if loan.funded_amount == loan.amount:
+        complete_funding(loan)
+    return investment
+
+
+def fund_loan(investor, loan_id, amount, net_return=None):
+    """Invest ``amount`` from ``investor``'s wallet into a loan.
+
+    Everything happens in one transaction: a conditional debit of the wallet, a
+    conditional bump of the loan's funded total (which holds the loan row lock
+    until commit), the investment and transaction rows, and the loan approval
+    when the last cent is funded. Raises a FundingError subclass when refused.
+    """
+    amount = to_amount(amount)
+    net_return = to_net_return(net_return)
+    return run_with_retries(_fund_loan, investor, loan_id, amount, net_return)
+
+
+def _validate_batch(investor, items):
+    """Check every (loan, amount) pair with one loan query and one balance query.
+
+    Returns (accepted, results): accepted maps loan id -> (loan, amount, result)
+    for the items that passed, results holds one entry per input item in input order.
+    """
+    results = []
+    parsed = []
+    seen = set()
+    for item in items:
+        loan_id = item.get('loan') if isinstance(item, dict) else None
+        result = {'loan': loan_id, 'amount': item.get('amount') if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            loan_id = int(loan_id)
+            amount = to_amount(result['amount'])
+        except FundingError as e:
+            result.update(status='failed', message=str(e))
+            continue
+        except (TypeError, ValueError):
+            result.update(status='failed', message=str(LoanNotFound()))
+            continue
+        if loan_id in seen:
+            result.update(status='failed', message="Duplicate loan in batch")
+            continue
+        seen.add(loan_id)
+        result['loan'] = loan_id
+        parsed.append((result, loan_id, amount))
+
+    loans = Loan.objects.select_related('borrower').in_bulk([loan_id for _, loan_id, _ in parsed])
+    balance = InvestorBalance.objects.filter(user=investor).values_list('account_balance', flat=True).first() or 0
+
+    accepted = {}
+    budget = Decimal(balance)
+    for result, loan_id, amount in parsed:
+        loan = loans.get(loan_id)
+        if loan is None:
+            error = LoanNotFound()
+        elif loan.is_fulfill:
+            error = LoanAlreadyFulfilled()
+        elif amount > loan.amount - loan.funded_amount:
+            error = RemainingAmountExceeded(loan.amount - loan.funded_amount)
+        elif amount > budget:
+            error = InsufficientBalance()
+        else:
+            budget -= amount
+            result['amount'] = amount
+            accepted[loan_id] = (loan, amount, result)
+            continue
+        result.update(status='failed', message=str(error))
+    return accepted, results
+
+
+def _fund_batch(investor, accepted):
+    """Place the accepted items. Returns (investments, outcomes).
+
+    ``outcomes`` maps every accepted loan id to its (status, message). It is built
+    afresh on each call, so when run_with_retries replays the transaction no
+    outcome from the rolled-back attempt is reported.
+    """
+    outcomes = {}
+    # One conditional debit for the whole batch, booked per loan; wallet row first, same lock order as fund_loan
+    try:
+        debit_split(investor_wallet(investor.pk), [(f'loan:{loan_id}', amount) for loan_id, (_, amount, _) in
+                                                   sorted(accepted.items())], 'investment', platform('loan_escrow'))
+    except InsufficientFunds:
+        return [], {loan_id: ('failed', str(InsufficientBalance())) for loan_id in accepted}
+
+    # Loans in id order so concurrent batches always lock rows in the same sequence
+    placed = []
+    for loan_id in sorted(accepted):
+        loan, amount, _ = accepted[loan_id]
+        updated = Loan.objects.filter(
+            pk=loan_id,
+            is_fulfill=False,
+            funded_amount__lte=F('amount') - amount
+        ).update(funded_amount=F('funded_amount') + amount)
+        if updated:
+            placed.append((loan, amount))
+        else:
+            credit(investor_wallet(investor.pk), amount, 'investment_refund', f'loan:{loan_id}',
+                   platform('loan_escrow'))
+            outcomes[loan_id] = ('failed', "Loan no longer has enough remaining amount")
+
+    if not placed:
+        return [], outcomes
+
+    placed_ids = [loan.id for loan, _ in placed]
+    existing = set(Investment.objects.filter(
+        investor=investor, loan_id__in=placed_ids
+    ).values_list('loan_id', flat=True))
+    new_ids = [loan_id for loan_id in placed_ids if loan_id not in existing]
+    if new_ids:
+        Loan.objects.filter(id__in=new_ids).update(investor_count=F('investor_count') + 1)
+
+    # bulk_create skips Investment.save() and post_save, so the counters, summary and rollups are applied here
+    investments = Investment.objects.bulk_create([
+        Investment(loan=loan, investor=investor, amount=amount, closed_at=_closing_datetime(loan.term_months))
+        for loan, amount in placed
+    ])
+    record_investments(investor.pk, investments, new_loans=len(new_ids))
+    rollup_investments(investments)
+    rollup_transactions(Transaction.objects.bulk_create([
+        Transaction(user=investor, transaction_type='investment', amount=amount, payment_id='internal')
+        for _, amount in placed
+    ]))
+
+    funded = dict(Loan.objects.filter(id__in=placed_ids).values_list('id', 'funded_amount'))
+    for loan, amount in placed:
+        loan.funded_amount = funded[loan.id]
+        if loan.funded_amount == loan.amount:
+            complete_funding(loan)
+        outcomes[loan.id] = ('invested', "Investment created successfully")
+
+    invalidate_loans(*placed_ids)
+    transaction.on_commit(lambda: _notify_batch(investor, placed))
+    return investments, outcomes
+
+
+def _notify_batch(investor, placed):
+    from users.signals import create_notification
+
+    total = sum(amount for _, amount in placed)
+    create_notification(
+        user=investor,
+        notification_type='investment_made',
+        title='Investments Successful',
+        message=f'You have successfully invested ${total:.2f} across {len(placed)} loans.',
+        related_type='investment'
+    )
+    for loan, amount in placed:
+        create_notification(
+            user=loan.borrower.user,
+            notification_type='loan_funded',
+            title='Loan Funding Update',
+            message=f'Your loan request has received ${amount:.2f} in funding. '
+                    f'Total funded: ${loan.funded_amount:.2f} / ${loan.amount:.2f}. '
+                    f'Remaining: ${loan.amount - loan.funded_amount:.2f}',
+            related_id=loan.id,
+            related_type='loan'
+        )
+
+
+def fund_loans_batch(investor, items):
+    """Invest in several loans at once.
+
+    Every item is validated up front with a single loan query. The accepted
+    items are written in one transaction: one wallet debit, one conditional
+    capacity UPDATE per loan, and bulk inserts for the investments and
+    transactions. Returns (investments, results) where results reports the
+    outcome of every input item in order.
+    """
+    accepted, results = _validate_batch(investor, items)
+    investments = []
+    if accepted:
+        investments, outcomes = run_with_retries(_fund_batch, investor, accepted)
+        for loan_id, (status, message) in outcomes.items():
+            accepted[loan_id][2].update(status=status, message=message)
+    return investments, results
@@ -0,0 +1,142 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Min, Sum
+
+from borrower.models import Borrower
+from investor.models import InvestorBalance
+from ledger.models import LedgerAccount, LedgerEntry, LedgerPosting, LedgerSnapshot, WalletHold
+from ledger.postings import post_entries, platform, investor_wallet, balance
+from loans.funding import fund_loan, FundingError
+from loans.models import Loan, Investment
+from loans.schedules import create_schedule
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Fire N parallel investors at one loan through the funding engine and report "
+            "throughput, latency percentiles and whether the books still balance")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--investors', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--loan-amount', type=Decimal, default=Decimal('1000.00'))
+        parser.add_argument('--invest-amount', type=Decimal, default=Decimal('50.00'))
+        parser.add_argument('--keep', action='store_true', help="Keep the generated users and loan")
+
+    def create_fixtures(self, tag, options):
+        borrower_user = User.objects.create_user(
+            email=f"bench-{tag}-borrower@example.com", phone_number=f"bench-{tag}-b", role='borrower'
+        )
+        borrower = Borrower.objects.create(user=borrower_user, employment_status='employed', annual_income=0)
+        loan = Loan.objects.create(
+            borrower=borrower,
+            amount=options['loan_amount'],
+            loan_amount=options['loan_amount'],
+            term_months=12,
+            payment_frequency='monthly',
+            status='processing',
+            loan_purpose='benchmark',
+            interest_rate=Decimal('10.00'),
+            total_payable=options['loan_amount']
+        )
+        create_schedule(loan, loan.total_payable, 'monthly')
+        investors = []
+        for i in range(options['investors']):
+            investor = User.objects.create_user(
+                email=f"bench-{tag}-{i}@example.com", phone_number=f"bench-{tag}-{i}", role='investor'
+            )
+            InvestorBalance.objects.create(user=investor, account_balance=options['invest_amount'])
+            investors.append(investor)
+        # Book the starting balances so the wallets' ledger accounts agree with account_balance
+        post_entries([
+            ('opening_balance', f'user:{investor.pk}',
+             [(platform('opening_balance'), -options['invest_amount']),
+              (investor_wallet(investor.pk), options['invest_amount'])])
+            for investor in investors
+        ])
+        return loan, investors
+
+    @transaction.atomic
+    def delete_fixtures(self, tag, loan):
+        users = User.objects.filter(email__startswith=f"bench-{tag}-")
+        # Ledger rows are PROTECTed, so the run's entries go first: everything booked for the
+        # loan or touching a bench wallet, platform legs included
+        entries = LedgerEntry.objects.filter(reference=f'loan:{loan.id}') | LedgerEntry.objects.filter(
+            postings__account__user__in=users)
+        entry_ids = list(entries.values_list('id', flat=True).distinct())
+        postings = LedgerPosting.objects.filter(entry_id__in=entry_ids)
+        first_posting = postings.aggregate(first=Min('id'))['first']
+        if first_posting is not None:
+            # Snapshots taken since then include the deleted postings
+            LedgerSnapshot.objects.filter(last_posting_id__gte=first_posting).delete()
+        postings.delete()
+        LedgerEntry.objects.filter(id__in=entry_ids).delete()
+        WalletHold.objects.filter(user__in=users).delete()
+        LedgerAccount.objects.filter(user__in=users).delete()
+        users.delete()
+
+    def invest(self, investor, loan_id, amount):
+        started = time.perf_counter()
+        try:
+            fund_loan(investor, loan_id, amount)
+            outcome = 'funded'
+        except FundingError as e:
+            outcome = type(e).__name__
+        except Exception as e:
+            outcome = f"error: {e}"
+        finally:
+            connection.close()
+        return outcome, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        loan, investors = self.create_fixtures(tag, options)
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(
+                    lambda investor: self.invest(investor, loan.id, options['invest_amount']), investors
+                ))
+            elapsed = time.perf_counter() - started
+
+            outcomes = {}
+            for outcome, _ in results:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            latencies = sorted(latency * 1000 for _, latency in results)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+            loan.refresh_from_db()
+            invested = Investment.objects.filter(loan=loan).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            balances = InvestorBalance.objects.filter(user__in=investors).aggregate(
+                total=Sum('account_balance'))['total'] or Decimal('0')
+            funded_by_investors = options['invest_amount'] * len(investors) - balances
+            wallets = dict(InvestorBalance.objects.filter(user__in=investors).values_list('user_id', 'account_balance'))
+
+            checks = {
+                'not oversubscribed': invested <= loan.amount,
+                'counter matches investments': loan.funded_amount == invested,
+                'wallet debits match investments': funded_by_investors == invested,
+                'ledger matches wallets': all(balance(investor_wallet(pk)) == amount for pk, amount in wallets.items()),
+                'fulfil flag consistent': loan.is_fulfill == (invested == loan.amount),
+            }
+
+            self.stdout.write(f"requests:   {len(results)} in {elapsed:.3f}s "
+                              f"({len(results) / elapsed:.1f} req/s)")
+            self.stdout.write(f"latency ms: p50={statistics.median(latencies):.1f} p99={p99:.1f} "
+                              f"max={latencies[-1]:.1f}")
+            self.stdout.write(f"outcomes:   {outcomes}")
+            self.stdout.write(f"loan:       funded {loan.funded_amount} / {loan.amount}, "
+                              f"{loan.investor_count} investors, fulfilled={loan.is_fulfill}")
+            for name, passed in checks.items():
+                style = self.style.SUCCESS if passed else self.style.ERROR
+                self.stdout.write(style(f"{'PASS' if passed else 'FAIL'}  {name}"))
+        finally:
+            if not options['keep']:
+                self.delete_fixtures(tag, loan)
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from enhancefund.Constant import WITHDRAWAL_BATCH_SIZE, WITHDRAWAL_PAYOUT_WINDOW_SECONDS
+from loans.withdrawals import claim_withdrawals, claim_payout_batches, claim_retried_withdrawals, \
+    form_payout_batches, process_withdrawal
+
+
+class Command(BaseCommand):
+    help = ("Pay out queued withdrawals through Stripe. Rows are claimed with SKIP LOCKED, "
+            "so several workers can run side by side")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=WITHDRAWAL_BATCH_SIZE,
+                            help="Withdrawals claimed per round")
+        parser.add_argument('--batch-window', type=int, default=WITHDRAWAL_PAYOUT_WINDOW_SECONDS,
+                            help="Net each account's withdrawals over this many seconds into one transfer "
+                                 "and payout; 0 pays every withdrawal out on its own")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of draining once")
+        parser.add_argument('--sleep', type=float, default=5.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        window = options['batch_window']
+        # Batching mode also drains withdrawals that were retried on their own before they could be netted
+        claims = [claim_payout_batches, claim_retried_withdrawals] if window > 0 else [claim_withdrawals]
+        while True:
+            started = time.perf_counter()
+            outcomes = {'completed': 0, 'pending': 0, 'failed': 0, 'processing': 0}
+            claimed = 0
+            if window > 0:
+                batches = form_payout_batches(window)
+                if batches:
+                    self.stdout.write(
+                        f"netted {sum(batch.withdrawal_count for batch in batches)} withdrawal(s) "
+                        f"into {len(batches)} payout batch(es)"
+                    )
+            for claim in claims:
+                while True:
+                    rows = claim(options['batch_size'])
+                    if not rows:
+                        break
+                    claimed += len(rows)
+                    for row in rows:
+                        process_withdrawal(row)
+                        outcomes[row.status] += 1
+
+            if claimed:
+                self.stdout.write(
+                    f"claimed {claimed}: completed {outcomes['completed']}, retrying {outcomes['pending']}, "
+                    f"failed {outcomes['failed']} in {time.perf_counter() - started:.2f}s"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from loans.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily_rollup chart table from the investment and transaction tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Limit to the given user id (repeatable)")
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily rollup row(s)"))
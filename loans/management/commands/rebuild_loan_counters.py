@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from loans.models import Loan, Investment
+
+
+class Command(BaseCommand):
+    help = "Recompute Loan.funded_amount and Loan.investor_count from the investment table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Only report loans whose counters drifted, do not write")
+        parser.add_argument('--loan', type=int, action='append', dest='loan_ids',
+                            help="Limit to the given loan id (repeatable)")
+
+    def handle(self, *args, **options):
+        totals = Investment.objects.filter(loan=OuterRef('pk')).values('loan')
+        actual_funded = Coalesce(
+            Subquery(totals.annotate(total=Sum('amount')).values('total')),
+            Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2)
+        )
+        actual_investors = Coalesce(
+            Subquery(totals.annotate(total=Count('investor', distinct=True)).values('total')),
+            Value(0)
+        )
+
+        loans = Loan.objects.all()
+        if options['loan_ids']:
+            loans = loans.filter(id__in=options['loan_ids'])
+
+        drifted = loans.annotate(
+            actual_funded=actual_funded,
+            actual_investors=actual_investors
+        ).filter(
+            ~Q(funded_amount=F('actual_funded')) | ~Q(investor_count=F('actual_investors'))
+        ).values_list('id', 'funded_amount', 'actual_funded', 'investor_count', 'actual_investors')
+
+        drifted = list(drifted)
+        for loan_id, funded, expected_funded, count, expected_count in drifted:
+            self.stdout.write(
+                f"loan {loan_id}: funded_amount {funded} -> {expected_funded}, "
+                f"investor_count {count} -> {expected_count}"
+            )
+
+        if options['verify']:
+            if drifted:
+                self.stdout.write(self.style.ERROR(f"{len(drifted)} loan(s) have drifted counters"))
+            else:
+                self.stdout.write(self.style.SUCCESS("All loan counters match the investment table"))
+            return
+
+        with transaction.atomic():
+            updated = loans.filter(id__in=[row[0] for row in drifted]).update(
+                funded_amount=actual_funded,
+                investor_count=actual_investors
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} loan(s)"))
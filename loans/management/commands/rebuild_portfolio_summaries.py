@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from loans.models import Investment
+from loans.portfolio import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = ("Recompute investor_portfolio_summary rows from the investment table, "
+            "for a first backfill or after investments were changed outside the funding engine")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--investor', type=int, action='append', dest='investor_ids',
+                            help="Limit to the given investor user id (repeatable)")
+
+    def handle(self, *args, **options):
+        investor_ids = options['investor_ids'] or Investment.objects.values_list('investor_id', flat=True).distinct()
+        rebuilt = 0
+        for investor_id in investor_ids:
+            with transaction.atomic():
+                rebuild_summary(investor_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} portfolio summary(ies)"))
@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from enhancefund.Constant import REPAYMENT_REMINDER_DAYS, REMINDER_EMAIL_CHUNK_SIZE
+from enhancefund.email_utils import EmailService
+from loans.models import LoanRepaymentSchedule
+
+
+class Command(BaseCommand):
+    help = ("Email borrowers whose installments fall due in the next N days. Messages are "
+            "rendered up front and sent in chunks over one reused SMTP connection")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=REPAYMENT_REMINDER_DAYS,
+                            help="Remind installments due within this many days")
+        parser.add_argument('--chunk-size', type=int, default=REMINDER_EMAIL_CHUNK_SIZE,
+                            help="Messages sent per SMTP batch")
+        parser.add_argument('--dry-run', action='store_true', help="Render and count, do not send")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        now = timezone.now()
+        today = timezone.localdate()
+
+        # One query on the (payment_status, due_date) index, borrower emails joined in
+        due = LoanRepaymentSchedule.objects.filter(
+            payment_status='pending',
+            due_date__gte=now,
+            due_date__lt=now + timedelta(days=options['days']),
+            reminder_sent_at__isnull=True,
+            loan__status='approved'
+        ).values_list(
+            'id', 'loan_id', 'due_date', 'amount_due',
+            'loan__borrower__user__email', 'loan__borrower__user__first_name'
+        ).order_by('due_date', 'id')
+
+        templates = EmailService.load_templates('repayment_reminder')
+        ids, messages = [], []
+        for repayment_id, loan_id, due_date, amount_due, email, first_name in due:
+            if not email:
+                continue
+            ids.append(repayment_id)
+            messages.append(EmailService.build_upcoming_repayment_reminder(
+                email, first_name, timezone.localtime(due_date), amount_due, loan_id,
+                (timezone.localtime(due_date).date() - today).days, templates=templates
+            ))
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(messages)} reminder(s) would be sent")
+            return
+
+        sent = failed = chunks = offset = 0
+        for chunk, count, error in EmailService.send_bulk(messages, options['chunk_size']):
+            chunk_ids = ids[offset:offset + len(chunk)]
+            offset += len(chunk)
+            chunks += 1
+            if error is not None:
+                failed += len(chunk)
+                self.stderr.write(f"chunk {chunks}: {len(chunk)} message(s) failed: {error}")
+                continue
+            sent += count
+            # Only mark what actually went out; failed chunks are retried on the next run
+            LoanRepaymentSchedule.objects.filter(id__in=chunk_ids).update(reminder_sent_at=now)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"selected {len(messages)}, sent {sent}, failed {failed}, "
+            f"{chunks} chunk(s) of up to {options['chunk_size']} in {elapsed:.2f}s"
+        )
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style("Repayment reminders done" if not failed else "Repayment reminders done with failures"))
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from enhancefund.Constant import LOAN_DEFAULT_AFTER_DAYS
+from loans.cache import invalidate_loans
+from loans.models import Loan, LoanRepaymentSchedule
+
+CLOSED_LOAN_STATUSES = ('repaid', 'defaulted')
+
+
+class Command(BaseCommand):
+    help = ("Mark overdue installments as missed and default loans whose oldest missed "
+            "installment is past the delinquency threshold. Meant to run nightly")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--default-after-days', type=int, default=LOAN_DEFAULT_AFTER_DAYS,
+                            help="Days an installment may stay missed before its loan is defaulted")
+        parser.add_argument('--dry-run', action='store_true', help="Report the counts without writing")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        default_cutoff = now - timedelta(days=options['default_after_days'])
+
+        overdue = LoanRepaymentSchedule.objects.filter(
+            payment_status='pending',
+            due_date__lt=now
+        ).exclude(loan__status__in=CLOSED_LOAN_STATUSES)
+
+        delinquent = Loan.objects.exclude(status__in=CLOSED_LOAN_STATUSES).filter(
+            Exists(LoanRepaymentSchedule.objects.filter(
+                loan=OuterRef('pk'),
+                payment_status__in=('pending', 'missed'),
+                due_date__lt=default_cutoff
+            ))
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"{overdue.count()} installment(s) would be marked missed")
+            self.stdout.write(f"{delinquent.count()} loan(s) would be defaulted")
+            return
+
+        with transaction.atomic():
+            touched_ids = set(overdue.values_list('loan_id', flat=True).distinct())
+            # One UPDATE each; rows are found through the (payment_status, due_date) index
+            missed = overdue.update(payment_status='missed')
+            defaulted_ids = list(delinquent.select_for_update().values_list('id', flat=True))
+            if defaulted_ids:
+                Loan.objects.filter(id__in=defaulted_ids).update(status='defaulted', updated_at=now)
+            touched_ids.update(defaulted_ids)
+            if touched_ids:
+                # Bulk updates send no post_save, so drop the cached payloads here
+                invalidate_loans(*touched_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {missed} installment(s) missed, defaulted {len(defaulted_ids)} loan(s)"
+        ))
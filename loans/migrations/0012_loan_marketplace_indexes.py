@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrower', '0007_remove_creditscorehistory_user_and_more'),
+        ('loans', '0011_loanrepaymentschedule_last_missed_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['created_at', 'id'], name='loan_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'is_fulfill', 'created_at', 'id'], name='loan_status_fulfill_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['loan_purpose', 'created_at', 'id'], name='loan_purpose_created_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_loan_counters(apps, schema_editor):
+    Loan = apps.get_model('loans', 'Loan')
+    Investment = apps.get_model('loans', 'Investment')
+    totals = Investment.objects.filter(loan=OuterRef('pk')).values('loan')
+    Loan.objects.update(
+        funded_amount=Coalesce(
+            Subquery(totals.annotate(total=Sum('amount')).values('total')),
+            Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2)
+        ),
+        investor_count=Coalesce(
+            Subquery(totals.annotate(total=Count('investor', distinct=True)).values('total')),
+            Value(0)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0012_loan_marketplace_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='funded_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='investor_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_loan_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0013_loan_funded_amount_investor_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='payment_frequency',
+            field=models.CharField(blank=True, choices=[('monthly', 'Monthly'), ('3_monthly', 'Every 3 Months'), ('one_time', 'One Time')], max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0014_loan_payment_frequency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loanrepaymentschedule',
+            index=models.Index(fields=['payment_status', 'due_date'], name='schedule_status_due_idx'),
+        ),
+    ]
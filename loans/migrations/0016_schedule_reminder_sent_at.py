@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0015_schedule_status_due_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanrepaymentschedule',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_withdrawal_holds(apps, schema_editor):
+    # Open withdrawals already took their amount off the balance; give each a hold to resolve
+    Withdrawal = apps.get_model('loans', 'Withdrawal')
+    WalletHold = apps.get_model('ledger', 'WalletHold')
+    LedgerAccount = apps.get_model('ledger', 'LedgerAccount')
+    LedgerEntry = apps.get_model('ledger', 'LedgerEntry')
+    LedgerPosting = apps.get_model('ledger', 'LedgerPosting')
+    # Withdrawals requested since the ledger went live booked their hold under withdrawal:<id>
+    booked = set(LedgerEntry.objects.filter(entry_type='withdrawal_hold', reference__startswith='withdrawal:')
+                 .values_list('reference', flat=True))
+    pending, _ = LedgerAccount.objects.get_or_create(user=None, kind='withdrawals_pending')
+    for withdrawal in Withdrawal.objects.filter(hold__isnull=True, status__in=['pending', 'processing']).select_related('user'):
+        wallet_kind = 'borrower_wallet' if withdrawal.user.role == 'borrower' else 'investor_wallet'
+        withdrawal.hold = WalletHold.objects.create(
+            user_id=withdrawal.user_id,
+            wallet_kind=wallet_kind,
+            amount=withdrawal.amount,
+            purpose='withdrawal'
+        )
+        withdrawal.save(update_fields=['hold'])
+        if f'withdrawal:{withdrawal.id}' in booked:
+            continue
+        # Book the hold as place_hold would, so capturing or releasing it leaves withdrawals_pending at zero
+        wallet, _ = LedgerAccount.objects.get_or_create(user_id=withdrawal.user_id, kind=wallet_kind)
+        entry = LedgerEntry.objects.create(entry_type='withdrawal_hold', reference=f'hold:{withdrawal.hold.id}')
+        LedgerPosting.objects.bulk_create([
+            LedgerPosting(entry=entry, account=wallet, amount=-withdrawal.amount),
+            LedgerPosting(entry=entry, account=pending, amount=withdrawal.amount),
+        ])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0002_wallet_holds'),
+        ('loans', '0019_payout_batches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='withdrawal',
+            name='hold',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='withdrawal', to='ledger.wallethold'),
+        ),
+        migrations.RunPython(backfill_withdrawal_holds, migrations.RunPython.noop),
+    ]
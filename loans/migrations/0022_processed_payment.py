@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_processed_payments(apps, schema_editor):
+    # Payments applied before the table existed are only recorded as transactions
+    Transaction = apps.get_model('loans', 'Transaction')
+    PaymentHistory = apps.get_model('loans', 'PaymentHistory')
+    ProcessedPayment = apps.get_model('loans', 'ProcessedPayment')
+    applied = Transaction.objects.filter(
+        transaction_type__in=['deposit', 'payment'],
+        payment_id__in=PaymentHistory.objects.values('stripe_payment_id')
+    ).order_by('payment_id', 'id').distinct('payment_id').values_list('payment_id', 'user_id', 'transaction_type')
+    ProcessedPayment.objects.bulk_create([
+        ProcessedPayment(payment_id=payment_id, user_id=user_id, transaction_type=transaction_type)
+        for payment_id, user_id, transaction_type in applied.iterator()
+    ], batch_size=1000, ignore_conflicts=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0021_transaction_user_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_id', models.CharField(max_length=255, unique=True)),
+                ('transaction_type', models.CharField(choices=[('investment', 'Investment'), ('payment', 'Payment'), ('withdrawal', 'Withdrawal'), ('deposit', 'Deposit')], max_length=20)),
+                ('response', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processed_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'processed_payment',
+            },
+        ),
+        migrations.RunPython(backfill_processed_payments, migrations.RunPython.noop),
+    ]
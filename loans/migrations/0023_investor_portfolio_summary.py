@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0022_processed_payment'),
+        ('users', '0013_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvestorPortfolioSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='portfolio_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_invested', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_actual_return', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_expected_return', models.DecimalField(decimal_places=8, default=0, max_digits=20)),
+                ('investment_count', models.IntegerField(default=0)),
+                ('loan_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'investor_portfolio_summary',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='investment',
+            index=models.Index(fields=['investor', '-created_at', '-id'], name='investment_investor_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_rollups(apps, schema_editor):
+    # Same aggregation as loans.rollups.rebuild_rollups, over the historical models
+    Investment = apps.get_model('loans', 'Investment')
+    Transaction = apps.get_model('loans', 'Transaction')
+    DailyRollup = apps.get_model('loans', 'DailyRollup')
+    rows = [
+        DailyRollup(user_id=user_id, day=day, metric=metric, amount=total, count=count)
+        for metric, queryset, amount in [
+            ('invested', Investment.objects.all(), 'amount'),
+            ('returns', Investment.objects.filter(net_return__gt=0), 'net_return'),
+        ]
+        for user_id, day, total, count in queryset.values('investor_id', day=TruncDate('created_at')).annotate(
+            total=Sum(amount), rows=Count('id')
+        ).values_list('investor_id', 'day', 'total', 'rows').order_by()
+    ]
+    rows += [
+        DailyRollup(user_id=user_id, day=day, metric=metric, amount=total, count=count)
+        for user_id, day, metric, total, count in Transaction.objects.values(
+            'user_id', 'transaction_type', day=TruncDate('transaction_date')
+        ).annotate(total=Sum('amount'), rows=Count('id')).values_list(
+            'user_id', 'day', 'transaction_type', 'total', 'rows'
+        ).order_by()
+    ]
+    DailyRollup.objects.bulk_create(rows, batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0023_investor_portfolio_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(choices=[('invested', 'Invested'), ('returns', 'Returns'), ('investment', 'Investment'), ('payment', 'Payment'), ('withdrawal', 'Withdrawal'), ('deposit', 'Deposit')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'daily_rollup',
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'metric'), name='daily_rollup_user_day_metric_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def restore_base_installments(apps, schema_editor):
+    # The old repayment GET multiplied amount_due by 1.05 and stamped last_missed_date each
+    # month it was opened. Penalties are now computed on read from the base amount, so put
+    # the base back or they would be compounded on top of the stored ones.
+    LoanRepaymentSchedule = apps.get_model('loans', 'LoanRepaymentSchedule')
+    inflated = LoanRepaymentSchedule.objects.filter(
+        last_missed_date__isnull=False, payment_status__in=['pending', 'missed']
+    ).select_related('loan')
+    counts = dict(LoanRepaymentSchedule.objects.filter(
+        loan_id__in=inflated.values('loan_id')
+    ).values_list('loan_id').annotate(installments=Count('id')))
+    for repayment in inflated:
+        # Every installment of those schedules was round(total_payable / installments, 2)
+        base = (repayment.loan.total_payable / counts[repayment.loan_id]).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_EVEN
+        )
+        repayment.amount_due = min(repayment.amount_due, base)
+        repayment.last_missed_date = None
+        repayment.save(update_fields=['amount_due', 'last_missed_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0024_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_base_installments, migrations.RunPython.noop),
+    ]
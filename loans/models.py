@@ -1,7 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from borrower.models import Borrower
 from users.models import User
 
+class LoanCapacityExceeded(Exception):
+    """Raised when an investment would take a loan past its requested amount."""
+
+
 class Loan(models.Model):
     borrower = models.ForeignKey(Borrower, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -15,17 +21,32 @@ class Loan(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     loan_purpose = models.CharField(max_length=255,null=True)
+    PAYMENT_FREQUENCY_CHOICES = [
+        ('monthly', 'Monthly'),
+        ('3_monthly', 'Every 3 Months'),
+        ('one_time', 'One Time'),
+    ]
+    # Null for loans created before the frequency was stored; inferred from the schedule
+    payment_frequency = models.CharField(max_length=20, choices=PAYMENT_FREQUENCY_CHOICES, null=True, blank=True)
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2)
     total_payable = models.DecimalField(max_digits=10, decimal_places=2)
     is_fulfill = models.BooleanField(default=False)
 
     loan_amount = models.DecimalField(max_digits=10, decimal_places=2,null=True)
+    # Running totals maintained by Investment.save(); rebuild with `manage.py rebuild_loan_counters`
+    funded_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    investor_count = models.IntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'loan'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='loan_created_id_idx'),
+            models.Index(fields=['status', 'is_fulfill', 'created_at', 'id'], name='loan_status_fulfill_idx'),
+            models.Index(fields=['loan_purpose', 'created_at', 'id'], name='loan_purpose_created_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -53,6 +74,38 @@ class Investment(models.Model):
     
     class Meta:
         db_table = 'investment'
+        indexes = [
+            # Portfolio history pages walk one investor's rows newest first
+            models.Index(fields=['investor', '-created_at', '-id'], name='investment_investor_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Bump the running total first: the UPDATE takes the loan row lock, so the
+            # investor check below sees every investment committed before ours.
+            # The WHERE clause makes oversubscription impossible without a read-then-write.
+            loans = Loan.objects.filter(pk=self.loan_id)
+            updated = loans.filter(
+                is_fulfill=False,
+                funded_amount__lte=F('amount') - self.amount
+            ).update(funded_amount=F('funded_amount') + self.amount)
+            if not updated:
+                raise LoanCapacityExceeded()
+            new_loan = not Investment.objects.filter(loan_id=self.loan_id, investor_id=self.investor_id).exists()
+            if new_loan:
+                loans.update(investor_count=F('investor_count') + 1)
+
+            funded_amount, investor_count = loans.values_list('funded_amount', 'investor_count').get()
+            if Investment.loan.is_cached(self):
+                self.loan.funded_amount = funded_amount
+                self.loan.investor_count = investor_count
+            super().save(*args, **kwargs)
+
+            from loans.portfolio import record_investments
+            record_investments(self.investor_id, [self], new_loans=int(new_loan))
 
     def __str__(self):
         return (
@@ -67,6 +120,30 @@ class Investment(models.Model):
             
             
             "}")
+
+
+class InvestorPortfolioSummary(models.Model):
+    """Running portfolio totals of one investor, kept up to date as investments are placed."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='portfolio_summary')
+    total_invested = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_actual_return = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Unrounded so increments add up to the same total as a full recompute
+    total_expected_return = models.DecimalField(max_digits=20, decimal_places=8, default=0)
+    investment_count = models.IntegerField(default=0)
+    loan_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'investor_portfolio_summary'
+
+    def __str__(self):
+        return (
+            "{"
+            f"user: '{self.user_id or ''}', "
+            f"total_invested: '{self.total_invested or 0}', "
+            f"investment_count: '{self.investment_count or 0}', "
+            "}"
+        )
 class EMIPayment(models.Model):
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -121,10 +198,16 @@ class LoanRepaymentSchedule(models.Model):
     ]
     payment_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     last_missed_date = models.DateField(null=True, blank=True)
+    # Set by send_repayment_reminders so a daily run reminds each installment once
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'loan_repayment_schedule'
+        indexes = [
+            # Range scan for the delinquency sweep: pending rows whose due date has passed
+            models.Index(fields=['payment_status', 'due_date'], name='schedule_status_due_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -154,6 +237,10 @@ class Transaction(models.Model):
     payment_id=models.CharField(max_length=255, null=True, blank=True)
     class Meta:
         db_table = 'transaction'
+        indexes = [
+            # History pages and exports walk one user's rows newest first
+            models.Index(fields=['user', '-transaction_date', '-id'], name='transaction_user_date_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -163,6 +250,61 @@ class Transaction(models.Model):
             f"payment_id: '{self.payment_id or ''}', "
             "}"
         )
+
+
+class ProcessedPayment(models.Model):
+    """One row per external (Stripe) payment applied to a wallet or installment.
+
+    The unique payment_id is the idempotency check: a second confirmation of the
+    same payment fails on the constraint instead of crediting twice.
+    """
+    payment_id = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='processed_payments')
+    transaction_type = models.CharField(max_length=20, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    # First confirmation sent to the status endpoints, replayed on every later poll
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'processed_payment'
+
+    def __str__(self):
+        return (
+            "{"
+            f"payment_id: '{self.payment_id or ''}', "
+            f"transaction_type: '{self.transaction_type or ''}', "
+            "}"
+        )
+
+
+class DailyRollup(models.Model):
+    """A user's activity summed per day and metric, so charts read one row per day instead of raw rows."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    METRIC_CHOICES = [
+        # Investments placed and their known returns, dated by the investment
+        ('invested', 'Invested'),
+        ('returns', 'Returns'),
+    ] + Transaction.TRANSACTION_TYPE_CHOICES
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_rollup'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'metric'], name='daily_rollup_user_day_metric_uniq'),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"user: '{self.user_id or ''}', "
+            f"day: '{self.day or ''}', "
+            f"metric: '{self.metric or ''}', "
+            f"amount: '{self.amount or 0}', "
+            "}"
+        )
 class PaymentHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     payment_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -179,3 +321,116 @@ class PaymentHistory(models.Model):
             f"payment_date: '{self.payment_date or ''}', "
             "}"
         )
+
+
+class StripeEvent(models.Model):
+    """Every webhook event we received, keyed by Stripe's event id so redeliveries are no-ops."""
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    STATUS_CHOICES = [
+        ('received', 'Received'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='received')
+    error = models.TextField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'stripe_event'
+
+    def __str__(self):
+        return (
+            "{"
+            f"event_id: '{self.event_id or ''}', "
+            f"event_type: '{self.event_type or ''}', "
+            f"status: '{self.status or ''}', "
+            "}"
+        )
+
+
+class PayoutOutbox(models.Model):
+    """Shared state of a money movement queued for the process_withdrawals worker."""
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    stripe_account_id = models.CharField(max_length=255)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Claims so far; also the fencing token a worker must still hold to finalise the row
+    attempts = models.IntegerField(default=0)
+    # When a worker may next claim the row: retry backoff while pending, lease expiry while processing
+    available_at = models.DateTimeField(default=timezone.now)
+    transfer_id = models.CharField(max_length=255, null=True, blank=True)
+    payout_id = models.CharField(max_length=255, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class PayoutBatch(PayoutOutbox):
+    """One transfer and one payout covering every withdrawal an account requested in a window.
+    Doubles as the reconciliation record for the Stripe transfer and payout ids."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payout_batches')
+    withdrawal_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'payout_batch'
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                name='payout_batch_claim_idx',
+                condition=models.Q(status__in=['pending', 'processing'])
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"stripe_account_id: '{self.stripe_account_id or ''}', "
+            f"amount: '{self.amount or ''}', "
+            f"withdrawal_count: '{self.withdrawal_count}', "
+            f"status: '{self.status or ''}', "
+            "}"
+        )
+
+
+class Withdrawal(PayoutOutbox):
+    """Outbox row for a withdrawal. The amount is already held off the user's balance;
+    a process_withdrawals worker moves the money through Stripe and completes or refunds it."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='withdrawals')
+    # Reservation on the user's balance, captured on payout and released on failure
+    hold = models.OneToOneField('ledger.WalletHold', on_delete=models.PROTECT, null=True, blank=True,
+                                related_name='withdrawal')
+    # Set when the withdrawal is paid out as part of a netted batch instead of on its own
+    batch = models.ForeignKey(PayoutBatch, on_delete=models.PROTECT, null=True, blank=True,
+                              related_name='withdrawals')
+
+    class Meta:
+        db_table = 'withdrawal'
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                name='withdrawal_claim_idx',
+                condition=models.Q(status__in=['pending', 'processing'])
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            "{"
+            f"user: '{self.user_id or ''}', "
+            f"amount: '{self.amount or ''}', "
+            f"status: '{self.status or ''}', "
+            f"attempts: '{self.attempts}', "
+            "}"
+        )
@@ -0,0 +1,162 @@
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+
+from ledger.postings import transfer, platform, investor_wallet
+from ledger.wallets import credit
+from loans.cache import invalidate_loans
+from enhancefund.Constant import PAYMENT_CONFIRMATION_CACHE_TIMEOUT
+from loans.models import PaymentHistory, ProcessedPayment, Transaction, LoanRepaymentSchedule, EMIPayment
+
+# installment_id the wallet top-up checkout sessions are created with
+WALLET_TOP_UP_ID = "xvKjmlKNp11"
+
+
+def checkout_metadata(installment_id):
+    """Metadata attached to a checkout session so the webhook knows what the payment is for."""
+    if installment_id == WALLET_TOP_UP_ID:
+        return {'purpose': 'deposit'}
+    return {'purpose': 'emi', 'repayment_id': str(installment_id)}
+
+
+def session_target(session):
+    """(purpose, repayment_id) for a checkout session.
+
+    Sessions created before metadata was attached still carry the installment id
+    in their success_url, so fall back to that.
+    """
+    metadata = session.get('metadata') or {}
+    if metadata.get('purpose'):
+        return metadata['purpose'], metadata.get('repayment_id')
+    installment_id = parse_qs(urlparse(session.get('success_url') or '').query).get('ins_id', [None])[0]
+    if installment_id is None:
+        return None, None
+    metadata = checkout_metadata(installment_id)
+    return metadata['purpose'], metadata.get('repayment_id')
+
+
+def session_amount(session):
+    return (Decimal(session.get('amount_total') or 0) / 100).quantize(Decimal('0.01'))
+
+
+class PaymentNotReady(Exception):
+    """The session's payment history row or installment is not in the database yet.
+
+    Raised instead of returning False so the event stays retryable: the webhook can
+    arrive before the request that created the checkout session has committed.
+    """
+
+
+def _payment(session_id):
+    payment = PaymentHistory.objects.select_related('user').filter(stripe_payment_id=session_id).first()
+    if payment is None:
+        raise PaymentNotReady(f"No payment history for session {session_id}")
+    return payment
+
+
+def _claim_payment(payment, transaction_type):
+    """Record the payment as applied. False if it already was.
+
+    The processed_payment insert is the idempotency check: a concurrent redelivery or
+    replay of the same session blocks on the unique index until this transaction
+    ends, then fails on the constraint. Callers run it only once every lookup the
+    payment needs has succeeded, so a claim is never committed for a payment that
+    was not applied.
+    """
+    try:
+        with transaction.atomic():
+            ProcessedPayment.objects.create(
+                payment_id=payment.stripe_payment_id, user=payment.user, transaction_type=transaction_type
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+@transaction.atomic
+def apply_deposit(session):
+    """Credit a completed wallet top-up. Returns False if it was already applied."""
+    payment = _payment(session['id'])
+    if not _claim_payment(payment, 'deposit'):
+        return False
+
+    amount = session_amount(session)
+    Transaction.objects.create(
+        user=payment.user,
+        transaction_type='deposit',
+        amount=amount,
+        payment_id=session['id']
+    )
+    credit(investor_wallet(payment.user_id), amount, 'deposit', session['id'], platform('stripe'))
+    return True
+
+
+@transaction.atomic
+def apply_emi_payment(session, repayment_id):
+    """Mark an installment paid from a completed checkout session. Returns False if already applied."""
+    payment = _payment(session['id'])
+    repayment = LoanRepaymentSchedule.objects.select_for_update().select_related('loan__borrower').filter(
+        id=repayment_id,
+        loan__borrower__user=payment.user
+    ).first()
+    if repayment is None:
+        raise PaymentNotReady(f"No installment {repayment_id} for session {session['id']}")
+    if not _claim_payment(payment, 'payment'):
+        return False
+
+    amount = session_amount(session)
+    Transaction.objects.create(
+        user=payment.user,
+        transaction_type='payment',
+        amount=amount,
+        payment_id=session['id']
+    )
+    repayment.payment_status = 'paid'
+    repayment.amount_paid = amount
+    # amount_due holds the base amount; any late penalty was paid on top of it
+    repayment.amount_due = max(repayment.amount_due - amount, Decimal('0'))
+    repayment.save(update_fields=['payment_status', 'amount_paid', 'amount_due'])
+    EMIPayment.objects.create(
+        loan=repayment.loan,
+        amount=amount,
+        stripe_payment_id=session['id'],
+        status='completed'
+    )
+    # Paid by card straight to the platform; investors are credited from this pool at closure
+    transfer('emi_payment', session['id'], platform('stripe'), platform('repayments'), amount)
+
+    loan = repayment.loan
+    if not LoanRepaymentSchedule.objects.filter(loan=loan).exclude(payment_status='paid').exists():
+        loan.status = 'repaid'
+        loan.save(update_fields=['status', 'updated_at'])
+    invalidate_loans(loan.id)
+    return True
+
+
+def confirmed_payment(user, payment_id, transaction_type, build_response):
+    """Response data confirming an applied payment, or None while it is not applied yet.
+
+    The first confirmation is built with ``build_response()`` and stored on the
+    processed_payment row, so every later poll replays it from the cache or a unique
+    index lookup instead of recomputing it.
+    """
+    key = f'processed-payment:{transaction_type}:{user.pk}:{payment_id}'
+    response = cache.get(key)
+    if response is not None:
+        return response
+
+    processed = ProcessedPayment.objects.filter(
+        payment_id=payment_id, user=user, transaction_type=transaction_type
+    ).values_list('pk', 'response').first()
+    if processed is None:
+        return None
+    pk, response = processed
+    if response is None:
+        response = build_response()
+        # Concurrent first polls race here; whichever stored first is what everyone replays
+        if not ProcessedPayment.objects.filter(pk=pk, response__isnull=True).update(response=response):
+            response = ProcessedPayment.objects.filter(pk=pk).values_list('response', flat=True).get()
+    cache.set(key, response, PAYMENT_CONFIRMATION_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,39 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from dateutil.relativedelta import relativedelta
+
+# Compounded once for every started month an installment is overdue
+LATE_PENALTY_RATE = Decimal('0.05')
+UNPAID_STATUSES = ('pending', 'missed')
+
+
+def overdue_months(due_date, as_of):
+    """Started months between ``due_date`` and ``as_of``: 0 before the due date, 1 right after it."""
+    if due_date is None or as_of < due_date:
+        return 0
+    elapsed = relativedelta(as_of, due_date)
+    return elapsed.years * 12 + elapsed.months + 1
+
+
+def amount_with_penalty(amount_due, due_date, as_of):
+    """What an unpaid installment costs at ``as_of``.
+
+    A pure function of the stored base amount, so the figure no longer depends
+    on how often, or whether, the borrower opened the repayment page.
+    """
+    months = overdue_months(due_date, as_of)
+    if not months:
+        return amount_due
+    return (amount_due * (1 + LATE_PENALTY_RATE) ** months).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def installment_state(repayment, as_of):
+    """Status, payable amount and whether it can be paid now, without touching the row."""
+    if repayment.payment_status not in UNPAID_STATUSES:
+        return repayment.payment_status, repayment.amount_due, False
+    if repayment.due_date is None:
+        # Loan not funded yet, nothing is scheduled
+        return repayment.payment_status, repayment.amount_due, False
+    if repayment.due_date <= as_of:
+        return 'missed', amount_with_penalty(repayment.amount_due, repayment.due_date, as_of), True
+    return repayment.payment_status, repayment.amount_due, (repayment.due_date - as_of).days <= 15
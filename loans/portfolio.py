@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.db import transaction, IntegrityError
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+
+from loans.models import Investment, InvestorPortfolioSummary
+
+# Share of the loan's interest rate that reaches the investor, the rest is the platform fee
+INVESTOR_RETURN_RATIO = Decimal('0.97')
+CENT = Decimal('0.01')
+
+# Investments whose return is known count as actual return, the rest as expected
+_HAS_RETURN = Q(net_return__isnull=False) & ~Q(net_return=0)
+
+
+def expected_return(amount, interest_rate):
+    return amount * Decimal(interest_rate) * INVESTOR_RETURN_RATIO / Decimal('100')
+
+
+def portfolio_by_purpose(investor_id):
+    """One grouped query over the investor's investments: totals and returns per loan purpose."""
+    expected = ExpressionWrapper(
+        F('amount') * F('loan__interest_rate') * Value(INVESTOR_RETURN_RATIO / Decimal('100')),
+        output_field=DecimalField(max_digits=20, decimal_places=8)
+    )
+    return list(Investment.objects.filter(investor_id=investor_id).values(
+        purpose=F('loan__loan_purpose')
+    ).annotate(
+        total_amount=Sum('amount'),
+        count=Count('id'),
+        loans=Count('loan', distinct=True),
+        actual_return=Sum('net_return', filter=_HAS_RETURN),
+        expected_return=Sum(expected, filter=~_HAS_RETURN),
+    ).order_by('purpose'))
+
+
+def _totals(investor_id):
+    rows = portfolio_by_purpose(investor_id)
+    return {
+        'total_invested': sum((row['total_amount'] for row in rows), Decimal('0')),
+        'total_actual_return': sum((row['actual_return'] or 0 for row in rows), Decimal('0')),
+        'total_expected_return': sum((row['expected_return'] or 0 for row in rows), Decimal('0')),
+        'investment_count': sum(row['count'] for row in rows),
+        # A loan has a single purpose, so per-purpose distinct counts add up
+        'loan_count': sum(row['loans'] for row in rows),
+    }
+
+
+def rebuild_summary(investor_id):
+    """Recompute an investor's summary row from their investments."""
+    summary, _ = InvestorPortfolioSummary.objects.update_or_create(
+        user_id=investor_id, defaults=_totals(investor_id)
+    )
+    return summary
+
+
+def record_investments(investor_id, investments, new_loans):
+    """Add freshly saved investments to the investor's summary, in the caller's transaction.
+
+    ``new_loans`` is how many of them are the investor's first stake in their loan.
+    """
+    deltas = {
+        'total_invested': sum((investment.amount for investment in investments), Decimal('0')),
+        'total_actual_return': sum((investment.net_return for investment in investments
+                                    if investment.net_return), Decimal('0')),
+        'total_expected_return': sum((expected_return(investment.amount, investment.loan.interest_rate)
+                                      for investment in investments if not investment.net_return), Decimal('0')),
+        'investment_count': len(investments),
+        'loan_count': new_loans,
+    }
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    summary = InvestorPortfolioSummary.objects.filter(user_id=investor_id)
+    if summary.update(**increments):
+        return
+    try:
+        # No row yet: the recompute already includes the rows just saved
+        with transaction.atomic():
+            InvestorPortfolioSummary.objects.create(user_id=investor_id, **_totals(investor_id))
+    except IntegrityError:
+        # Created concurrently from a snapshot that could not see our rows
+        summary.update(**increments)
+
+
+def get_summary(investor_id):
+    """The investor's headline numbers: a primary key lookup once the row exists."""
+    summary = InvestorPortfolioSummary.objects.filter(user_id=investor_id).first()
+    if summary is None:
+        summary, _ = InvestorPortfolioSummary.objects.get_or_create(
+            user_id=investor_id, defaults=_totals(investor_id)
+        )
+    return summary
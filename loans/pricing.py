@@ -0,0 +1,103 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from typing import NamedTuple
+
+from loans.schedules import normalize_frequency, payment_count, PAYMENT_FREQUENCIES
+
+BASE_INTEREST_RATE = Decimal('10.0')
+FREQUENCY_RATE_PREMIUM = {
+    'monthly': Decimal('0'),
+    '3_monthly': Decimal('1.5'),
+    'one_time': Decimal('5.5'),
+}
+# Share of the principal paid out to the borrower, the rest is the platform fee
+BORROWER_PAYOUT_RATIO = Decimal('0.97')
+CENT = Decimal('0.01')
+
+# Terms up to this many months are served from the precomputed factor table
+FACTOR_TABLE_MAX_TERM = 360
+QUOTE_CACHE_SIZE = 4096
+
+
+def interest_rate(payment_frequency):
+    return BASE_INTEREST_RATE + FREQUENCY_RATE_PREMIUM[normalize_frequency(payment_frequency)]
+
+
+def _compound_factor(rate, term_months):
+    monthly_rate = rate / Decimal('100') / Decimal('12')
+    return (Decimal('1') + monthly_rate) ** Decimal(term_months)
+
+
+# Every rate we price at is known up front, so (1 + r/12) ** n is computed once per (rate, term)
+FACTOR_TABLE = {
+    (interest_rate(frequency), term): _compound_factor(interest_rate(frequency), term)
+    for frequency in PAYMENT_FREQUENCIES
+    for term in range(1, FACTOR_TABLE_MAX_TERM + 1)
+}
+
+
+def compound_factor(rate, term_months):
+    factor = FACTOR_TABLE.get((rate, term_months))
+    if factor is None:
+        factor = _compound_factor(rate, term_months)
+    return factor
+
+
+class Quote(NamedTuple):
+    amount: Decimal
+    term_months: int
+    payment_frequency: str
+    interest_rate: Decimal
+    total_payable: Decimal
+    total_interest: Decimal
+    number_of_payments: int
+    amount_per_payment: Decimal
+    borrower_receives: Decimal
+    effective_interest_rate: float
+
+    def as_dict(self):
+        # Floats for JSON, same shape CalculateLoan has always returned
+        return {
+            "loan_amount_requested": float(self.amount),
+            "term_months": self.term_months,
+            "payment_frequency": self.payment_frequency,
+            "interest_rate": float(self.interest_rate),
+            "total_payable": float(self.total_payable),
+            "total_interest": float(self.total_interest),
+            "number_of_payments": self.number_of_payments,
+            "amount_per_payment": float(self.amount_per_payment),
+            "borrower_receives": float(self.borrower_receives),
+            "effective_interest_rate": self.effective_interest_rate,
+        }
+
+
+@lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def _quote(amount, term_months, payment_frequency):
+    rate = interest_rate(payment_frequency)
+    total_payable = (amount * compound_factor(rate, term_months)).quantize(CENT, rounding=ROUND_HALF_UP)
+    total_interest = total_payable - amount
+    number_of_payments = payment_count(term_months, payment_frequency)
+    return Quote(
+        amount=amount,
+        term_months=term_months,
+        payment_frequency=payment_frequency,
+        interest_rate=rate,
+        total_payable=total_payable,
+        total_interest=total_interest,
+        number_of_payments=number_of_payments,
+        amount_per_payment=(total_payable / Decimal(number_of_payments)).quantize(CENT),
+        borrower_receives=(amount * BORROWER_PAYOUT_RATIO).quantize(CENT, rounding=ROUND_HALF_UP),
+        effective_interest_rate=round(float(total_interest) / float(amount) * 100, 2),
+    )
+
+
+def quote(amount, term_months, payment_frequency):
+    """Price a loan. Quotes are immutable and memoised, so repeated requests are a dict lookup.
+
+    Raises ValueError (or decimal.InvalidOperation) for malformed or non-positive input.
+    """
+    amount = Decimal(str(amount)).quantize(CENT)
+    term_months = int(term_months)
+    if amount <= 0 or term_months <= 0:
+        raise ValueError("Amount and term must be positive")
+    return _quote(amount, term_months, normalize_frequency(payment_frequency))
@@ -0,0 +1,117 @@
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+
+from loans.pricing import interest_rate, compound_factor, BORROWER_PAYOUT_RATIO
+from loans.schedules import payment_count
+
+# A float that lands this close (in cents) to a rounding boundary is re-priced
+# with Decimal, so the grid always rounds exactly like a single quote
+TIE_TOLERANCE = 1e-3
+
+
+def _near_tie(scaled):
+    return np.abs(scaled - np.floor(scaled) - 0.5) < TIE_TOLERANCE
+
+
+def _round_half_up(scaled):
+    return np.floor(scaled + 0.5), _near_tie(scaled)
+
+
+def _round_half_even(scaled):
+    return np.rint(scaled), _near_tie(scaled)
+
+
+def quote_grid(amounts, terms, frequencies, exact_quote):
+    """Price every (amount, term, frequency) combination in one vectorised pass.
+
+    ``exact_quote(amount, term, frequency)`` is the Decimal single-quote
+    calculation, used only for the few cells whose float result sits on a
+    rounding boundary. Returns one quote dict per cell, amounts outermost.
+    """
+    amount_cents = np.array([int(amount * 100) for amount in amounts], dtype=np.int64)
+    rates = [interest_rate(frequency) for frequency in frequencies]
+    payments = np.array(
+        [[payment_count(term, frequency) for frequency in frequencies] for term in terms], dtype=np.int64
+    )
+
+    # (term, frequency) compound factors from the pricing table, broadcast over amounts
+    factors = np.array(
+        [[float(compound_factor(rate, term)) for rate in rates] for term in terms], dtype=np.float64
+    )
+    total_cents, ties = _round_half_up(amount_cents[:, None, None] * factors[None, :, :])
+    total_cents = total_cents.astype(np.int64)
+
+    per_payment_cents, per_payment_ties = _round_half_even(total_cents / payments[None, :, :])
+    ties |= per_payment_ties
+
+    interest_cents = total_cents - amount_cents[:, None, None]
+    total_interest = interest_cents / 100
+    effective_rate, rate_ties = _round_half_even(total_interest / (amount_cents[:, None, None] / 100) * 100 * 100)
+    ties |= rate_ties
+
+    # amount * payout ratio in integer cents, rounded half-up exactly
+    whole, remainder = np.divmod(amount_cents * int(BORROWER_PAYOUT_RATIO * 100), 100)
+    receives_cents = whole + (remainder >= 50)
+
+    quotes = []
+    for i, amount in enumerate(amounts):
+        for j, term in enumerate(terms):
+            for k, frequency in enumerate(frequencies):
+                if ties[i, j, k]:
+                    quotes.append(exact_quote(amount, term, frequency))
+                    continue
+                quotes.append({
+                    "loan_amount_requested": float(amount),
+                    "term_months": term,
+                    "payment_frequency": frequency,
+                    "interest_rate": float(rates[k]),
+                    "total_payable": int(total_cents[i, j, k]) / 100,
+                    "total_interest": int(interest_cents[i, j, k]) / 100,
+                    "number_of_payments": int(payments[j, k]),
+                    "amount_per_payment": int(per_payment_cents[i, j, k]) / 100,
+                    "borrower_receives": int(receives_cents[i]) / 100,
+                    "effective_interest_rate": int(effective_rate[i, j, k]) / 100,
+                })
+    return quotes
+
+
+def parse_values(query_params, name, min_name, max_name, step_name, parse, limit):
+    """Read a CSV list (``name``) or an inclusive ``min``/``max``/``step`` range from the query string.
+
+    Raises ValueError on malformed input or when more than ``limit`` values are asked for.
+    """
+    if query_params.get(name):
+        values = [parse(value) for value in query_params.get(name).split(',') if value.strip()]
+    else:
+        low, high, step = (query_params.get(key) for key in (min_name, max_name, step_name))
+        if low is None or high is None or step is None:
+            raise ValueError(f"Provide {name} or {min_name}, {max_name} and {step_name}")
+        low, high, step = parse(low), parse(high), parse(step)
+        if step <= 0 or high < low or (high - low) / step >= limit:
+            raise ValueError(f"Invalid {name} range")
+        values = []
+        value = low
+        while value <= high:
+            values.append(value)
+            value += step
+    if not values or len(values) > limit:
+        raise ValueError(f"Provide between 1 and {limit} {name}")
+    return sorted(set(values))
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError("Invalid amount")
+    if amount <= 0:
+        raise ValueError("Amounts must be positive")
+    return amount
+
+
+def parse_term(value):
+    term = int(str(value).strip())
+    if term <= 0:
+        raise ValueError("Terms must be positive")
+    return term
@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from loans.cache import invalidate_portfolios
+from loans.models import DailyRollup, Investment, Transaction
+
+# Bucket length per chart granularity, and the matching Postgres interval for generate_series
+GRANULARITIES = {
+    'day': (relativedelta(days=1), '1 day'),
+    'week': (relativedelta(weeks=1), '1 week'),
+    'month': (relativedelta(months=1), '1 month'),
+    'quarter': (relativedelta(months=3), '3 months'),
+    'year': (relativedelta(years=1), '1 year'),
+}
+METRICS = [metric for metric, _ in DailyRollup.METRIC_CHOICES]
+
+
+def _increment(buckets):
+    """Add {(user_id, day, metric): (amount, count)} onto the rollup with one upsert.
+
+    Keys go in sorted order so concurrent writers lock the rows in the same sequence.
+    """
+    if not buckets:
+        return
+    # Every write that changes a user's portfolio or charts is rolled up here
+    invalidate_portfolios(*(user_id for user_id, _, _ in buckets))
+    table = DailyRollup._meta.db_table
+    keys = sorted(buckets)
+    params = []
+    for user_id, day, metric in keys:
+        params += [user_id, day, metric, *buckets[(user_id, day, metric)]]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, day, metric, amount, count) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(keys))} "
+            f"ON CONFLICT (user_id, day, metric) DO UPDATE SET "
+            f"amount = {table}.amount + EXCLUDED.amount, count = {table}.count + EXCLUDED.count",
+            params
+        )
+
+
+def _add(buckets, key, amount):
+    total, count = buckets.get(key, (0, 0))
+    buckets[key] = (total + amount, count + 1)
+
+
+def rollup_investments(investments):
+    """Count newly saved investments, in the caller's transaction."""
+    buckets = {}
+    for investment in investments:
+        day = timezone.localdate(investment.created_at)
+        _add(buckets, (investment.investor_id, day, 'invested'), investment.amount)
+        if investment.net_return and investment.net_return > 0:
+            _add(buckets, (investment.investor_id, day, 'returns'), investment.net_return)
+    _increment(buckets)
+
+
+def rollup_transactions(transactions):
+    """Count newly saved transactions, in the caller's transaction."""
+    buckets = {}
+    for row in transactions:
+        _add(buckets, (row.user_id, timezone.localdate(row.transaction_date), row.transaction_type), row.amount)
+    _increment(buckets)
+
+
+@transaction.atomic
+def rebuild_rollups(user_ids=None):
+    """Recompute the rollup from the investment and transaction tables. Returns the rows written."""
+    rollups = DailyRollup.objects.all()
+    investments = Investment.objects.all()
+    transactions = Transaction.objects.all()
+    if user_ids:
+        rollups = rollups.filter(user_id__in=user_ids)
+        investments = investments.filter(investor_id__in=user_ids)
+        transactions = transactions.filter(user_id__in=user_ids)
+    rollups.delete()
+
+    invested = investments.values('investor_id', day=TruncDate('created_at')).annotate(
+        total=Sum('amount'), rows=Count('id')
+    ).values_list('investor_id', 'day', 'total', 'rows')
+    returns = investments.filter(net_return__gt=0).values('investor_id', day=TruncDate('created_at')).annotate(
+        total=Sum('net_return'), rows=Count('id')
+    ).values_list('investor_id', 'day', 'total', 'rows')
+    by_type = transactions.values('user_id', 'transaction_type', day=TruncDate('transaction_date')).annotate(
+        total=Sum('amount'), rows=Count('id')
+    ).values_list('user_id', 'day', 'transaction_type', 'total', 'rows')
+
+    rows = [DailyRollup(user_id=user_id, day=day, metric='invested', amount=total, count=count)
+            for user_id, day, total, count in invested.order_by()]
+    rows += [DailyRollup(user_id=user_id, day=day, metric='returns', amount=total, count=count)
+             for user_id, day, total, count in returns.order_by()]
+    rows += [DailyRollup(user_id=user_id, day=day, metric=metric, amount=total, count=count)
+             for user_id, day, metric, total, count in by_type.order_by()]
+    DailyRollup.objects.bulk_create(rows, batch_size=1000)
+    invalidate_portfolios(*(user_ids or {row.user_id for row in rows}))
+    return len(rows)
+
+
+def bucket_start(day, granularity):
+    """First day of the bucket holding ``day``; weeks start on Monday like date_trunc."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def chart_range(granularity, periods, today=None):
+    """(first bucket start, today) covering the last ``periods`` calendar buckets, the current one included."""
+    today = today or timezone.localdate()
+    step, _ = GRANULARITIES[granularity]
+    return bucket_start(today, granularity) - step * (periods - 1), today
+
+
+def chart_label(bucket, granularity):
+    if granularity == 'month':
+        return bucket.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return f"{bucket.year}-Q{(bucket.month - 1) // 3 + 1}"
+    if granularity == 'year':
+        return str(bucket.year)
+    return bucket.isoformat()
+
+
+def chart_series(user_id, granularity, start, end):
+    """One row per bucket from ``start`` to ``end``, empty buckets included, read from the rollup.
+
+    Buckets come from generate_series and the rollup rows are summed per bucket in
+    the database, so Python only sees one row per bucket. Each row holds every
+    metric's amount, the investment count and the running invested + returns total.
+    """
+    _, interval = GRANULARITIES[granularity]
+    amounts = ', '.join(
+        f"COALESCE(SUM(r.amount) FILTER (WHERE r.metric = '{metric}'), 0)" for metric in METRICS
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH r AS (
+                SELECT date_trunc(%(unit)s, day::timestamp)::date AS bucket, metric,
+                       SUM(amount) AS amount, SUM(count) AS count
+                FROM {DailyRollup._meta.db_table}
+                WHERE user_id = %(user_id)s AND day >= %(start)s AND day <= %(end)s
+                GROUP BY 1, 2
+            )
+            SELECT b.bucket::date, {amounts},
+                   COALESCE(SUM(r.count) FILTER (WHERE r.metric = 'invested'), 0)::int,
+                   SUM(COALESCE(SUM(r.amount) FILTER (WHERE r.metric IN ('invested', 'returns')), 0))
+                       OVER (ORDER BY b.bucket)
+            FROM generate_series(%(start)s::timestamp, %(end)s::timestamp, %(interval)s::interval) AS b(bucket)
+            LEFT JOIN r ON r.bucket = b.bucket::date
+            GROUP BY b.bucket
+            ORDER BY b.bucket
+            """,
+            {'unit': granularity, 'user_id': user_id, 'start': start, 'end': end, 'interval': interval}
+        )
+        columns = ['bucket'] + METRICS + ['invested_count', 'cumulative']
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,90 @@
+import math
+from datetime import datetime, time
+from decimal import Decimal, ROUND_DOWN
+
+from dateutil.relativedelta import relativedelta
+from django.utils import timezone
+
+from loans.cache import invalidate_loans
+from loans.models import LoanRepaymentSchedule
+
+PAYMENT_FREQUENCIES = ('monthly', '3_monthly', 'one_time')
+DEFAULT_PAYMENT_FREQUENCY = 'monthly'
+# Months between installments; one_time is a single payment at the end of the term
+FREQUENCY_MONTHS = {
+    'monthly': 1,
+    '3_monthly': 3,
+}
+
+
+def normalize_frequency(payment_frequency):
+    return payment_frequency if payment_frequency in PAYMENT_FREQUENCIES else DEFAULT_PAYMENT_FREQUENCY
+
+
+def payment_count(term_months, payment_frequency):
+    payment_frequency = normalize_frequency(payment_frequency)
+    if payment_frequency == 'one_time':
+        return 1
+    return max(1, math.ceil(term_months / FREQUENCY_MONTHS[payment_frequency]))
+
+
+def infer_frequency(term_months, installments):
+    """Best guess for loans created before payment_frequency was stored."""
+    if installments == 1:
+        return 'one_time'
+    if installments == payment_count(term_months, '3_monthly'):
+        return '3_monthly'
+    return 'monthly'
+
+
+def installment_amounts(total_payable, count):
+    """Split ``total_payable`` into ``count`` cent amounts; the last one absorbs the rounding."""
+    total_payable = Decimal(str(total_payable)).quantize(Decimal('0.01'))
+    per_payment = (total_payable / count).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    return [per_payment] * (count - 1) + [total_payable - per_payment * (count - 1)]
+
+
+def due_dates(start, term_months, payment_frequency, count):
+    """Calendar-month due dates from ``start``, never later than the end of the term."""
+    if payment_frequency == 'one_time':
+        return [start + relativedelta(months=term_months)] * count
+    step = FREQUENCY_MONTHS[payment_frequency]
+    return [start + relativedelta(months=min(step * i, term_months)) for i in range(1, count + 1)]
+
+
+def build_schedule(loan, total_payable, payment_frequency):
+    """Unsaved installments for ``loan``; due dates are set when the loan is funded."""
+    count = payment_count(loan.term_months, payment_frequency)
+    return [
+        LoanRepaymentSchedule(
+            loan=loan,
+            installment_number=number,
+            due_date=None,
+            amount_due=amount,
+            payment_status='pending'
+        )
+        for number, amount in enumerate(installment_amounts(total_payable, count), start=1)
+    ]
+
+
+def create_schedule(loan, total_payable, payment_frequency):
+    schedule = LoanRepaymentSchedule.objects.bulk_create(build_schedule(loan, total_payable, payment_frequency))
+    # bulk_create sends no post_save, so drop the cached loan payloads here
+    invalidate_loans(loan.id)
+    return schedule
+
+
+def assign_due_dates(loan, start=None):
+    """Date every installment of a funded loan in one UPDATE."""
+    schedule = list(LoanRepaymentSchedule.objects.filter(loan=loan).order_by('installment_number'))
+    if not schedule:
+        return []
+    if start is None:
+        start = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    payment_frequency = loan.payment_frequency or infer_frequency(loan.term_months, len(schedule))
+
+    for repayment, due_date in zip(schedule, due_dates(start, loan.term_months, payment_frequency, len(schedule))):
+        repayment.due_date = due_date
+    LoanRepaymentSchedule.objects.bulk_update(schedule, ['due_date'])
+    invalidate_loans(loan.id)
+    return schedule
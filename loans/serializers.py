@@ -7,7 +7,8 @@ class LoanSerializer(CommonSerializer):
 
     class Meta:
         model = Loan
-        fields = ['id','amount','term_months','status','loan_purpose','interest_rate','total_payable','is_fulfill','loan_amount']
+        fields = ['id','amount','term_months','status','loan_purpose','interest_rate','total_payable','is_fulfill','loan_amount',
+                  'payment_frequency']
 
     def create(self, validated_data):
         # Retrieve the user from context
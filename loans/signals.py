@@ -0,0 +1,41 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from borrower.models import Borrower, CreditScoreHistory
+from loans.cache import invalidate_loans
+from loans.models import Loan, Investment, LoanRepaymentSchedule, Transaction
+from loans.rollups import rollup_investments, rollup_transactions
+
+
+# Cache invalidation for the marketplace list and the per-loan payloads
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_loan_cache(sender, instance, **kwargs):
+    invalidate_loans(instance.pk)
+
+
+@receiver(post_save, sender=Investment)
+@receiver(post_delete, sender=Investment)
+@receiver(post_save, sender=LoanRepaymentSchedule)
+def invalidate_loan_cache_for_child(sender, instance, **kwargs):
+    invalidate_loans(instance.loan_id)
+
+
+# Borrower details and credit snapshots are embedded in every marketplace card
+@receiver(post_save, sender=Borrower)
+@receiver(post_save, sender=CreditScoreHistory)
+def invalidate_marketplace_cache(sender, instance, **kwargs):
+    invalidate_loans()
+
+
+# Chart rollups; bulk_create sends no post_save, those callers roll up themselves
+@receiver(post_save, sender=Investment)
+def rollup_investment(sender, instance, created, **kwargs):
+    if created:
+        rollup_investments([instance])
+
+
+@receiver(post_save, sender=Transaction)
+def rollup_transaction(sender, instance, created, **kwargs):
+    if created:
+        rollup_transactions([instance])
@@ -1,3 +1,362 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import stripe
+from django.contrib.auth.models import Group
+from django.db.models import F, Sum
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from borrower.models import Borrower
+from enhancefund.Constant import WITHDRAWAL_MAX_ATTEMPTS
+from investor.models import InvestorBalance
+from investor.views import InvestmentClosureProcess
+from ledger.models import LedgerPosting, WalletHold
+from ledger.postings import balance, platform, investor_wallet, borrower_wallet, post
+from loans.funding import fund_loan, fund_loans_batch, run_with_retries, _validate_batch, _fund_batch, \
+    InsufficientBalance, RemainingAmountExceeded, LoanAlreadyFulfilled, InvalidNetReturn
+from loans.models import Loan, LoanRepaymentSchedule, Investment, PaymentHistory, ProcessedPayment, StripeEvent, \
+    Transaction, Withdrawal
+from loans.payments import PaymentNotReady
+from loans.views import CalculateLoan
+from loans.webhooks import handle_stripe_event
+from loans.withdrawals import request_withdrawal, claim_withdrawals, process_withdrawal, WithdrawalError
+from users.models import User
+
+
+def make_user(role, **fields):
+    n = User.objects.count()
+    return User.objects.create_user(email=f'{role}{n}@example.com', phone_number=str(n), password='x', role=role,
+                                    **fields)
+
+
+def make_investor(amount, **fields):
+    user = make_user('investor', **fields)
+    InvestorBalance.objects.create(user=user, account_balance=amount)
+    post('opening_balance', f'user:{user.pk}',
+         [(platform('opening_balance'), -Decimal(amount)), (investor_wallet(user.pk), Decimal(amount))])
+    return user
+
+
+def make_loan(amount, **fields):
+    borrower = Borrower.objects.create(user=make_user('borrower'), employment_status='employed', annual_income=1000)
+    values = dict(borrower=borrower, amount=Decimal(amount), term_months=12, status='processing',
+                  interest_rate=Decimal('10'), total_payable=Decimal(amount) * Decimal('1.1'),
+                  loan_amount=Decimal(amount) * Decimal('0.97'), loan_purpose='car')
+    values.update(fields)
+    return Loan.objects.create(**values)
+
+
+def wallet_balance(user):
+    return InvestorBalance.objects.get(user=user).account_balance
+
+
+class MoneyTestCase(TestCase):
+    def assertLedgerBalances(self, *users):
+        for entry_id, total in LedgerPosting.objects.values_list('entry').annotate(total=Sum('amount')):
+            self.assertEqual(total, 0, f"entry {entry_id} does not balance")
+        for user in users:
+            self.assertEqual(balance(investor_wallet(user.pk)), wallet_balance(user))
+
+
+class FundLoanTests(MoneyTestCase):
+    def setUp(self):
+        self.investor = make_investor(500)
+
+    def test_investment_moves_the_amount_into_escrow(self):
+        loan = make_loan(1000)
+        fund_loan(self.investor, loan.id, '200')
+        loan.refresh_from_db()
+        self.assertEqual(loan.funded_amount, Decimal('200'))
+        self.assertEqual(wallet_balance(self.investor), Decimal('300'))
+        self.assertEqual(balance(platform('loan_escrow')), Decimal('200'))
+        self.assertLedgerBalances(self.investor)
+
+    def test_insufficient_balance_is_refused(self):
+        loan = make_loan(1000)
+        with self.assertRaises(InsufficientBalance):
+            fund_loan(self.investor, loan.id, '500.01')
+        self.assertEqual(wallet_balance(self.investor), Decimal('500'))
+        self.assertFalse(Investment.objects.exists())
+
+    def test_amount_over_the_remaining_capacity_is_refused(self):
+        loan = make_loan(1000)
+        Loan.objects.filter(pk=loan.pk).update(funded_amount=Decimal('900'))
+        with self.assertRaises(RemainingAmountExceeded) as refused:
+            fund_loan(self.investor, loan.id, '150')
+        self.assertEqual(refused.exception.remaining_amount, Decimal('100'))
+        # The debit rolled back with the capacity check
+        self.assertEqual(wallet_balance(self.investor), Decimal('500'))
+        self.assertLedgerBalances(self.investor)
+
+    def test_last_cent_approves_the_loan_and_pays_the_borrower(self):
+        loan = make_loan(400)
+        fund_loan(self.investor, loan.id, '400')
+        loan.refresh_from_db()
+        self.assertTrue(loan.is_fulfill)
+        self.assertEqual(loan.status, 'approved')
+        self.assertEqual(loan.borrower.account_balance, loan.loan_amount)
+        self.assertEqual(balance(borrower_wallet(loan.borrower.user_id)), loan.loan_amount)
+        self.assertEqual(balance(platform('loan_escrow')), 0)
+        with self.assertRaises(LoanAlreadyFulfilled):
+            fund_loan(self.investor, loan.id, '1')
+
+    def test_net_return_is_validated(self):
+        loan = make_loan(1000)
+        for net_return in ('abc', '-1', 'NaN', '1000000'):
+            with self.assertRaises(InvalidNetReturn):
+                fund_loan(self.investor, loan.id, '100', net_return=net_return)
+        investment = fund_loan(self.investor, loan.id, '100', net_return='109.70')
+        self.assertEqual(investment.net_return, Decimal('109.70'))
+
+
+class BatchFundingTests(MoneyTestCase):
+    def setUp(self):
+        self.investor = make_investor(500)
+
+    def test_items_are_validated_one_by_one(self):
+        open_loan, small_loan = make_loan(1000), make_loan(100)
+        investments, results = fund_loans_batch(self.investor, [
+            {'loan': open_loan.id, 'amount': '200'},
+            {'loan': small_loan.id, 'amount': '150'},
+            {'loan': open_loan.id, 'amount': '10'},
+            {'loan': 0, 'amount': '10'},
+        ])
+        self.assertEqual(len(investments), 1)
+        self.assertEqual([result['status'] for result in results], ['invested', 'failed', 'failed', 'failed'])
+        self.assertEqual(wallet_balance(self.investor), Decimal('300'))
+        self.assertLedgerBalances(self.investor)
+
+    def test_loan_filled_after_validation_is_refunded(self):
+        placed, raced = make_loan(1000), make_loan(1000)
+        accepted, results = _validate_batch(self.investor, [
+            {'loan': placed.id, 'amount': '100'}, {'loan': raced.id, 'amount': '200'}
+        ])
+        Loan.objects.filter(pk=raced.pk).update(funded_amount=F('amount') - 50)
+
+        investments, outcomes = run_with_retries(_fund_batch, self.investor, accepted)
+        self.assertEqual([investment.loan_id for investment in investments], [placed.id])
+        self.assertEqual(outcomes[placed.id][0], 'invested')
+        self.assertEqual(outcomes[raced.id][0], 'failed')
+        self.assertEqual(wallet_balance(self.investor), Decimal('400'))
+        # Every leg is booked against its own loan
+        self.assertEqual(
+            sorted(LedgerPosting.objects.filter(account__user=self.investor).exclude(
+                entry__entry_type='opening_balance'
+            ).values_list('entry__entry_type', 'entry__reference', 'amount')),
+            [('investment', f'loan:{placed.id}', Decimal('-100.00')),
+             ('investment', f'loan:{raced.id}', Decimal('-200.00')),
+             ('investment_refund', f'loan:{raced.id}', Decimal('200.00'))]
+        )
+        self.assertLedgerBalances(self.investor)
+
+    def test_batch_beyond_the_balance_places_nothing(self):
+        loan = make_loan(1000)
+        accepted, _ = _validate_batch(self.investor, [{'loan': loan.id, 'amount': '300'}])
+        InvestorBalance.objects.filter(user=self.investor).update(account_balance=Decimal('100'))
+
+        investments, outcomes = run_with_retries(_fund_batch, self.investor, accepted)
+        self.assertEqual(investments, [])
+        self.assertEqual(outcomes[loan.id], ('failed', str(InsufficientBalance())))
+        self.assertEqual(wallet_balance(self.investor), Decimal('100'))
+
+
+class StripeWebhookTests(MoneyTestCase):
+    def setUp(self):
+        self.investor = make_investor(0)
+        self.event = {
+            'id': 'evt_1',
+            'type': 'checkout.session.completed',
+            'data': {'object': {'id': 'cs_1', 'payment_status': 'paid', 'amount_total': 2500,
+                                'metadata': {'purpose': 'deposit'}}},
+        }
+
+    def test_redelivered_deposit_is_credited_once(self):
+        PaymentHistory.objects.create(user=self.investor, payment_amount=25, stripe_payment_id='cs_1')
+        self.assertEqual(handle_stripe_event(self.event).status, 'processed')
+        self.assertEqual(handle_stripe_event(self.event).status, 'processed')
+        # A different event for the same session is not applied again either
+        self.assertEqual(handle_stripe_event({**self.event, 'id': 'evt_2'}).status, 'ignored')
+
+        self.assertEqual(wallet_balance(self.investor), Decimal('25'))
+        self.assertEqual(Transaction.objects.filter(payment_id='cs_1').count(), 1)
+        self.assertEqual(ProcessedPayment.objects.filter(payment_id='cs_1').count(), 1)
+        self.assertLedgerBalances(self.investor)
+
+    def test_event_before_its_payment_stays_retryable(self):
+        with self.assertRaises(PaymentNotReady):
+            handle_stripe_event(self.event)
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_1').status, 'received')
+        self.assertFalse(ProcessedPayment.objects.exists())
+
+        PaymentHistory.objects.create(user=self.investor, payment_amount=25, stripe_payment_id='cs_1')
+        self.assertEqual(handle_stripe_event(self.event).status, 'processed')
+        self.assertEqual(wallet_balance(self.investor), Decimal('25'))
+
+    @mock.patch('users.kyc.stripe_document_verification_update')
+    @mock.patch('users.kyc.create_stripe_customer_payment')
+    @mock.patch('users.kyc.create_stripe_user')
+    def test_kyc_steps_survive_a_failed_event(self, create_user, create_customer, update_documents):
+        create_user.return_value = mock.Mock(individual=mock.Mock(account='acct_1'))
+        create_customer.return_value = mock.Mock(id='cus_1')
+        update_documents.side_effect = stripe.error.APIConnectionError("down")
+        event = {'id': 'evt_kyc', 'type': 'identity.verification_session.verified',
+                 'data': {'object': {'id': 'vs_1', 'metadata': {'user_id': str(self.investor.pk)}}}}
+        with self.assertRaises(stripe.error.APIConnectionError):
+            handle_stripe_event(event)
+        self.investor.refresh_from_db()
+        self.assertEqual(self.investor.stripe_account_id, 'acct_1')
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_kyc').status, 'failed')
+
+        # The redelivery resumes at the documents step
+        update_documents.side_effect = None
+        update_documents.return_value = 'file_1'
+        self.assertEqual(handle_stripe_event(event).status, 'processed')
+        self.assertEqual(create_user.call_count, 1)
+        self.assertEqual(create_customer.call_count, 1)
+        self.investor.refresh_from_db()
+        self.assertEqual(self.investor.checklist, ['KYC'])
+
+
+@mock.patch('loans.withdrawals.create_payout')
+@mock.patch('loans.withdrawals.transfer_funds')
+class WithdrawalTests(MoneyTestCase):
+    def setUp(self):
+        self.investor = make_investor(100, stripe_account_id='acct_1')
+
+    def claim(self):
+        rows = claim_withdrawals(10)
+        self.assertEqual(len(rows), 1)
+        return rows[0]
+
+    def test_request_holds_the_amount(self, transfer_funds, create_payout):
+        withdrawal = request_withdrawal(self.investor, '60')
+        self.assertEqual(wallet_balance(self.investor), Decimal('40'))
+        self.assertEqual(withdrawal.hold.status, 'held')
+        with self.assertRaises(WithdrawalError):
+            request_withdrawal(self.investor, '41')
+        transfer_funds.assert_not_called()
+
+    def test_payout_captures_the_hold(self, transfer_funds, create_payout):
+        transfer_funds.return_value = mock.Mock(id='tr_1')
+        create_payout.return_value = mock.Mock(id='po_1')
+        withdrawal = request_withdrawal(self.investor, '60')
+
+        self.assertTrue(process_withdrawal(self.claim()))
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'completed')
+        self.assertEqual(WalletHold.objects.get(pk=withdrawal.hold_id).status, 'captured')
+        self.assertEqual(wallet_balance(self.investor), Decimal('40'))
+        self.assertEqual(balance(platform('withdrawals_pending')), 0)
+        self.assertLedgerBalances(self.investor)
+
+    def test_transient_error_is_retried_later(self, transfer_funds, create_payout):
+        transfer_funds.side_effect = stripe.error.APIConnectionError("timeout")
+        withdrawal = request_withdrawal(self.investor, '60')
+
+        self.assertFalse(process_withdrawal(self.claim()))
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'pending')
+        self.assertEqual(withdrawal.attempts, 1)
+        self.assertGreater(withdrawal.available_at, timezone.now())
+        self.assertEqual(claim_withdrawals(10), [])
+        # Still reserved while it waits
+        self.assertEqual(WalletHold.objects.get(pk=withdrawal.hold_id).status, 'held')
+
+    def test_permanent_error_releases_the_hold(self, transfer_funds, create_payout):
+        transfer_funds.side_effect = stripe.error.InvalidRequestError("No such account", 'destination')
+        withdrawal = request_withdrawal(self.investor, '60')
+
+        self.assertFalse(process_withdrawal(self.claim()))
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'failed')
+        self.assertEqual(WalletHold.objects.get(pk=withdrawal.hold_id).status, 'released')
+        self.assertEqual(wallet_balance(self.investor), Decimal('100'))
+        self.assertLedgerBalances(self.investor)
+
+    def test_last_attempt_fails_and_releases_the_hold(self, transfer_funds, create_payout):
+        transfer_funds.side_effect = stripe.error.APIConnectionError("timeout")
+        withdrawal = request_withdrawal(self.investor, '60')
+        Withdrawal.objects.filter(pk=withdrawal.pk).update(attempts=WITHDRAWAL_MAX_ATTEMPTS - 1)
+
+        self.assertFalse(process_withdrawal(self.claim()))
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'failed')
+        self.assertEqual(wallet_balance(self.investor), Decimal('100'))
+
+    def test_unreversed_transfer_keeps_the_hold(self, transfer_funds, create_payout):
+        transfer_funds.return_value = mock.Mock(id='tr_1')
+        create_payout.side_effect = stripe.error.InvalidRequestError("Payouts disabled", None)
+        withdrawal = request_withdrawal(self.investor, '60')
+        Withdrawal.objects.filter(pk=withdrawal.pk).update(attempts=WITHDRAWAL_MAX_ATTEMPTS - 1)
+
+        with mock.patch('loans.withdrawals.call_stripe', side_effect=stripe.error.APIConnectionError("down")):
+            self.assertFalse(process_withdrawal(self.claim()))
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'failed')
+        # The money sits with the connected account, so the wallet is not refunded
+        self.assertEqual(WalletHold.objects.get(pk=withdrawal.hold_id).status, 'held')
+        self.assertEqual(wallet_balance(self.investor), Decimal('40'))
+
+    def test_lease_hides_a_claimed_row(self, transfer_funds, create_payout):
+        request_withdrawal(self.investor, '60')
+        self.claim()
+        self.assertEqual(claim_withdrawals(10), [])
+        Withdrawal.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim_withdrawals(10)), 1)
+
+
+class CalculateLoanTests(TestCase):
+    def setUp(self):
+        self.borrower = make_user('borrower')
+        self.borrower.groups.add(Group.objects.get_or_create(name='Borrower')[0])
+
+    def calculate(self, **params):
+        request = APIRequestFactory().get('/api/loan/calculate-loan/', params)
+        force_authenticate(request, user=self.borrower)
+        return CalculateLoan.as_view()(request)
+
+    def test_valid_request_is_priced(self):
+        response = self.calculate(amount='1000', term_months='12', payment_frequency='monthly')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['number_of_payments'], 12)
+
+    def test_non_positive_amount_is_a_bad_request(self):
+        for amount in ['-100', '0.001', 'abc']:
+            response = self.calculate(amount=amount, term_months='12', payment_frequency='monthly')
+            self.assertEqual(response.status_code, 400, amount)
+
+
+class InvestmentClosureTests(MoneyTestCase):
+    def setUp(self):
+        self.investor = make_investor(0)
+        self.investor.groups.add(Group.objects.get_or_create(name='Investor')[0])
+        loan = make_loan('100')
+        LoanRepaymentSchedule.objects.create(loan=loan, installment_number=1, amount_due=10, payment_status='paid')
+        self.investment = Investment.objects.create(loan=loan, investor=self.investor, amount=Decimal('50'),
+                                                    net_return=Decimal('5'),
+                                                    closed_at=timezone.now() - timedelta(days=1))
+
+    def close(self):
+        request = APIRequestFactory().get('/api/investor/get-return/')
+        force_authenticate(request, user=self.investor)
+        return InvestmentClosureProcess.as_view()(request)
+
+    def test_return_is_credited_once(self):
+        self.assertEqual(self.close().data['data'][0]['status'], 'closed')
+        self.close()
+        self.assertEqual(Investment.objects.get(pk=self.investment.pk).status, 'closed')
+        self.assertEqual(wallet_balance(self.investor), Decimal('5'))
+        self.assertEqual(Transaction.objects.filter(user=self.investor).count(), 1)
+        self.assertLedgerBalances(self.investor)
 
-# Create your tests here.
+    def test_second_credit_for_an_investment_is_refused(self):
+        self.close()
+        # A request that still saw the investment open cannot book its return again
+        Investment.objects.filter(pk=self.investment.pk).update(status='Open')
+        self.assertEqual(self.close().data['data'][0]['status'], 'failed')
+        self.assertEqual(Investment.objects.get(pk=self.investment.pk).status, 'Open')
+        self.assertEqual(wallet_balance(self.investor), Decimal('5'))
+        self.assertLedgerBalances(self.investor)
@@ -2,19 +2,23 @@
 
 from django.urls import path
 
-from loans.views import CreateLoan, CalculateLoan, ViewLoan, loanList, createInvestment, expectedReturn, myInvestment, \
-    checkRepaymentBorrower, loanRepayment, checkRefundStatus
+from loans.views import CreateLoan, CalculateLoan, LoanQuoteMatrix, ViewLoan, loanList, createInvestment, createBatchInvestment, expectedReturn, myInvestment, \
+    checkRepaymentBorrower, loanRepayment, checkRefundStatus, StripeWebhook, StripeHealth
 
 urlpatterns = [
     path('loan/create-loan/', CreateLoan.as_view(), name='Create-loan'),
     path('loan/calculate-loan/', CalculateLoan.as_view(), name='calculate-loan'),
+    path('loan/quote-matrix/', LoanQuoteMatrix.as_view(), name='loan-quote-matrix'),
     path('loan/view-loan/', ViewLoan.as_view(), name='view-own-loan'),
     path('loan/loan-list/', loanList.as_view(), name='view-all-loan'),
     path('loan/create-investment/', createInvestment.as_view(), name='view-all-loan'),
+    path('loan/create-investment/batch/', createBatchInvestment.as_view(), name='create-batch-investment'),
     path('loan/expected-return/', expectedReturn.as_view(), name='view-return-loan'),
     path('loan/my-investment/', myInvestment.as_view(), name='view-my-loan'),
     path('loan/check-repayment/', checkRepaymentBorrower.as_view(), name='view-check-history'),
     path('loan/loan-repayment/', loanRepayment.as_view(), name='view-check-history'),
     path('loan/payment-status/', checkRefundStatus.as_view(), name='view-check-history'),
+    path('stripe/webhook/', StripeWebhook.as_view(), name='stripe-webhook'),
+    path('stripe/health/', StripeHealth.as_view(), name='stripe-health'),
 
 ]
@@ -1,75 +1,49 @@
-import math
+import json
 
+import stripe
 from dateutil.relativedelta import relativedelta
-from django.db.models import Sum, Prefetch, OuterRef, Subquery, Value
-from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
 from django.utils import timezone
 
 from borrower.models import Borrower, CreditScoreHistory
 from borrower.serializer import CreditScoreHistorySerializer, BorrowerSerializer
 from enhancefund.Constant import REQUIRED_CREATE_LOAN_FIELD, REQUIRED_CREATE_INVESTMENT_FIELD, \
-    REQUIRED_LOAN_REPAYMENT_FIELD
+    REQUIRED_LOAN_REPAYMENT_FIELD, LOAN_LIST_PAGE_SIZE, MAX_PAGE_SIZE, LOAN_CACHE_TIMEOUT, \
+    REQUIRED_BATCH_INVESTMENT_FIELD, MAX_BATCH_INVESTMENTS, MAX_QUOTE_AXIS_VALUES, MAX_QUOTE_MATRIX_CELLS, \
+    PORTFOLIO_HISTORY_PAGE_SIZE
+from enhancefund.cache_utils import get_version, get_versions, make_key
+from enhancefund.conditional import ConditionalGetMixin
+from enhancefund.idempotency import IdempotentMixin
+from enhancefund.pagination import keyset_paginate, get_page_size, InvalidCursor
 from enhancefund.postvalidators import BaseValidator
-from enhancefund.rolebasedauth import BaseBorrowerView, BaseInvestorView
-from enhancefund.utils import enhance_response, create_payment_link_for_customer, check_Add_fund_status
+from enhancefund.rolebasedauth import BaseBorrowerView, BaseInvestorView, BaseStaffView
+from enhancefund.stripe_client import stripe_health
+from enhancefund.utils import enhance_response, create_payment_link_for_customer
 from investor.models import InvestorBalance
 from investor.serializers import TransactionSerializer, PaymentHistorySerializer
+from loans.cache import MARKETPLACE_NAMESPACE, loan_namespace, portfolio_namespace
+from loans.funding import fund_loan, fund_loans_batch, FundingError, LoanNotFound
 from loans.models import LoanApplication, Loan, LoanRepaymentSchedule, Investment, PaymentHistory, Transaction
-from loans.serializers import LoanSerializer, SchedulerSerializer, InvestmentSerializer, EmiSerializer
+from loans.payments import confirmed_payment
+from loans.penalties import amount_with_penalty, installment_state
+from loans.portfolio import get_summary, portfolio_by_purpose, INVESTOR_RETURN_RATIO, CENT
+from loans.pricing import quote
+from loans.quotes import quote_grid, parse_values, parse_amount, parse_term
+from loans.schedules import create_schedule, normalize_frequency, payment_count, PAYMENT_FREQUENCIES
+from loans.webhooks import handle_stripe_event
+from loans.serializers import LoanSerializer, InvestmentSerializer, EmiSerializer
 from users.models import User
 from rest_framework import status
 from rest_framework import generics
-from django.db import models
+from rest_framework.permissions import AllowAny
+from django.db import models, transaction
 from datetime import date, timedelta, datetime
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from decimal import Decimal, ROUND_HALF_UP
 
-class CreateLoan(BaseBorrowerView, BaseValidator, generics.CreateAPIView):
-    def calculate_interest_rate(self, payment_frequency):
-
-        base_rate = 10.0  # Base interest rate
-        frequency_rates = {
-            'monthly': 0,
-            '3_monthly': 1.5,
-            'one_time': 5.5
-        }
-
-        return base_rate + frequency_rates.get(payment_frequency, 0)
-
-    def calculate_total_payable(self, amount, interest_rate, term_months):
-        monthly_rate = interest_rate / 100 / 12
-        total_payable = amount * (1 + monthly_rate) ** term_months
-        return round(total_payable, 2)
-
-    def calculate_number_of_payments(self, term_months, payment_frequency):
-        if payment_frequency == 'one_time':
-            return 1
-        elif payment_frequency == 'monthly':
-            return term_months
-        elif payment_frequency == '3_monthly':
-            return math.ceil(term_months / 3)
-        else:
-            return term_months  # Default to monthly if frequency is not recognized
-
-    def generate_repayment_schedule(self, loan, total_payable, number_of_payments):
-        amount_per_payment = round(total_payable / number_of_payments, 2)
-        schedules = []
-
-        for i in range(1, number_of_payments + 1):
-            schedule_data = {
-                'installment_number': i,
-                'due_date': None,
-                'amount_due': amount_per_payment,
-                'payment_status': 'pending'
-            }
-            serializer = SchedulerSerializer(data=schedule_data, context={'loan': loan})
-            if serializer.is_valid():
-                schedules.append(serializer)
-            else:
-                print(serializer.errors)
-
-        return schedules
-
+class CreateLoan(IdempotentMixin, BaseBorrowerView, BaseValidator, generics.CreateAPIView):
     def post(self, request, *args, **kwargs):
         validation_errors = self.validate_data(request.data, REQUIRED_CREATE_LOAN_FIELD)
         if validation_errors:
@@ -92,34 +66,31 @@ class CreateLoan(BaseBorrowerView, BaseValidator, generics.CreateAPIView):
             return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
                                     message="You have previous loan which is not closed")
 
-        payment_frequency = request.data.get("payment_frequency")
-        print(request.data,"aaa")
-        interest_rate = self.calculate_interest_rate(payment_frequency)
-        amount = float(request.data.get("amount"))
-        term_months = int(request.data.get("term_months"))
-        total_payable = self.calculate_total_payable(amount, interest_rate, term_months)
-
-        number_of_payments = self.calculate_number_of_payments(term_months, payment_frequency)
-        print(number_of_payments,"aaa")
-        loan_amount = (Decimal(amount) * Decimal('0.97')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        payment_frequency = normalize_frequency(request.data.get("payment_frequency"))
+        try:
+            loan_quote = quote(request.data.get("amount"), request.data.get("term_months"), payment_frequency)
+        except (InvalidOperation, TypeError, ValueError):
+            return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
+                                    message="Invalid amount or term_months")
+        total_payable = loan_quote.total_payable
 
         data_to_send = {
-            "amount": amount,
-            "loan_amount": loan_amount,
+            "amount": loan_quote.amount,
+            "loan_amount": loan_quote.borrower_receives,
             "loan_purpose": request.data.get("loan_purpose"),
-            "term_months": term_months,
+            "term_months": loan_quote.term_months,
+            "payment_frequency": payment_frequency,
             "status": 'processing',
-            "interest_rate": interest_rate,
+            "interest_rate": loan_quote.interest_rate,
             "total_payable": total_payable
         }
         serializer = LoanSerializer(data=data_to_send, context={"borrower": borrower_id})
 
         if serializer.is_valid():
-            loan=serializer.save()
-            print(loan.id)
-            repayment_schedules = self.generate_repayment_schedule(loan, total_payable, number_of_payments)
-            for schedule_serializer in repayment_schedules:
-                schedule_serializer.save()
+            # One transaction so auto-invest (run on commit) sees the loan with its schedule
+            with transaction.atomic():
+                loan=serializer.save()
+                create_schedule(loan, total_payable, payment_frequency)
 
 
         else:
@@ -137,33 +108,8 @@ class CalculateLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
     Returns: loan calculations including total payable, interest, payments, etc.
     """
 
-    def calculate_interest_rate(self, payment_frequency):
-        base_rate = 10.0  # Base interest rate
-        frequency_rates = {
-            'monthly': 0,
-            '3_monthly': 1.5,
-            'one_time': 5.5
-        }
-        return base_rate + frequency_rates.get(payment_frequency, 0)
-
-    def calculate_total_payable(self, amount, interest_rate, term_months):
-        # Use Decimal to calculate total payable precisely and return Decimal quantized to 2dp
-        from decimal import Decimal, ROUND_HALF_UP
-        amount = Decimal(str(amount))
-        interest_rate = Decimal(str(interest_rate))
-        monthly_rate = interest_rate / Decimal('100') / Decimal('12')
-        total_payable = amount * ((Decimal('1') + monthly_rate) ** Decimal(term_months))
-        return total_payable.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-    def calculate_number_of_payments(self, term_months, payment_frequency):
-        if payment_frequency == 'one_time':
-            return 1
-        elif payment_frequency == 'monthly':
-            return term_months
-        elif payment_frequency == '3_monthly':
-            return math.ceil(term_months / 3)
-        else:
-            return term_months  # Default to monthly if frequency is not recognized
+    def build_quote(self, amount, term_months, payment_frequency):
+        return quote(amount, term_months, payment_frequency).as_dict()
 
     def get(self, request, *args, **kwargs):
         from decimal import Decimal
@@ -172,7 +118,7 @@ class CalculateLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
             amount = Decimal(str(request.query_params.get('amount')))
             term_months = int(request.query_params.get('term_months'))
             payment_frequency = request.query_params.get('payment_frequency')
-        except (TypeError, ValueError):
+        except (TypeError, ValueError, InvalidOperation):
             return enhance_response(
                 data={},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -193,34 +139,22 @@ class CalculateLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
                 message="Invalid payment_frequency. Must be 'monthly', '3_monthly', or 'one_time'"
             )
 
-        # Calculate loan details
-        interest_rate = self.calculate_interest_rate(payment_frequency)
-        total_payable = self.calculate_total_payable(amount, interest_rate, term_months)
-        total_interest = float(total_payable - amount)
-        number_of_payments = self.calculate_number_of_payments(term_months, payment_frequency)
-        amount_per_payment = float((total_payable / Decimal(number_of_payments)).quantize(Decimal('0.01')))
-        borrower_receives = float((amount * Decimal('0.97')).quantize(Decimal('0.01')))
-        effective_interest_rate = round((total_interest / float(amount)) * 100, 2)
-
-        # Prepare response data (convert Decimals to floats for JSON)
-        loan_calculation = {
-            "loan_amount_requested": float(amount),
-            "term_months": term_months,
-            "payment_frequency": payment_frequency,
-            "interest_rate": interest_rate,
-            "total_payable": float(total_payable),
-            "total_interest": round(total_interest, 2),
-            "number_of_payments": number_of_payments,
-            "amount_per_payment": amount_per_payment,
-            "borrower_receives": borrower_receives,
-            "effective_interest_rate": effective_interest_rate,
-            "summary": {
-                "you_request": f"${float(amount)}",
-                "you_receive": f"${borrower_receives}",
-                "you_pay_back": f"${float(total_payable)}",
-                "total_interest_cost": f"${round(total_interest,2)}",
-                "payment_schedule": f"{number_of_payments} payments of ${amount_per_payment} each"
-            }
+        try:
+            loan_calculation = self.build_quote(amount, term_months, payment_frequency)
+        except (ValueError, InvalidOperation):
+            # Non-positive amounts or terms, including amounts that round to 0.00
+            return enhance_response(
+                data={},
+                status=status.HTTP_400_BAD_REQUEST,
+                message="Invalid parameters. Please provide valid amount, term_months, and payment_frequency"
+            )
+        loan_calculation["summary"] = {
+            "you_request": f"${loan_calculation['loan_amount_requested']}",
+            "you_receive": f"${loan_calculation['borrower_receives']}",
+            "you_pay_back": f"${loan_calculation['total_payable']}",
+            "total_interest_cost": f"${loan_calculation['total_interest']}",
+            "payment_schedule": f"{loan_calculation['number_of_payments']} payments of "
+                                f"${loan_calculation['amount_per_payment']} each"
         }
 
         return enhance_response(
@@ -229,6 +163,55 @@ class CalculateLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
             message="Loan calculation successful"
         )
 
+class LoanQuoteMatrix(CalculateLoan):
+    """Price a whole grid of amounts x terms x payment frequencies in one request.
+
+    Accepts either CSV lists (amounts, terms) or ranges (amount_min/amount_max/amount_step,
+    term_min/term_max/term_step), plus an optional CSV of payment_frequencies.
+    Every cell carries the same figures, rounded the same way, as CalculateLoan.
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            amounts = parse_values(params, 'amounts', 'amount_min', 'amount_max', 'amount_step',
+                                   parse_amount, MAX_QUOTE_AXIS_VALUES)
+            terms = parse_values(params, 'terms', 'term_min', 'term_max', 'term_step',
+                                 parse_term, MAX_QUOTE_AXIS_VALUES)
+        except ValueError as e:
+            return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST, message=str(e))
+
+        frequencies = [value for value in params.get('payment_frequencies', '').split(',') if value] \
+            or list(PAYMENT_FREQUENCIES)
+        if any(frequency not in PAYMENT_FREQUENCIES for frequency in frequencies):
+            return enhance_response(
+                data={},
+                status=status.HTTP_400_BAD_REQUEST,
+                message="Invalid payment_frequencies. Must be 'monthly', '3_monthly', or 'one_time'"
+            )
+        frequencies = list(dict.fromkeys(frequencies))
+
+        cells = len(amounts) * len(terms) * len(frequencies)
+        if cells > MAX_QUOTE_MATRIX_CELLS:
+            return enhance_response(
+                data={},
+                status=status.HTTP_400_BAD_REQUEST,
+                message=f"Quote matrix is limited to {MAX_QUOTE_MATRIX_CELLS} combinations, got {cells}"
+            )
+
+        quotes = quote_grid(amounts, terms, frequencies, self.build_quote)
+        return enhance_response(
+            data={
+                "amounts": [float(amount) for amount in amounts],
+                "terms": terms,
+                "payment_frequencies": frequencies,
+                "quotes": quotes,
+            },
+            status=status.HTTP_200_OK,
+            message="Loan quote matrix calculated successfully"
+        )
+
+
 class ViewLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
@@ -240,21 +223,28 @@ class ViewLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
         # create frequency
         borrower_id = Borrower.objects.get(user=user)
         try:
-            loans = Loan.objects.filter(borrower=borrower_id)
-            if not loans.exists():
+            loan_ids = list(Loan.objects.filter(borrower=borrower_id).order_by('id').values_list('id', flat=True))
+            if not loan_ids:
                 return enhance_response(
                     data=[],
                     message="No loans found for this borrower",
                     status=status.HTTP_200_OK
                 )
-            loan_data = []
 
+            # Per-loan payloads are cached under the loan's version and rebuilt only on a miss
+            versions = get_versions(*[loan_namespace(loan_id) for loan_id in loan_ids])
+            cache_keys = {
+                loan_id: make_key('loan-detail', f"{loan_id}:{versions[loan_namespace(loan_id)]}")
+                for loan_id in loan_ids
+            }
+            cached = cache.get_many(list(cache_keys.values()))
 
-            print(loan_data)
-            for loan in loans:
+            missing = [loan_id for loan_id in loan_ids if cache_keys[loan_id] not in cached]
+            fresh = {}
+            for loan in Loan.objects.filter(id__in=missing):
                 serializer = self.get_serializer(loan)
                 loan_dict = serializer.data
-                funded_amount = Investment.objects.filter(loan=loan).aggregate(Sum('amount'))['amount__sum'] or 0
+                funded_amount = loan.funded_amount
                 remaining_amount = loan.amount - funded_amount
 
                 # Get the last repayment due date
@@ -263,10 +253,15 @@ class ViewLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
 
                 loan_dict['funded_amount'] = float(funded_amount)
                 loan_dict['remaining_amount'] = float(remaining_amount)
+                loan_dict['investor_count'] = loan.investor_count
                 loan_dict['start_date'] = loan.created_at
                 loan_dict['end_date'] = end_date
-                loan_data.append(loan_dict)
+                fresh[cache_keys[loan.id]] = loan_dict
+            if fresh:
+                cache.set_many(fresh, LOAN_CACHE_TIMEOUT)
+                cached.update(fresh)
 
+            loan_data = [cached[cache_keys[loan_id]] for loan_id in loan_ids if cache_keys[loan_id] in cached]
 
             return enhance_response(
                 data=loan_data,
@@ -280,81 +275,142 @@ class ViewLoan(BaseBorrowerView, BaseValidator, generics.RetrieveAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class loanList(BaseValidator, generics.ListAPIView):
+class loanList(ConditionalGetMixin, BaseValidator, generics.ListAPIView):
     # loan fulfil false and also remain amount
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
 
+    def get_etag(self, request):
+        # Same stamp the page cache is keyed on: any loan, investment or credit write changes it
+        return make_key('loan-list', get_version(MARKETPLACE_NAMESPACE), dict(request.query_params.lists()))
+
+    def filter_loans(self, queryset, params):
+        """Apply the marketplace filters from the query string.
+
+        Supported: status (comma separated), is_fulfill, min_interest_rate,
+        max_interest_rate, term_months, min_term, max_term, loan_purpose.
+        Pass include_history=true to get every credit snapshot instead of the latest.
+        """
+        loan_status = params.get('status')
+        if loan_status:
+            queryset = queryset.filter(status__in=loan_status.split(','))
+
+        is_fulfill = params.get('is_fulfill')
+        if is_fulfill is not None:
+            queryset = queryset.filter(is_fulfill=is_fulfill.lower() == 'true')
+
+        if params.get('min_interest_rate'):
+            queryset = queryset.filter(interest_rate__gte=Decimal(params['min_interest_rate']))
+        if params.get('max_interest_rate'):
+            queryset = queryset.filter(interest_rate__lte=Decimal(params['max_interest_rate']))
+
+        if params.get('term_months'):
+            queryset = queryset.filter(term_months=int(params['term_months']))
+        if params.get('min_term'):
+            queryset = queryset.filter(term_months__gte=int(params['min_term']))
+        if params.get('max_term'):
+            queryset = queryset.filter(term_months__lte=int(params['max_term']))
+
+        loan_purpose = params.get('loan_purpose')
+        if loan_purpose:
+            queryset = queryset.filter(loan_purpose=loan_purpose)
+
+        return queryset
+
+    def build_page(self, params):
+        # Only the latest credit snapshot is shown by default; full history is opt-in
+        include_history = params.get('include_history', '').lower() == 'true'
+
+        # funded_amount is a column on loan, so no aggregate over investments is needed
+        loans = Loan.objects.select_related('borrower__latest_credit_score')
+        if include_history:
+            loans = loans.prefetch_related(Prefetch(
+                'borrower__creditscorehistory_set',
+                queryset=CreditScoreHistory.objects.order_by('-date_recorded')
+            ))
+
+        loans = self.filter_loans(loans, params)
+        page_size = get_page_size(params, LOAN_LIST_PAGE_SIZE, MAX_PAGE_SIZE)
+        # Keyset pagination on (created_at, id) keeps every page an index range scan
+        loans_list, next_cursor = keyset_paginate(loans, params.get('cursor'), page_size)
+
+        # Serialize the page of loans
+        loan_data = []
+
+        for loan in loans_list:
+            borrower = loan.borrower
+            borrower_data = BorrowerSerializer(borrower).data
+
+            if include_history:
+                credit_score_history = borrower.creditscorehistory_set.all()
+            elif borrower.latest_credit_score:
+                credit_score_history = [borrower.latest_credit_score]
+            else:
+                credit_score_history = []
+            credit_score_history_data = CreditScoreHistorySerializer(credit_score_history, many=True).data
+
+            serializer = self.get_serializer(loan)
+            loan_dict = serializer.data
+
+            funded_amount = float(loan.funded_amount)
+            remaining_amount = float(loan.amount) - funded_amount
+
+            loan_dict['credit_score_history'] = credit_score_history_data
+            loan_dict['borrower'] = borrower_data
+            loan_dict['funded_amount'] = funded_amount
+            loan_dict['remaining_amount'] = remaining_amount
+            loan_dict['investor_count'] = loan.investor_count
+            loan_data.append(loan_dict)
+
+        return {
+            'loans': loan_data,
+            'next_cursor': next_cursor,
+            'page_size': page_size
+        }
+
     def get(self, request, *args, **kwargs):
         try:
-            # Optimize queries using select_related, prefetch_related, and annotations
-            # Prefetch credit score history for all borrowers in one query
-            credit_score_prefetch = Prefetch(
-                'borrower__creditscorehistory_set',
-                queryset=CreditScoreHistory.objects.all()
-            )
-            
-            # Retrieve all loans with optimized queries
-            # Using select_related for borrower to avoid N+1 queries
-            # Using prefetch_related for credit_score_history to load all at once
-            # Using annotation with Subquery to calculate funded_amount in the database
-            loans = Loan.objects.select_related('borrower').prefetch_related(
-                credit_score_prefetch
-            ).annotate(
-                funded_amount=Coalesce(
-                    Subquery(
-                        Investment.objects.filter(
-                            loan=OuterRef('pk')
-                        ).values('loan').annotate(
-                            total=Sum('amount')
-                        ).values('total')[:1],
-                        output_field=models.DecimalField(max_digits=10, decimal_places=2)
-                    ),
-                    Value(0),
-                    output_field=models.DecimalField(max_digits=10, decimal_places=2)
-                )
-            )
-            
-            # Convert to list to evaluate queryset once
-            loans_list = list(loans)
-            
+            # Pages are cached under the marketplace version, which any loan,
+            # investment or credit snapshot write bumps
+            version = get_version(MARKETPLACE_NAMESPACE)
+            cache_key = make_key('loan-list', version, dict(request.query_params.lists()))
+            page = cache.get(cache_key)
+
+            if page is None:
+                try:
+                    page = self.build_page(request.query_params)
+                except (InvalidCursor, ArithmeticError, ValueError):
+                    return enhance_response(
+                        data={},
+                        message="Invalid filter or cursor",
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                cache.set(cache_key, page, LOAN_CACHE_TIMEOUT)
+
             # If no loans exist, return a 404 response
-            if not loans_list:
+            if not page['loans'] and not request.query_params.get('cursor'):
                 return enhance_response(
                     data={},
                     message="No loans found",
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Serialize the list of loans
-            loan_data = []
-
-            for loan in loans_list:
-                borrower = loan.borrower
-                borrower_data = BorrowerSerializer(borrower).data
-                
-                # Get prefetched credit score history (already loaded, no additional query)
-                credit_score_history = borrower.creditscorehistory_set.all()
-                credit_score_history_data = CreditScoreHistorySerializer(credit_score_history, many=True).data
-
-                serializer = self.get_serializer(loan)
-                loan_dict = serializer.data
-                
-                # Use annotated funded_amount (already calculated in the query)
-                funded_amount = float(loan.funded_amount or 0)
-                remaining_amount = float(loan.amount) - funded_amount
-                
-                loan_dict['credit_score_history'] = credit_score_history_data
-                loan_dict['borrower'] = borrower_data
-                loan_dict['funded_amount'] = funded_amount
-                loan_dict['remaining_amount'] = remaining_amount
-                loan_data.append(loan_dict)
-
-            return enhance_response(
-                data=loan_data,
+            # Clients that predate pagination send neither cursor nor page_size and
+            # keep getting a bare list of loans, with the next cursor in a header
+            if 'cursor' in request.query_params or 'page_size' in request.query_params:
+                return enhance_response(
+                    data=page,
+                    message="Loans retrieved successfully",
+                    status=status.HTTP_200_OK
+                )
+            response = enhance_response(
+                data=page['loans'],
                 message="Loans retrieved successfully",
                 status=status.HTTP_200_OK
             )
+            if page['next_cursor']:
+                response['Next-Cursor'] = page['next_cursor']
+            return response
         except Exception as e:
             return enhance_response(
                 data={},
@@ -367,36 +423,9 @@ class loanList(BaseValidator, generics.ListAPIView):
 # one investor can give in mulitple loan
 # when ammount is fulfill add due date in all investment
 
-class createInvestment(BaseInvestorView, BaseValidator, generics.CreateAPIView):
+class createInvestment(IdempotentMixin, BaseInvestorView, BaseValidator, generics.CreateAPIView):
     serializer_class = InvestmentSerializer
 
-    def update_due_dates(self, loan_id):
-        repayment_details = LoanRepaymentSchedule.objects.filter(loan=loan_id)
-        num_installments = len(repayment_details)
-        start_date = date.today()  # Assuming the loan starts today, adjust as needed
-
-        # Determine EMI frequency based on number of installments
-        if num_installments == 1:
-            emi_frequency = 'one_time'
-        elif num_installments == 4:
-            emi_frequency = '3_monthly'
-        elif num_installments == 12:
-            emi_frequency = 'monthly'
-        else:
-            raise ValueError(f"Unsupported number of installments: {num_installments}")
-
-        for index, repayment in enumerate(repayment_details):
-            if emi_frequency == 'monthly':
-                due_date = start_date + timedelta(days=(index + 1) * 30)
-            elif emi_frequency == '3_monthly':
-                due_date = start_date + timedelta(days=(index + 1) * 90)
-            elif emi_frequency == 'one_time':
-                due_date = start_date + timedelta(days=30)  # Assuming one-time payment is due in 30 days
-
-            repayment.due_date = due_date
-            repayment.save()
-
-
     def post(self, request, *args, **kwargs):
         # Validate the required fields
         validation_errors = self.validate_data(request.data, REQUIRED_CREATE_INVESTMENT_FIELD)
@@ -405,101 +434,56 @@ class createInvestment(BaseInvestorView, BaseValidator, generics.CreateAPIView):
                                     message="Please enter required fields")
 
         user = request.user
-        user_id = User.objects.get(email=user.email)
         loan_id = request.data.get("loan")
         invest_amount = request.data.get("amount")
-        borrower_balance=0
 
-        # Check if loan exists
         try:
-            loan_details = Loan.objects.get(id=loan_id)
-
-        except Loan.DoesNotExist:
+            investment = fund_loan(user, loan_id, invest_amount, net_return=request.data.get("net_return"))
+        except LoanNotFound as e:
             return enhance_response(
                 data={},
-                message="Loan not found",
+                message=str(e),
                 status=status.HTTP_404_NOT_FOUND
             )
-
-        # Check if the loan is already fulfilled
-        if loan_details.is_fulfill:
+        except FundingError as e:
             return enhance_response(
                 data={},
-                message="Loan is already fulfilled",
+                message=str(e),
                 status=status.HTTP_400_BAD_REQUEST
             )
-        # Calculate the total amount already invested in the loan
-        total_invested = Investment.objects.filter(loan=loan_details).aggregate(total=models.Sum('amount'))['total'] or 0
-        remaining_amount = loan_details.amount - total_invested
-        borrower_details=Borrower.objects.get(user=loan_details.borrower.user)
-
-        print(remaining_amount,"remaining_amount")
-        if invest_amount > remaining_amount:
+        except Exception as e:
             return enhance_response(
                 data={},
-                message=f"Investment amount exceeds the remaining loan amount. Only {remaining_amount} is available.",
-                status=status.HTTP_400_BAD_REQUEST
+                message=f"An error occurred: {str(e)}",
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        # If everything is valid, create the investment
-        try:
-            start_date = date.today()
-            closed_date = start_date + relativedelta(months=loan_details.term_months)
-            # Add this line to convert date to datetime:
-            closed_datetime = datetime.combine(closed_date, datetime.min.time())
-
-            data = request.data.copy()
-            data['loan'] = loan_id
-            data['closed_at'] = closed_datetime
-
-            serializer = InvestmentSerializer(data=data, context={'investor': user, 'loan': loan_details})
-            if serializer.is_valid():
-                serializer.save()
-
-                new_total_invested = Investment.objects.filter(loan=loan_details).aggregate(total=Sum('amount'))[
-                                         'total'] or 0
-                remaining_amount = loan_details.amount - new_total_invested
-                if remaining_amount==0:
-                    to_serialize_data = {
-                        "transaction_type": "deposit",
-                        "amount": invest_amount,
-                        "payment_id": "internal"
-                    }
-                    loan_details.is_fulfill=True
-                    loan_details.status='approved'
-                    loan_details.save()
-                    self.update_due_dates(loan_id)
-                    borrower_details.account_balance=float(borrower_details.account_balance+loan_details.loan_amount)
-                    borrower_details.save()
-                    serializerTransactionBorrower = TransactionSerializer(data=to_serialize_data, context={"user": user_id})
-                    serializerTransactionBorrower.is_valid()
-                    serializerTransactionBorrower.save()
-                investor_balance = InvestorBalance.objects.get(user=user_id)
-                investor_balance.account_balance=investor_balance.account_balance-invest_amount
-                investor_balance.save()
-                to_serialize_data = {
-                    "transaction_type": "investment",
-                    "amount": invest_amount,
-                    "payment_id": "internal"
-                }
+        return enhance_response(
+            data=InvestmentSerializer(investment).data,
+            message="Investment created successfully",
+            status=status.HTTP_201_CREATED
+        )
 
-                serializerTransaction = TransactionSerializer(data=to_serialize_data, context={"user": user_id})
-                serializerTransaction.is_valid()
-                serializerTransaction.save()
-                return enhance_response(
-                    data=serializer.data,
-                    message="Investment created successfully",
-                    status=status.HTTP_201_CREATED
-                )
-            else:
-                print(serializer.errors)
-                return enhance_response(
-                    data={},
-                    message="Investment created fail",
-                    status=status.HTTP_400_BAD_REQUEST
-                )
 
+class createBatchInvestment(IdempotentMixin, BaseInvestorView, BaseValidator, generics.CreateAPIView):
+    serializer_class = InvestmentSerializer
 
+    def post(self, request, *args, **kwargs):
+        validation_errors = self.validate_data(request.data, REQUIRED_BATCH_INVESTMENT_FIELD)
+        if validation_errors:
+            return enhance_response(data=validation_errors, status=status.HTTP_400_BAD_REQUEST,
+                                    message="Please enter required fields")
+
+        items = request.data.get("investments")
+        if not isinstance(items, list) or not items:
+            return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
+                                    message="investments must be a non-empty list of {loan, amount}")
+        if len(items) > MAX_BATCH_INVESTMENTS:
+            return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
+                                    message=f"A batch can hold at most {MAX_BATCH_INVESTMENTS} investments")
+
+        try:
+            investments, results = fund_loans_batch(request.user, items)
         except Exception as e:
             return enhance_response(
                 data={},
@@ -507,6 +491,18 @@ class createInvestment(BaseInvestorView, BaseValidator, generics.CreateAPIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        data = {
+            'investments': InvestmentSerializer(investments, many=True).data,
+            'results': results,
+        }
+        if not investments:
+            return enhance_response(data=data, message="No investment could be created",
+                                    status=status.HTTP_400_BAD_REQUEST)
+        message = "Investments created successfully"
+        if len(investments) < len(results):
+            message = f"{len(investments)} of {len(results)} investments created"
+        return enhance_response(data=data, message=message, status=status.HTTP_201_CREATED)
+
 
 class expectedReturn(BaseInvestorView, BaseValidator, generics.RetrieveAPIView):
     queryset = Loan.objects.all()
@@ -608,85 +604,61 @@ class myInvestment(BaseInvestorView, BaseValidator, generics.RetrieveAPIView):
             )
 
 
-class PortfolioValue(BaseInvestorView, BaseValidator, generics.RetrieveAPIView):
+class PortfolioValue(ConditionalGetMixin, BaseInvestorView, BaseValidator, generics.RetrieveAPIView):
     queryset = Investment.objects.all()
     serializer_class = InvestmentSerializer
 
+    def get_etag(self, request):
+        return make_key('portfolio-value', get_version(portfolio_namespace(request.user.id)),
+                        dict(request.query_params.lists()))
+
     def get(self, request, *args, **kwargs):
         user = request.user
+        params = request.query_params
 
         try:
-            # Get all investments for the user
-            investments = Investment.objects.filter(investor=user.id)
-
-            # Initialize portfolio metrics
+            # Headline numbers come from the summary row, kept current as investments are placed
+            summary = get_summary(user.id)
+            total_expected_return = summary.total_expected_return.quantize(CENT)
             portfolio_metrics = {
-                'total_invested': Decimal('0.00'),
-                'total_expected_return': Decimal('0.00'),
-                'total_actual_return': Decimal('0.00'),
-                'portfolio_value': Decimal('0.00'),
-                'total_loans': 0,
-                'investments_by_loan_purpose': {},
-                'investment_history': []
+                'total_invested': float(summary.total_invested),
+                'total_expected_return': float(total_expected_return),
+                'total_actual_return': float(summary.total_actual_return),
+                'portfolio_value': float(
+                    summary.total_invested + summary.total_actual_return + total_expected_return
+                ),
+                'total_loans': summary.loan_count,
+                'investments_by_loan_purpose': {
+                    row['purpose']: {
+                        'total_amount': float(row['total_amount']),
+                        'count': row['count']
+                    }
+                    for row in portfolio_by_purpose(user.id)
+                },
             }
 
-            # Get unique loan purposes
-            unique_loans = set()
-
-            # Calculate portfolio metrics
-            for investment in investments:
-                # Add to total invested
-                portfolio_metrics['total_invested'] += investment.amount
-
-                # Calculate returns
-                interest_rate = Decimal(investment.loan.interest_rate) * Decimal('0.97')
-                if investment.net_return:
-                    portfolio_metrics['total_actual_return'] += investment.net_return
-                else:
-                    expected_return = investment.amount * (interest_rate / Decimal('100'))
-                    portfolio_metrics['total_expected_return'] += expected_return
-
-                # Track unique loans
-                unique_loans.add(investment.loan.id)
-
-                # Group by loan purpose
-                loan_purpose = investment.loan.loan_purpose
-                if loan_purpose not in portfolio_metrics['investments_by_loan_purpose']:
-                    portfolio_metrics['investments_by_loan_purpose'][loan_purpose] = {
-                        'total_amount': Decimal('0.00'),
-                        'count': 0
-                    }
-                portfolio_metrics['investments_by_loan_purpose'][loan_purpose]['total_amount'] += investment.amount
-                portfolio_metrics['investments_by_loan_purpose'][loan_purpose]['count'] += 1
+            # History is paged newest first on the (investor, created_at, id) index
+            page_size = get_page_size(params, PORTFOLIO_HISTORY_PAGE_SIZE, MAX_PAGE_SIZE)
+            try:
+                investments, next_cursor = keyset_paginate(
+                    Investment.objects.filter(investor=user.id).select_related('loan'),
+                    params.get('cursor'), page_size, descending=True
+                )
+            except InvalidCursor as e:
+                return enhance_response(data={}, message=str(e), status=status.HTTP_400_BAD_REQUEST)
 
-                # Add to investment history
-                portfolio_metrics['investment_history'].append({
+            portfolio_metrics['investment_history'] = [
+                {
                     'date': investment.created_at,
                     'amount': investment.amount,
-                    'loan_purpose': loan_purpose,
-                    'interest_rate': interest_rate,
+                    'loan_purpose': investment.loan.loan_purpose,
+                    'interest_rate': Decimal(investment.loan.interest_rate) * INVESTOR_RETURN_RATIO,
                     'net_return': investment.net_return
-                })
-
-            # Calculate final portfolio value
-            portfolio_metrics['portfolio_value'] = (
-                    portfolio_metrics['total_invested'] +
-                    portfolio_metrics['total_actual_return'] +
-                    portfolio_metrics['total_expected_return']
-            )
-
-            # Calculate total number of loans
-            portfolio_metrics['total_loans'] = len(unique_loans)
-
-            # Format decimal values to 2 decimal places
-            for key in ['total_invested', 'total_expected_return', 'total_actual_return', 'portfolio_value']:
-                portfolio_metrics[key] = float(portfolio_metrics[key].quantize(Decimal('0.01')))
-
-            # Format loan purpose metrics
-            for purpose in portfolio_metrics['investments_by_loan_purpose']:
-                portfolio_metrics['investments_by_loan_purpose'][purpose]['total_amount'] = float(
-                    portfolio_metrics['investments_by_loan_purpose'][purpose]['total_amount'].quantize(Decimal('0.01'))
-                )
+                }
+                for investment in investments
+            ]
+            portfolio_metrics['next_cursor'] = next_cursor
+            portfolio_metrics['page_size'] = page_size
 
             return enhance_response(
                 data=portfolio_metrics,
@@ -723,59 +695,30 @@ class checkRepaymentBorrower(BaseBorrowerView, BaseValidator, generics.RetrieveA
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            borrower_id = Borrower.objects.get(user=user)
+            # Read-only: penalties and the missed status are derived at read time, nothing is saved
+            repayment_details = LoanRepaymentSchedule.objects.filter(
+                loan__borrower=borrowerDetails
+            ).exclude(loan__status='repaid').order_by('loan_id', 'installment_number')
             if loan_id:
-                loanDetails = Loan.objects.filter(borrower=borrower_id.id,id=loan_id)
-            else:
-                loanDetails = Loan.objects.filter(borrower=borrower_id.id)
-
+                repayment_details = repayment_details.filter(loan_id=loan_id)
 
+            now = timezone.now()
             response_data = []
-
-            for loan in loanDetails:
-                if loan.status != 'repaid':
-                    repayment_details = LoanRepaymentSchedule.objects.filter(loan=loan.id)
-                    print(repayment_details)
-                    for repayment in repayment_details:
-                        installment_data = {
-                            'loan_id': loan.id,  # Add the loan ID here
-                            'installment_number': repayment.installment_number,
-                            'repayment_id': repayment.id,
-                            'due_date': repayment.due_date,
-                            'payment_status': repayment.payment_status,
-                            'amount_paid': repayment.amount_paid,
-                            'amount_due': repayment.amount_due,
-                        }
-
-                        # Check due date logic
-                        now = timezone.now()
-                        due_date = repayment.due_date
-
-                        if repayment.payment_status == 'pending' or repayment.payment_status == 'missed':  # Use repayment.payment_status instead
-                            if due_date > now:  # Not yet due
-                                days_left = (due_date - now).days
-                                if days_left <= 15:
-                                    installment_data['notification'] = 'Due in less than 15 days'
-                            else:  # Due date has passed
-                                installment_data['payment_status'] = 'missed'
-
-                                # Check if the increase can be applied
-                                if not repayment.last_missed_date or (
-                                        repayment.last_missed_date.month != now.month and repayment.last_missed_date.year == now.year):
-                                    missed_amount = float(repayment.amount_due) * 1.05  # Increase by 5%
-                                    repayment.amount_due = f"{missed_amount:.2f}"  # Format to two decimal places
-                                    repayment.last_missed_date = now  # Update last missed date
-                                    repayment.payment_status='missed'
-                                    repayment.save()  # Save the updated repayment
-                                installment_data['amount_due'] = repayment.amount_due
-
-                        # Check if payment is enabled for missed installment
-                        if repayment.payment_status == 'missed' or (due_date - now).days <= 15:
-                            installment_data['is_payment_enabled'] = True
-                        else:
-                            installment_data['is_payment_enabled'] = False
-
-                        response_data.append(installment_data)
+            for repayment in repayment_details:
+                payment_status, amount_due, is_payment_enabled = installment_state(repayment, now)
+                installment_data = {
+                    'loan_id': repayment.loan_id,
+                    'installment_number': repayment.installment_number,
+                    'repayment_id': repayment.id,
+                    'due_date': repayment.due_date,
+                    'payment_status': payment_status,
+                    'amount_paid': repayment.amount_paid,
+                    'amount_due': amount_due,
+                    'is_payment_enabled': is_payment_enabled,
+                }
+                if payment_status == 'pending' and is_payment_enabled:
+                    installment_data['notification'] = 'Due in less than 15 days'
+                response_data.append(installment_data)
 
             return enhance_response(
                 data=response_data,
@@ -791,7 +734,7 @@ class checkRepaymentBorrower(BaseBorrowerView, BaseValidator, generics.RetrieveA
             )
 
 
-class loanRepayment(BaseBorrowerView, BaseValidator, generics.GenericAPIView):
+class loanRepayment(IdempotentMixin, BaseBorrowerView, BaseValidator, generics.GenericAPIView):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
 
@@ -833,7 +776,8 @@ class loanRepayment(BaseBorrowerView, BaseValidator, generics.GenericAPIView):
                     )
             #     create stripe payment link
                 stripe_customer_id = user_id.stripe_customer_id
-                amount=repayment.amount_due
+                # Charge the base amount plus any late penalty accrued as of now
+                amount = amount_with_penalty(repayment.amount_due, repayment.due_date, timezone.now())
                 payment_link = create_payment_link_for_customer(stripe_customer_id,amount,repayment_id)
                 # #  add to table
                 if not payment_link:
@@ -867,86 +811,52 @@ class checkRefundStatus(BaseBorrowerView,BaseValidator,generics.RetrieveAPIView)
         payment_id = request.query_params.get('payment_id')
         repayment_id = request.query_params.get('repayment_id')
 
-
-        user = request.user
-        user_id = User.objects.get(email=user.email)
-        stripe_history = {}
-        if not repayment_id and not payment_id:
+        if not repayment_id or not payment_id:
             return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
                                     message="Invalid Data")
 
-        stripe_history=check_Add_fund_status(payment_id)
-
-        if  stripe_history.status != "complete":
+        # EMI payments are applied by the Stripe webhook; this only reads what it recorded
+        confirmation = confirmed_payment(request.user, payment_id, 'payment', lambda: [])
+        if confirmation is None:
             return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
                                     message="payment is incomplete")
+        return enhance_response(data=confirmation, message="Payment is completed", status=200)
 
-        to_serialize_data = {
-            "transaction_type": "payment",
-            "amount": stripe_history.amount_total/100,
-            "payment_id": payment_id
-        }
 
+class StripeWebhook(generics.GenericAPIView):
+    """Receives Stripe events; the signature header is the only authentication."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        if not settings.STRIPE_WEBHOOK_SECRET:
+            return enhance_response(data={}, message="Webhook is not configured",
+                                    status=status.HTTP_503_SERVICE_UNAVAILABLE)
         try:
-            transaction_entry = Transaction.objects.get(payment_id=payment_id)
-            if(transaction_entry):
-                return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
-                                        message="You have already paid for this payment id")
-        except:
-
-            serializer = TransactionSerializer(data=to_serialize_data, context={"user": user_id})
-            if not serializer.is_valid():
-                return enhance_response(data={}, status=status.HTTP_400_BAD_REQUEST,
-                                        message="unable to pay fund")
-            serializer.save()
-            try:
-                #   update repayment table
-                borrower_id = Borrower.objects.get(user=user)
-                loanDetails = Loan.objects.filter(borrower=borrower_id.id).last()
-                repayment_details = LoanRepaymentSchedule.objects.filter(loan=loanDetails.id)
-                amountPaid=stripe_history.amount_total/100
-                for repayment in repayment_details:
-                    amountToBePaid=repayment.amount_due
-                    if(int(repayment_id)==int(repayment.id)):
-                        finalRepayment = LoanRepaymentSchedule.objects.get(id=repayment.id)
-                        finalRepayment.payment_status='paid'
-                        finalRepayment.amount_paid=float(amountPaid)
-                        finalRepayment.amount_due=float(amountToBePaid)-float(amountPaid)
-                        finalRepayment.save()
-                        to_serialize_data_emi = {
-                            "transaction_type": "payment",
-                            "amount": float(amountPaid),
-                            "stripe_payment_id": payment_id,
-                            'status':"completed"
-                        }
-
-                        serializerEmi = EmiSerializer(data=to_serialize_data_emi, context={"loan": loanDetails})
-                        serializerEmi.is_valid()
-                        serializerEmi.save()
-
-                CheckAllRepayment = LoanRepaymentSchedule.objects.filter(loan=loanDetails)
-                all_paid = True
-
-                for eachRepayment in CheckAllRepayment:
-                    print(eachRepayment.payment_status)
-                    if eachRepayment.payment_status.lower() != 'paid':
-                        all_paid = False
-                        break
-                if all_paid:
-                    print("update loan")
-                    loanDetails.status='repaid'
-                    loanDetails.save()
-                return enhance_response(data=[], message="Payment is completed",
-                                                status=200)
-
-            except Exception as e:
+            # Verifies the signature and timestamp; the plain payload is what gets stored
+            stripe.Webhook.construct_event(
+                request.body,
+                request.META.get('HTTP_STRIPE_SIGNATURE', ''),
+                settings.STRIPE_WEBHOOK_SECRET
+            )
+            event = json.loads(request.body)
+        except (ValueError, stripe.error.SignatureVerificationError):
+            return enhance_response(data={}, message="Invalid webhook signature",
+                                    status=status.HTTP_400_BAD_REQUEST)
 
-                return enhance_response(
+        try:
+            stored = handle_stripe_event(event)
+        except Exception as e:
+            # Non-2xx makes Stripe retry the delivery later
+            return enhance_response(data={}, message=f"Error processing event: {str(e)}",
+                                    status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return enhance_response(data={'event_id': stored.event_id, 'status': stored.status},
+                                message="Event received", status=status.HTTP_200_OK)
 
-                    data={},
 
-                    message=f"Error while repayment : {str(e)}",
+class StripeHealth(BaseStaffView):
+    """Circuit breaker state and Stripe call latencies of the process serving the request."""
 
-                    status=status.HTTP_400_BAD_REQUEST
+    def get(self, request, *args, **kwargs):
+        return enhance_response(data=stripe_health(), message="Stripe health", status=status.HTTP_200_OK)
 
-                )
\ No newline at end of file
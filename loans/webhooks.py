@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.utils import timezone
+
+from loans.models import StripeEvent
+from loans.payments import apply_deposit, apply_emi_payment, session_target, PaymentNotReady
+from users.kyc import verification_user, complete_kyc, fail_kyc
+
+CHECKOUT_COMPLETED_EVENTS = ('checkout.session.completed', 'checkout.session.async_payment_succeeded')
+
+
+def _handle_checkout(session):
+    if session.get('payment_status') != 'paid':
+        return False
+    purpose, repayment_id = session_target(session)
+    if purpose == 'deposit':
+        return apply_deposit(session)
+    if purpose == 'emi' and repayment_id:
+        return apply_emi_payment(session, repayment_id)
+    return False
+
+
+def _handle_verification(verification_session, event_type):
+    user = verification_user(verification_session)
+    if user is None:
+        return False
+    if event_type == 'identity.verification_session.verified':
+        return complete_kyc(user)
+    # requires_input after a failed check, or canceled
+    return fail_kyc(user)
+
+
+HANDLERS = {
+    **{event_type: lambda obj, event_type: _handle_checkout(obj) for event_type in CHECKOUT_COMPLETED_EVENTS},
+    'identity.verification_session.verified': _handle_verification,
+    'identity.verification_session.requires_input': _handle_verification,
+    'identity.verification_session.canceled': _handle_verification,
+}
+
+# Handlers that call Stripe themselves. They are idempotent on their own, so they run outside
+# the event transaction: no row lock is held across the calls and each step they commit sticks
+UNLOCKED_EVENTS = {
+    'identity.verification_session.verified',
+    'identity.verification_session.requires_input',
+    'identity.verification_session.canceled',
+}
+
+
+def _record_outcome(stored, applied):
+    # A concurrent delivery may have finished first; processed wins over ignored
+    final = ('processed',) if applied else ('processed', 'ignored')
+    StripeEvent.objects.filter(pk=stored.pk).exclude(status__in=final).update(
+        status='processed' if applied else 'ignored', error=None, processed_at=timezone.now()
+    )
+    stored.refresh_from_db()
+    return stored
+
+
+def handle_stripe_event(event):
+    """Store a verified Stripe event and apply it once.
+
+    ``event`` is the parsed event payload. Redeliveries of an event that was
+    already processed or ignored return the stored row without doing anything.
+    A handler error marks the event failed and re-raises so Stripe retries it. An
+    event whose payment is not in the database yet stays received and re-raises
+    too, so a later delivery or replay applies it. Events in ``UNLOCKED_EVENTS``
+    run their handler outside the transaction and record the outcome afterwards.
+    """
+    stored, _ = StripeEvent.objects.get_or_create(
+        event_id=event['id'],
+        defaults={'event_type': event['type'], 'payload': event}
+    )
+    if stored.status in ('processed', 'ignored'):
+        return stored
+
+    handler = HANDLERS.get(event['type'])
+    try:
+        if event['type'] in UNLOCKED_EVENTS:
+            return _record_outcome(stored, handler(event['data']['object'], event['type']))
+        with transaction.atomic():
+            # Row lock so two deliveries of the same event cannot apply it concurrently
+            stored = StripeEvent.objects.select_for_update().get(pk=stored.pk)
+            if stored.status in ('processed', 'ignored'):
+                return stored
+            applied = handler(event['data']['object'], event['type']) if handler else False
+            stored.status = 'processed' if applied else 'ignored'
+            stored.error = None
+            stored.processed_at = timezone.now()
+            stored.save(update_fields=['status', 'error', 'processed_at'])
+    except PaymentNotReady as e:
+        StripeEvent.objects.filter(pk=stored.pk).update(status='received', error=str(e))
+        raise
+    except Exception as e:
+        StripeEvent.objects.filter(pk=stored.pk).update(status='failed', error=str(e))
+        raise
+    return stored
@@ -0,0 +1,233 @@
+import random
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import stripe
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from enhancefund.Constant import WITHDRAWAL_MAX_ATTEMPTS, WITHDRAWAL_RETRY_BASE_SECONDS, WITHDRAWAL_LEASE_SECONDS
+from enhancefund.stripe_client import call_stripe, DEGRADED_ERRORS
+from enhancefund.utils import create_payout, transfer_funds
+from ledger.postings import platform, wallet
+from ledger.wallets import place_hold, capture_holds, release_holds, InsufficientFunds
+from loans.models import Transaction, Withdrawal, PayoutBatch
+from loans.rollups import rollup_transactions
+
+
+class WithdrawalError(Exception):
+    """A withdrawal request refused on the request path."""
+
+
+def request_withdrawal(user, amount):
+    """Hold ``amount`` off the user's balance and queue the payout. No Stripe call happens here.
+
+    Raises WithdrawalError when the amount is invalid, the balance is too low or
+    the user has no connected Stripe account.
+    """
+    try:
+        amount = Decimal(str(amount)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise WithdrawalError("Withdrawal amount must be a positive number")
+    if amount <= 0:
+        raise WithdrawalError("Withdrawal amount must be a positive number")
+    if not user.stripe_account_id:
+        raise WithdrawalError("No payout account is connected")
+
+    with transaction.atomic():
+        try:
+            hold = place_hold(wallet(user), amount, 'withdrawal')
+        except InsufficientFunds:
+            raise WithdrawalError("In sufficient balance")
+        return Withdrawal.objects.create(
+            user=user, amount=amount, stripe_account_id=user.stripe_account_id, hold=hold
+        )
+
+
+def _claim(queryset, limit):
+    # SKIP LOCKED lets any number of workers claim concurrently without waiting on
+    # each other. A claimed row is hidden until its lease expires, so rows held by a
+    # worker that died are picked up again later.
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = list(
+            queryset.select_for_update(skip_locked=True, of=('self',)).select_related('user').filter(
+                status__in=('pending', 'processing'),
+                available_at__lte=now
+            ).order_by('available_at', 'id')[:limit]
+        )
+        queryset.model.objects.filter(id__in=[row.id for row in claimed]).update(
+            status='processing',
+            attempts=F('attempts') + 1,
+            available_at=now + timedelta(seconds=WITHDRAWAL_LEASE_SECONDS)
+        )
+    for row in claimed:
+        row.status = 'processing'
+        row.attempts += 1
+    return claimed
+
+
+def claim_withdrawals(limit):
+    """Lease up to ``limit`` due withdrawals that are paid out on their own."""
+    return _claim(Withdrawal.objects.filter(batch__isnull=True), limit)
+
+
+def claim_retried_withdrawals(limit):
+    """Lease up to ``limit`` due unbatched withdrawals a worker already tried.
+
+    form_payout_batches never nets those, so in batching mode they are still paid out on their own.
+    """
+    return _claim(Withdrawal.objects.filter(batch__isnull=True, attempts__gt=0), limit)
+
+
+def claim_payout_batches(limit):
+    """Lease up to ``limit`` due payout batches."""
+    return _claim(PayoutBatch.objects.all(), limit)
+
+
+def form_payout_batches(window_seconds):
+    """Net every account's queued withdrawals into one PayoutBatch once its oldest has waited a full window.
+
+    Each account then gets one transfer and one payout per window however many
+    withdrawals it requested. Returns the batches created.
+    """
+    cutoff = timezone.now() - timedelta(seconds=window_seconds)
+    # Never re-batch a withdrawal a worker already tried: its transfer may have reached Stripe
+    unbatched = Withdrawal.objects.filter(status='pending', batch__isnull=True, attempts=0)
+    due_users = unbatched.values('user_id').annotate(oldest=Min('created_at')).filter(
+        oldest__lte=cutoff
+    ).values('user_id')
+
+    with transaction.atomic():
+        withdrawals = list(
+            unbatched.select_for_update(skip_locked=True).filter(user_id__in=due_users).values_list(
+                'id', 'user_id', 'stripe_account_id', 'amount'
+            )
+        )
+        groups = {}
+        for withdrawal_id, user_id, stripe_account_id, amount in withdrawals:
+            groups.setdefault((user_id, stripe_account_id), []).append((withdrawal_id, amount))
+
+        batches = PayoutBatch.objects.bulk_create([
+            PayoutBatch(
+                user_id=user_id,
+                stripe_account_id=stripe_account_id,
+                amount=sum(amount for _, amount in members),
+                withdrawal_count=len(members)
+            )
+            for (user_id, stripe_account_id), members in groups.items()
+        ])
+        for batch, members in zip(batches, groups.values()):
+            Withdrawal.objects.filter(id__in=[withdrawal_id for withdrawal_id, _ in members]).update(
+                batch=batch, status='processing'
+            )
+    return batches
+
+
+def _owned(row):
+    # Only the worker holding the latest claim may change the row
+    return type(row).objects.filter(pk=row.pk, status='processing', attempts=row.attempts)
+
+
+def _members(row):
+    if isinstance(row, PayoutBatch):
+        return list(row.withdrawals.select_related('hold'))
+    return [row]
+
+
+def _idempotency_key(row, step):
+    return f'{row._meta.db_table}-{row.id}-{step}'
+
+
+def _complete(row, payout_id):
+    with transaction.atomic():
+        if not _owned(row).update(status='completed', payout_id=payout_id, error=None):
+            return False
+        withdrawals = _members(row)
+        if isinstance(row, PayoutBatch):
+            row.withdrawals.update(status='completed', transfer_id=row.transfer_id, payout_id=payout_id, error=None)
+        rollup_transactions(Transaction.objects.bulk_create([
+            Transaction(
+                user_id=withdrawal.user_id,
+                transaction_type='withdrawal',
+                amount=withdrawal.amount,
+                payment_id=payout_id
+            )
+            for withdrawal in withdrawals
+        ]))
+        capture_holds([withdrawal.hold for withdrawal in withdrawals], 'withdrawal', payout_id, platform('stripe'))
+    row.status = 'completed'
+    return True
+
+
+def _fail(row, error):
+    if row.transfer_id:
+        # The money already reached the connected account; pull it back before refunding the wallet
+        try:
+            call_stripe('transfer.create_reversal', stripe.Transfer.create_reversal, row.transfer_id,
+                        idempotency_key=_idempotency_key(row, 'reversal'))
+        except DEGRADED_ERRORS as e:
+            if row.attempts < WITHDRAWAL_MAX_ATTEMPTS:
+                return _retry_later(row, e)
+            # Out of attempts: _retry_later would hand the row straight back here
+            return _fail_unreversed(row, f"{error}; transfer reversal unavailable: {e}")
+        except stripe.error.StripeError as e:
+            return _fail_unreversed(row, f"{error}; transfer reversal failed: {e}")
+
+    with transaction.atomic():
+        if not _owned(row).update(status='failed', error=str(error)):
+            return False
+        if isinstance(row, PayoutBatch):
+            row.withdrawals.update(status='failed', error=str(error))
+        release_holds([withdrawal.hold for withdrawal in _members(row)], 'withdrawal_release',
+                      f'{row._meta.db_table}:{row.id}')
+    row.status = 'failed'
+    return False
+
+
+def _fail_unreversed(row, error):
+    # Keep the hold: the funds are with the connected account and need manual reconciliation
+    with transaction.atomic():
+        if not _owned(row).update(status='failed', error=error):
+            return False
+        if isinstance(row, PayoutBatch):
+            row.withdrawals.update(status='failed', error=error)
+    row.status = 'failed'
+    return False
+
+
+def _retry_later(row, error):
+    if row.attempts >= WITHDRAWAL_MAX_ATTEMPTS:
+        return _fail(row, error)
+    delay = WITHDRAWAL_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1)
+    _owned(row).update(
+        status='pending',
+        error=str(error),
+        available_at=timezone.now() + timedelta(seconds=random.uniform(delay / 2, delay))
+    )
+    row.status = 'pending'
+    return False
+
+
+def process_withdrawal(row):
+    """Transfer a claimed withdrawal or payout batch to the connected account and pay it out.
+
+    Runs outside any transaction so no row lock is held across Stripe calls.
+    Each call uses an idempotency key derived from the row id, so a row
+    re-claimed after a crash cannot move the money twice. Returns True when the
+    money was paid out.
+    """
+    try:
+        if not row.transfer_id:
+            transfer = transfer_funds(row.amount, row.stripe_account_id,
+                                      idempotency_key=_idempotency_key(row, 'transfer'))
+            row.transfer_id = transfer.id
+            _owned(row).update(transfer_id=transfer.id)
+        payout = create_payout(row.amount, row.stripe_account_id,
+                               idempotency_key=_idempotency_key(row, 'payout'))
+    except DEGRADED_ERRORS as e:
+        return _retry_later(row, e)
+    except stripe.error.StripeError as e:
+        return _fail(row, e)
+    return _complete(row, payout.id)
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.utils import timezone
+
+from enhancefund.utils import create_stripe_user, create_stripe_customer_payment, stripe_document_verification_update
+from users.models import User, UserVerification
+from users.serializers import UserSerializer
+
+
+def verification_user(verification_session):
+    """The user a Stripe Identity session belongs to, from the metadata set when it was created."""
+    user_id = (verification_session.get('metadata') or {}).get('user_id')
+    if not user_id:
+        return None
+    return User.objects.filter(id=user_id).first()
+
+
+def _identity_verification(user):
+    return UserVerification.objects.filter(user=user, verification_type='identity').first() \
+        or UserVerification.objects.filter(user=user).first() \
+        or UserVerification(user=user, verification_type='identity')
+
+
+def _record_verification(user, verification_status):
+    verification = _identity_verification(user)
+    verification.verification_status = verification_status
+    verification.verified_at = timezone.now() if verification_status == 'verified' else None
+    verification.save()
+
+
+def _kyc_key(user, step):
+    return f'{user._meta.db_table}-{user.pk}-kyc-{step}'
+
+
+def start_kyc(user):
+    """A new verification session supersedes any earlier failed attempt."""
+    if not (user.checklist and 'KYC' in user.checklist):
+        _record_verification(user, 'pending')
+
+
+def complete_kyc(user):
+    """Create the Stripe account and customer for a verified user. Returns False if already done.
+
+    The Stripe calls run outside any transaction and row lock. Each step's id is
+    stored as soon as Stripe returns it and the steps use idempotency keys, so a
+    redelivered or concurrent event resumes at the first missing step and gets the
+    same Stripe objects back instead of creating new ones.
+    """
+    user = User.objects.get(pk=user.pk)
+    if user.checklist and 'KYC' in user.checklist:
+        return False
+
+    serializer = UserSerializer(user)
+    if not user.stripe_account_id:
+        account = create_stripe_user(serializer, idempotency_key=_kyc_key(user, 'account'))
+        user.stripe_account_id = account.individual.account
+        User.objects.filter(pk=user.pk).update(stripe_account_id=user.stripe_account_id)
+    if not user.stripe_customer_id:
+        customer = create_stripe_customer_payment(serializer, idempotency_key=_kyc_key(user, 'customer'))
+        user.stripe_customer_id = customer.id
+        User.objects.filter(pk=user.pk).update(stripe_customer_id=user.stripe_customer_id)
+    verification = _identity_verification(user)
+    if not verification.document_url:
+        verification.document_url = stripe_document_verification_update(
+            user.stripe_account_id, idempotency_key=_kyc_key(user, 'documents')
+        )
+        verification.save()
+
+    with transaction.atomic():
+        user = User.objects.select_for_update().get(pk=user.pk)
+        if user.checklist and 'KYC' in user.checklist:
+            return False
+        user.checklist = ['KYC']
+        user.save(update_fields=['checklist', 'updated_at'])
+        _record_verification(user, 'verified')
+    return True
+
+
+def fail_kyc(user):
+    if user.checklist and 'KYC' in user.checklist:
+        return False
+    _record_verification(user, 'failed')
+    return True
+
+
+def kyc_state(user):
+    """'verified', 'failed' or 'pending' from local state only."""
+    if user.checklist and 'KYC' in user.checklist:
+        return 'verified'
+    verification = UserVerification.objects.filter(user=user).order_by('-submitted_at').first()
+    if verification is not None and verification.verification_status == 'failed':
+        return 'failed'
+    return 'pending'
@@ -150,10 +150,8 @@ def notify_loan_funded(sender, instance, created, **kwargs):
         loan = instance.loan
         borrower = loan.borrower.user
         
-        # Calculate total funded amount
-        total_funded = Investment.objects.filter(loan=loan).aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0.00')
+        # Investment.save() has already bumped the running total on the loan
+        total_funded = loan.funded_amount
         
         remaining = loan.amount - total_funded
         